@@ -0,0 +1,377 @@
+import numpy as np
+import torch
+import pickle
+import copy
+import json
+import time
+import os
+import sys
+from sklearn.preprocessing import StandardScaler
+from columnar_dataset import FEATURE_NAMES
+from lbw_simulator import (DELIVERY_DEFAULTS, PAD_START_X, PAD_MIN_X, PAD_MAX_X,
+                           PAD_MOVE_VARIATION, simulate_deliveries, write_lbw_csv)
+from generate_lbw_data import CURRICULUM
+from train_lbw_model import LBWPredictor, split_by_delivery, train_model_fast
+from test_lbw_model import load_model_and_scaler, predict_lbw_batch, binary_confusion_matrix
+from retrain_lbw_model import rescale_first_layer
+
+OUT_DIR = 'data/ActiveLearningData'
+REPORT_FILE = 'active_learning_report.json'
+
+STRATEGIES = ('active', 'curriculum', 'random')
+
+
+def sample_candidates(n, rng, params=None):
+    """
+    Random delivery parameters over the full FastDataCollector ranges
+
+    Returns a dict of per-ball arrays matching simulate_deliveries' keyword
+    arguments (angles, spin_types, speed_variations, pad_x).
+    """
+    p = dict(DELIVERY_DEFAULTS, **(params or {}))
+    return {
+        'angles': rng.uniform(p['angle_min'], p['angle_max'], size=n),
+        'spin_types': rng.integers(0, 2, size=n),
+        'speed_variations': rng.uniform(1 - p['speed_variation'], 1 + p['speed_variation'], size=n),
+        'pad_x': np.clip(PAD_START_X + rng.uniform(-PAD_MOVE_VARIATION, PAD_MOVE_VARIATION, size=n),
+                         PAD_MIN_X, PAD_MAX_X),
+    }
+
+
+def take(candidates, idx):
+    return {key: values[idx] for key, values in candidates.items()}
+
+
+def committee_probabilities(committee, X):
+    """(members, rows) stump-hit probabilities of every checkpoint in the committee"""
+    return np.stack([predict_lbw_batch(model, scaler, X) for model, scaler in committee])
+
+
+def score_candidates(committee, candidates, rng, threshold=0.5, probe_seconds=0.3,
+                     disagreement_weight=1.0, params=None):
+    """
+    How much each candidate delivery is worth simulating in full
+
+    Candidates are only flown for their first probe_seconds (no pad or
+    stumps contact yet, so no label) to get the frames the model would
+    see. A frame scores by how close the committee's mean probability is
+    to the threshold (1 on it, 0 at the far end of [0, 1]) plus
+    disagreement_weight times the spread between checkpoints; a
+    candidate scores by its most uncertain frame.
+    """
+    n = len(candidates['angles'])
+    probe_params = dict(params or {}, max_ball_age=probe_seconds)
+    X, _, delivery = simulate_deliveries(n, rng, probe_params, **candidates)
+
+    probs = committee_probabilities(committee, X)
+    mean = probs.mean(axis=0)
+    margin = 1 - np.abs(mean - threshold) / max(threshold, 1 - threshold)
+    # Largest possible std of probabilities is 0.5
+    spread = probs.std(axis=0) / 0.5 if len(committee) > 1 else np.zeros_like(mean)
+
+    scores = np.zeros(n)
+    np.maximum.at(scores, delivery, margin + disagreement_weight * spread)
+    return scores
+
+
+def select_active(committee, n, rng, pool_factor=10, explore=0.2, **score_args):
+    """
+    Pick n deliveries from a pool of pool_factor * n random candidates
+
+    A fraction explore is taken uniformly from the pool so the dataset
+    keeps covering easy deliveries, the rest are the highest scoring.
+    Focusing only on the hard cases is what made the fixed curriculum
+    trade accuracy in one area for another.
+    """
+    pool = sample_candidates(n * pool_factor, rng)
+    scores = score_candidates(committee, pool, rng, **score_args)
+
+    n_explore = int(round(explore * n))
+    ranked = np.argsort(-scores, kind='stable')
+    chosen = ranked[:n - n_explore]
+    rest = ranked[n - n_explore:]
+    chosen = np.concatenate([chosen, rng.choice(rest, size=n_explore, replace=False)])
+    return take(pool, chosen), float(scores[chosen].mean()), float(scores.mean())
+
+
+def curriculum_params(collected, budget):
+    """Angle window FastDataCollector would use once collected/budget of the target is reached"""
+    stage = max(i for i, (fraction, _, _) in enumerate(CURRICULUM) if collected >= fraction * budget)
+    _, angle_min, angle_max = CURRICULUM[stage]
+    return {'angle_min': angle_min, 'angle_max': angle_max}
+
+
+def load_committee(spec):
+    """
+    Seed checkpoints from a comma-separated list of model.pth[:scaler.pkl]
+
+    A checkpoint without its own scaler uses scaler.pkl, e.g.
+    'lbw_model_best.pth,lbw_model_best_old.pth:scaler_old.pkl'.
+    """
+    committee = []
+    for entry in filter(None, spec.split(',')):
+        model_path, _, scaler_path = entry.partition(':')
+        model, scaler = load_model_and_scaler(model_path, scaler_path or 'scaler.pkl')
+        if model.network[0].in_features != len(FEATURE_NAMES):
+            raise ValueError(f"{model_path} is not a {len(FEATURE_NAMES)}-feature frame-level model")
+        committee.append((model, scaler))
+    return committee
+
+
+def fit_round(X, y, delivery, model=None, old_scaler=None, epochs=30, lr=1e-3, patience=5,
+              seed=0, checkpoint_path='active_round_best.pth'):
+    """
+    Train on everything collected so far, warm-starting from the last round
+
+    The scaler is refitted to all rows and the previous weights are
+    rescaled to match (rescale_first_layer), as in incremental retraining.
+    """
+    scaler = StandardScaler().fit(X)
+    if model is None:
+        torch.manual_seed(seed)
+        model = LBWPredictor(input_size=X.shape[1])
+    else:
+        model = copy.deepcopy(model)
+        rescale_first_layer(model, old_scaler, scaler)
+
+    train_idx, val_idx = split_by_delivery(delivery, seed=seed)
+    X_scaled = scaler.transform(X).astype(np.float32)
+    y = y.astype(np.float32)
+
+    train_model_fast(model, (torch.from_numpy(X_scaled[train_idx]), torch.from_numpy(y[train_idx]).unsqueeze(1)),
+                     (torch.from_numpy(X_scaled[val_idx]), torch.from_numpy(y[val_idx]).unsqueeze(1)),
+                     epochs=epochs, lr=lr, checkpoint_path=checkpoint_path, verbose=False,
+                     patience=patience)
+    model.load_state_dict(torch.load(checkpoint_path))
+    os.remove(checkpoint_path)
+    model.eval()
+    return model, scaler
+
+
+def evaluate(model, scaler, X_test, y_test, threshold=0.5):
+    probs = predict_lbw_batch(model, scaler, X_test)
+    (tn, fp), (fn, tp) = binary_confusion_matrix(y_test, probs >= threshold)
+    return {
+        'accuracy': float((tp + tn) / len(y_test)),
+        'recall': float(tp / max(tp + fn, 1)),
+        'precision': float(tp / max(tp + fp, 1)),
+    }
+
+
+def run_strategy(strategy, X_test, y_test, out_dir, budget=10_000, seed_deliveries=200,
+                 batch=200, target_recall=0.99, min_precision=0.99, threshold=0.5,
+                 committee_size=3, seed=0, seed_committee=(), **select_args):
+    """
+    Collect deliveries round by round until the test recall target is met
+
+    The target only counts with precision of at least min_precision, so
+    a model can't reach it by calling nearly everything a hit.
+
+    Every strategy starts from the same uniform seed round. After each
+    round the model is retrained and scored on the fixed test set:
+    'active' then picks the next batch with select_active, 'curriculum'
+    bowls FastDataCollector's narrowing angle windows and 'random' the
+    full window. Rows are appended to <strategy>_training_data.csv
+    (<strategy>_seed<seed>_... for seeds other than 0) in the
+    LBWData.SaveAsCSV format as they are simulated.
+
+    'active' scores candidates with a committee of the seed_committee
+    checkpoints (e.g. lbw_model_best.pth) plus committee_size models
+    retrained every round. Each of those is its own warm-started lineage
+    with a different seed, so a different init and train/val split,
+    rather than the last few rounds of one run, which would mostly agree.
+    The first lineage is the one scored against the target, as for the
+    other strategies.
+
+    Returns:
+        Summary dict with one entry per round
+    """
+    rng = np.random.default_rng(seed)
+    prefix = strategy if seed == 0 else f'{strategy}_seed{seed}'
+    csv_path = os.path.join(out_dir, f'{prefix}_training_data.csv')
+    lineages = committee_size if strategy == 'active' else 1
+
+    X_all = np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+    y_all = np.empty(0, dtype=int)
+    delivery_all = np.empty(0, dtype=int)
+    committee = list(seed_committee)
+    models = [(None, None)] * lineages
+    rounds = []
+    collected = 0
+    reached = None
+    start = time.perf_counter()
+
+    while collected < budget:
+        n = min(seed_deliveries if collected == 0 else batch, budget - collected)
+        info = {}
+
+        if collected == 0 or strategy == 'random':
+            X, y, delivery = simulate_deliveries(n, rng, **sample_candidates(n, rng))
+        elif strategy == 'curriculum':
+            X, y, delivery = simulate_deliveries(n, rng, curriculum_params(collected, budget))
+        else:
+            chosen, chosen_score, pool_score = select_active(
+                committee, n, rng, threshold=threshold, **select_args)
+            info = {'mean_score_selected': chosen_score, 'mean_score_pool': pool_score}
+            X, y, delivery = simulate_deliveries(n, rng, **chosen)
+
+        write_lbw_csv(csv_path, X, y, mode='w' if collected == 0 else 'a')
+        X_all = np.concatenate([X_all, X])
+        y_all = np.concatenate([y_all, y])
+        delivery_all = np.concatenate([delivery_all, delivery + collected])
+        collected += n
+
+        models = [fit_round(X_all, y_all, delivery_all, model, scaler, seed=seed * 1000 + k)
+                  for k, (model, scaler) in enumerate(models)]
+        committee = list(seed_committee) + models
+        model, scaler = models[0]
+
+        metrics = evaluate(model, scaler, X_test, y_test, threshold)
+        positives = float(np.mean(y_all[np.r_[True, np.diff(delivery_all) != 0]]))
+        rounds.append(dict(deliveries=collected, rows=int(len(y_all)),
+                           positive_deliveries=positives, **metrics, **info))
+        print(f"  {strategy:<11}{collected:>9,}{len(y_all):>10,}{100*positives:>10.1f}%"
+              f"{100*metrics['recall']:>9.2f}%{100*metrics['precision']:>11.2f}%"
+              f"{100*metrics['accuracy']:>10.2f}%")
+
+        if metrics['recall'] >= target_recall and metrics['precision'] >= min_precision:
+            reached = collected
+            break
+
+    torch.save(model.state_dict(), os.path.join(out_dir, f'{prefix}_model.pth'))
+    with open(os.path.join(out_dir, f'{prefix}_scaler.pkl'), 'wb') as f:
+        pickle.dump(scaler, f)
+
+    return {
+        'seed': seed,
+        'csv': csv_path,
+        'deliveries_to_target': reached,
+        'seconds': time.perf_counter() - start,
+        'rounds': rounds,
+    }
+
+
+def mean_deliveries(runs, budget):
+    """
+    Mean deliveries to the target over seeds, and how many seeds reached it
+
+    A seed that never reached the target counts as the full budget, so
+    the mean is a lower bound whenever some did not.
+    """
+    needed = [run['deliveries_to_target'] or budget for run in runs]
+    return float(np.mean(needed)), sum(run['deliveries_to_target'] is not None for run in runs)
+
+
+def main():
+    """
+    Usage: python active_learning_lbw.py [--strategies active,curriculum] [--budget 10000]
+                                         [--batch 200] [--seed-deliveries 200]
+                                         [--target-recall 0.99] [--min-precision 0.99]
+                                         [--threshold 0.5] [--seeds 3]
+                                         [--pool-factor 10] [--explore 0.2] [--committee 3]
+                                         [--committee-from lbw_model_best.pth[:scaler.pkl],...]
+                                         [--probe-seconds 0.3] [--test-deliveries 5000]
+
+    Runs each strategy until its model reaches the target recall on a
+    fixed simulated test set (uniform over the full bowling window) or
+    the delivery budget runs out, once per seed, and compares how many
+    simulated deliveries each needed on average.
+
+    --committee-from seeds the active committee with existing checkpoints;
+    it defaults to lbw_model_best.pth with scaler.pkl when both exist.
+    Pass --committee-from "" to start from the retrained models only.
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    strategies = option('--strategies', 'active,curriculum').split(',')
+    for strategy in strategies:
+        if strategy not in STRATEGIES:
+            print(f"ERROR: unknown strategy {strategy}, choose from {', '.join(STRATEGIES)}")
+            return
+
+    budget = int(option('--budget', 10_000))
+    target_recall = float(option('--target-recall', 0.99))
+    min_precision = float(option('--min-precision', 0.99))
+    threshold = float(option('--threshold', 0.5))
+    seeds = int(option('--seeds', 3))
+    settings = {
+        'budget': budget,
+        'seed_deliveries': int(option('--seed-deliveries', 200)),
+        'batch': int(option('--batch', 200)),
+        'target_recall': target_recall,
+        'min_precision': min_precision,
+        'threshold': threshold,
+        'committee_size': int(option('--committee', 3)),
+        'pool_factor': int(option('--pool-factor', 10)),
+        'explore': float(option('--explore', 0.2)),
+        'probe_seconds': float(option('--probe-seconds', 0.3)),
+    }
+    test_deliveries = int(option('--test-deliveries', 5000))
+
+    default_committee = ('lbw_model_best.pth'
+                         if os.path.exists('lbw_model_best.pth') and os.path.exists('scaler.pkl') else '')
+    committee_from = option('--committee-from', default_committee)
+    try:
+        seed_committee = load_committee(committee_from)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"ERROR: could not load --committee-from checkpoints: {e}")
+        return
+    if seed_committee:
+        print(f"Committee seeded with {committee_from}")
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    X_test, y_test, _ = simulate_deliveries(test_deliveries, np.random.default_rng(12345),
+                                            **sample_candidates(test_deliveries, np.random.default_rng(54321)))
+    print(f"Test set: {test_deliveries:,} deliveries, {len(y_test):,} rows "
+          f"({100*y_test.mean():.1f}% hit stumps)")
+    print(f"Target: {100*target_recall:.1f}% recall with {100*min_precision:.1f}% precision "
+          f"at threshold {threshold}, budget {budget:,} deliveries, {seeds} seed(s)\n")
+    print(f"  {'strategy':<11}{'deliveries':>9}{'rows':>10}{'hit rate':>11}{'recall':>10}"
+          f"{'precision':>12}{'accuracy':>10}")
+
+    results = {strategy: [] for strategy in strategies}
+    for seed in range(seeds):
+        for strategy in strategies:
+            results[strategy].append(run_strategy(strategy, X_test, y_test, OUT_DIR, seed=seed,
+                                                  seed_committee=seed_committee, **settings))
+
+    print("\nDeliveries needed to reach the target recall:")
+    means = {}
+    for strategy, runs in results.items():
+        means[strategy], reached = mean_deliveries(runs, budget)
+        per_seed = ', '.join(f"{run['deliveries_to_target']:,}" if run['deliveries_to_target'] else '-'
+                             for run in runs)
+        print(f"  {strategy:<11}mean {means[strategy]:>8,.0f}  reached {reached}/{len(runs)}  "
+              f"(per seed: {per_seed})  {runs[0]['csv']}")
+
+    if 'active' in means:
+        active = means['active']
+        for strategy, mean in means.items():
+            if strategy == 'active':
+                continue
+            if mean > active:
+                print(f"Active learning needed {mean / active:.1f}x fewer deliveries than {strategy} "
+                      f"on average over {seeds} seed(s)")
+            elif mean < active:
+                print(f"Active learning needed {active / mean:.1f}x more deliveries than {strategy} "
+                      f"on average over {seeds} seed(s)")
+            else:
+                print(f"Active learning and {strategy} needed the same deliveries on average "
+                      f"over {seeds} seed(s)")
+        if seeds < 3:
+            print("Fewer than 3 seeds, treat the comparison as anecdotal")
+
+    report_path = os.path.join(OUT_DIR, REPORT_FILE)
+    with open(report_path, 'w') as f:
+        json.dump({'settings': dict(settings, test_deliveries=test_deliveries, seeds=seeds,
+                                    committee_from=committee_from),
+                   'mean_deliveries_to_target': means, 'results': results}, f, indent=2)
+    print(f"\nReport saved to {report_path}")
+    print(f"Train on a dataset with: python train_lbw_model.py {os.path.join(OUT_DIR, 'active_training_data.csv')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import numpy as np
+import pandas as pd
+import torch
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from sklearn.preprocessing import StandardScaler
+from torch.utils.data import DataLoader
+from train_lbw_model import (LBWPredictor, LBWDataset, FEATURE_NAMES, load_data_from_csv,
+                             load_data_from_json, train_model, train_model_fast)
+from test_lbw_model import load_model_and_scaler, predict_lbw, predict_lbw_batch
+
+TRAIN_CSV = '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+TEST_CSV = '../Unity/2dLBW/Assets/LBWTestData.csv'
+
+# Scaled-up copies of the training CSV; JSON and per-epoch training are
+# skipped above their limits since they take minutes at 100x
+SCALES = (1, 10, 100)
+MAX_JSON_SCALE = 10
+MAX_TRAIN_SCALE = 10
+
+
+def time_call(fn, repeats=5, warmup=1):
+    """Wall-clock seconds of repeated fn() calls, after warmup calls"""
+    for _ in range(warmup):
+        fn()
+
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+
+    return timings
+
+
+def summarize(name, timings, scale=None, rows=None):
+    result = {
+        'name': name,
+        'scale': scale,
+        'rows': rows,
+        'repeats': len(timings),
+        'min_s': float(timings.min()),
+        'median_s': float(np.median(timings)),
+        'mean_s': float(timings.mean()),
+        'p99_s': float(np.percentile(timings, 99)),
+    }
+    if rows:
+        result['rows_per_s'] = rows / result['median_s']
+
+    scale_text = f" @ {scale}x" if scale else ""
+    rate = f" ({result['rows_per_s']:,.0f} rows/s)" if rows else ""
+    print(f"  {name + scale_text:<36} median {result['median_s']*1e3:10.3f} ms{rate}")
+    return result
+
+
+def make_scaled_copies(train_csv, out_dir, scales=SCALES, max_json_scale=MAX_JSON_SCALE):
+    """
+    Tile the training CSV (and a JSON export of it) scale times
+
+    Copies are kept in out_dir and reused if already there.
+
+    Returns:
+        {scale: (csv_path, json_path or None)}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    df = pd.read_csv(train_csv)
+    df.columns = df.columns.str.strip()
+
+    copies = {}
+    for scale in scales:
+        csv_path = os.path.join(out_dir, f'train_{scale}x.csv')
+        json_path = os.path.join(out_dir, f'train_{scale}x.json') if scale <= max_json_scale else None
+
+        if not os.path.exists(csv_path):
+            # Same bytes as the Unity export, header spacing included
+            with open(train_csv, 'r') as src, open(csv_path, 'w') as dst:
+                header = src.readline()
+                body = src.read()
+                if not body.endswith('\n'):
+                    body += '\n'
+                dst.write(header)
+                for _ in range(scale):
+                    dst.write(body)
+
+        if json_path and not os.path.exists(json_path):
+            # LBWData.SaveDataset layout
+            examples = pd.concat([df] * scale).to_dict(orient='records')
+            with open(json_path, 'w') as f:
+                json.dump({'examples': examples}, f)
+
+        copies[scale] = (csv_path, json_path)
+
+    return copies
+
+
+def load_or_init_model(model_path='lbw_model_best.pth', scaler_path='scaler.pkl', X=None):
+    """The trained model if present, otherwise a fresh one (timings don't need trained weights)"""
+    if os.path.exists(model_path) and os.path.exists(scaler_path):
+        return load_model_and_scaler(model_path, scaler_path)
+
+    print("No trained model found, benchmarking an untrained LBWPredictor")
+    model = LBWPredictor(input_size=len(FEATURE_NAMES))
+    model.eval()
+    return model, StandardScaler().fit(X)
+
+
+def bench_loading(copies, results):
+    print("\nData loading")
+    for scale, (csv_path, json_path) in copies.items():
+        rows = len(load_data_from_csv(csv_path)[1])
+        repeats = 3 if scale < 100 else 1
+        results.append(summarize('load_data_from_csv', time_call(
+            lambda: load_data_from_csv(csv_path), repeats, warmup=0), scale, rows))
+        if json_path:
+            results.append(summarize('load_data_from_json', time_call(
+                lambda: load_data_from_json(json_path), repeats, warmup=0), scale, rows))
+
+
+def bench_scaler(copies, results):
+    print("\nScaler")
+    for scale, (csv_path, _) in copies.items():
+        X, _ = load_data_from_csv(csv_path)
+        scaler = StandardScaler().fit(X)
+        results.append(summarize('scaler_fit', time_call(
+            lambda: StandardScaler().fit(X)), scale, len(X)))
+        results.append(summarize('scaler_transform', time_call(
+            lambda: scaler.transform(X)), scale, len(X)))
+
+
+def bench_training(copies, results, work_dir, max_train_scale=MAX_TRAIN_SCALE):
+    """One epoch of train_model (DataLoader, batch 32) and train_model_fast"""
+    print("\nTraining (one epoch)")
+    checkpoint = os.path.join(work_dir, 'bench_checkpoint.pth')
+    torch.manual_seed(0)
+
+    for scale, (csv_path, _) in copies.items():
+        if scale > max_train_scale:
+            continue
+
+        X, y = load_data_from_csv(csv_path)
+        X = StandardScaler().fit_transform(X).astype(np.float32)
+        dataset = LBWDataset(X, y)
+        train_loader = DataLoader(dataset, batch_size=32, shuffle=True)
+        val_loader = DataLoader(dataset, batch_size=32, shuffle=False)
+
+        def dataloader_epoch():
+            model = LBWPredictor(input_size=X.shape[1])
+            # Validation runs too, so a single pass over train+val is timed
+            train_model(model, train_loader, val_loader, epochs=1, checkpoint_path=checkpoint)
+
+        def fast_epoch():
+            model = LBWPredictor(input_size=X.shape[1])
+            train_model_fast(model, (dataset.X, dataset.y), (dataset.X, dataset.y), epochs=1,
+                             checkpoint_path=checkpoint, verbose=False)
+
+        results.append(summarize('train_epoch_dataloader', time_call(
+            dataloader_epoch, repeats=1, warmup=0), scale, len(X)))
+        results.append(summarize('train_epoch_fast', time_call(
+            fast_epoch, repeats=3), scale, len(X)))
+
+
+def bench_inference(copies, results, model, scaler, X_test, single_runs=1000):
+    print("\nInference")
+    rows = np.asarray(X_test, dtype=np.float32)
+
+    # One row at a time, the way BallTracker asks for a decision
+    counter = itertools.count()
+    results.append(summarize('predict_lbw_single_row', time_call(
+        lambda: predict_lbw(model, scaler, rows[next(counter) % len(rows)]),
+        repeats=single_runs, warmup=20), rows=1))
+
+    for scale, (csv_path, _) in copies.items():
+        X, _ = load_data_from_csv(csv_path)
+        results.append(summarize('predict_lbw_batch', time_call(
+            lambda: predict_lbw_batch(model, scaler, X), repeats=3), scale, len(X)))
+
+    return rows
+
+
+def bench_onnx(copies, results, model, scaler, rows, work_dir, single_runs=1000):
+    """onnxruntime on a freshly exported (scaler folded) copy of the model"""
+    try:
+        from export_to_onnx import fold_scaler_into_model, export_onnx
+        from test_onnx import create_session, predict_onnx
+    except ImportError as e:
+        print(f"\nSkipping ONNX benchmarks ({e})")
+        return
+
+    print("\nONNX runtime")
+    onnx_path = os.path.join(work_dir, 'bench_model.onnx')
+    export_onnx(fold_scaler_into_model(model, scaler), onnx_path, input_size=rows.shape[1])
+    session = create_session(onnx_path)
+    input_name = session.get_inputs()[0].name
+
+    counter = itertools.count()
+    results.append(summarize('onnx_single_row', time_call(
+        lambda: session.run(None, {input_name: rows[next(counter) % len(rows)][None, :]}),
+        repeats=single_runs, warmup=20), rows=1))
+
+    for scale, (csv_path, _) in copies.items():
+        X = np.asarray(load_data_from_csv(csv_path)[0], dtype=np.float32)
+        results.append(summarize('onnx_batch', time_call(
+            lambda: predict_onnx(session, X), repeats=3), scale, len(X)))
+
+
+def compare_results(results, previous_path):
+    """Print the median time ratio against an earlier bench_results.json"""
+    with open(previous_path, 'r') as f:
+        previous = {(r['name'], r['scale']): r for r in json.load(f)['results']}
+
+    print(f"\nCompared with {previous_path} (ratio > 1 is slower):")
+    for r in results:
+        before = previous.get((r['name'], r['scale']))
+        if before:
+            ratio = r['median_s'] / before['median_s']
+            flag = '  <-- regression' if ratio > 1.2 else ''
+            scale_text = f" @ {r['scale']}x" if r['scale'] else ""
+            print(f"  {r['name'] + scale_text:<36} {ratio:6.2f}x{flag}")
+
+
+def run_benchmarks(train_csv=TRAIN_CSV, test_csv=TEST_CSV, scales=SCALES,
+                   work_dir='bench_data', max_json_scale=MAX_JSON_SCALE,
+                   max_train_scale=MAX_TRAIN_SCALE):
+    copies = make_scaled_copies(train_csv, work_dir, scales, max_json_scale)
+    X_test, _ = load_data_from_csv(test_csv)
+    model, scaler = load_or_init_model(X=X_test)
+
+    results = []
+    bench_loading(copies, results)
+    bench_scaler(copies, results)
+    bench_training(copies, results, work_dir, max_train_scale)
+    rows = bench_inference(copies, results, model, scaler, X_test)
+    bench_onnx(copies, results, model, scaler, rows, work_dir)
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'torch': torch.__version__,
+            'torch_threads': torch.get_num_threads(),
+            'numpy': np.__version__,
+        },
+        'results': results,
+    }
+
+
+def main():
+    """
+    Usage: python bench_lbw.py [--scales 1,10,100] [--compare previous.json] [--out bench_results.json]
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    for path in (TRAIN_CSV, TEST_CSV):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found")
+            return
+
+    scales = tuple(int(s) for s in option('--scales', ','.join(map(str, SCALES))).split(','))
+    out_path = option('--out', 'bench_results.json')
+    previous = option('--compare', None)
+
+    report = run_benchmarks(scales=scales)
+
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {out_path}")
+
+    if previous and os.path.exists(previous):
+        compare_results(report['results'], previous)
+
+
+if __name__ == '__main__':
+    main()
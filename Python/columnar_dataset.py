@@ -0,0 +1,282 @@
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import os
+import sys
+
+# Feature columns written by LBWData.SaveAsCSV, in model input order
+FEATURE_NAMES = ['spinType', 'speed', 'spinAmount', 'timeSinceRelease',
+                 'ballPosX', 'ballPosY', 'ballVelX', 'ballVelY',
+                 'ballAngularVel', 'distanceToStumps', 'distanceToPad',
+                 'hitPad', 'reachedPad']
+LABEL_NAME = 'willHitStumps'
+
+# Impact-only feature set: the ball's state at the pad, as listed in
+# Thoughts.md (impact X/Y, velocity X/Y, spin direction and magnitude)
+IMPACT_FEATURE_NAMES = ['spinType', 'spinAmount', 'ballPosX', 'ballPosY',
+                        'ballVelX', 'ballVelY', 'ballAngularVel', 'hitPad']
+
+MANIFEST_NAME = 'manifest.json'
+FEATURES_FILE = 'features.npy'
+LABEL_FILE = 'label.npy'
+
+# Written next to the CSV shards by generate_lbw_data.py
+SHARD_MANIFEST = 'shards.json'
+
+
+def count_csv_rows(csv_path, chunk_size=1 << 24):
+    """Count data rows in a CSV by counting newlines, without parsing it"""
+    lines = 0
+    last_byte = b'\n'
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            lines += chunk.count(b'\n')
+            last_byte = chunk[-1:]
+
+    # Final line without a trailing newline still counts
+    if last_byte != b'\n':
+        lines += 1
+
+    # Header row
+    return lines - 1
+
+
+def open_columnar_output(out_dir, rows, feature_names):
+    """Create the memory-mapped output arrays for a converted dataset"""
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Fortran order keeps every feature contiguous on disk (one column
+    # after another) while still loading as a single (rows, features) array
+    features = np.lib.format.open_memmap(
+        os.path.join(out_dir, FEATURES_FILE), mode='w+', dtype=np.float32,
+        shape=(rows, len(feature_names)), fortran_order=True)
+    label = np.lib.format.open_memmap(
+        os.path.join(out_dir, LABEL_FILE), mode='w+', dtype=np.float32,
+        shape=(rows,))
+
+    return features, label
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(out_dir, rows, source, feature_names):
+    # Content hashes, not just sizes: the manifest is the dataset's cache
+    # key in test_lbw_model.file_hash, and a regenerated source of the
+    # same size must not reuse stale predictions
+    manifest = {
+        'rows': rows,
+        'dtype': 'float32',
+        'feature_names': list(feature_names),
+        'label': LABEL_NAME,
+        'features_file': FEATURES_FILE,
+        'label_file': LABEL_FILE,
+        'source': os.path.abspath(source),
+        'source_size': os.path.getsize(source),
+        'source_sha256': sha256_file(source),
+        'features_sha256': sha256_file(os.path.join(out_dir, FEATURES_FILE)),
+        'label_sha256': sha256_file(os.path.join(out_dir, LABEL_FILE)),
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def convert_csv_to_columnar(csv_path, out_dir, chunksize=1_000_000):
+    """
+    Convert a Unity CSV export into a float32 columnar dataset directory
+
+    The CSV is read in chunks straight into memory-mapped output arrays,
+    so conversion never holds more than one chunk in memory.
+    """
+    rows = count_csv_rows(csv_path)
+    features, label = open_columnar_output(out_dir, rows, FEATURE_NAMES)
+
+    written = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=np.float32):
+        # Strip whitespace from column names
+        chunk.columns = chunk.columns.str.strip()
+
+        end = written + len(chunk)
+        features[written:end] = chunk[FEATURE_NAMES].values
+        label[written:end] = chunk[LABEL_NAME].values
+        written = end
+
+    if written != rows:
+        raise ValueError(f"Expected {rows} rows in {csv_path}, parsed {written}")
+
+    features.flush()
+    label.flush()
+
+    return write_manifest(out_dir, rows, csv_path, FEATURE_NAMES)
+
+
+def convert_json_to_columnar(json_path, out_dir):
+    """Convert a LBWData.SaveDataset JSON export into a columnar dataset directory"""
+    with open(json_path, 'r') as f:
+        examples = json.load(f)['examples']
+
+    features, label = open_columnar_output(out_dir, len(examples), FEATURE_NAMES)
+
+    # LBWData.TrainingExample names the reachedPad column reachedPadPosition
+    json_keys = {name: name for name in FEATURE_NAMES}
+    json_keys['reachedPad'] = 'reachedPadPosition'
+
+    for i, name in enumerate(FEATURE_NAMES):
+        key = json_keys[name]
+        features[:, i] = np.fromiter(
+            (ex[key] if key in ex else ex[name] for ex in examples),
+            dtype=np.float32, count=len(examples))
+    label[:] = np.fromiter((ex[LABEL_NAME] for ex in examples),
+                           dtype=np.float32, count=len(examples))
+
+    features.flush()
+    label.flush()
+
+    return write_manifest(out_dir, len(examples), json_path, FEATURE_NAMES)
+
+
+def load_columnar(dataset_dir, feature_names=None):
+    """
+    Memory-map a converted dataset directory
+
+    Returns:
+        X: (rows, features) float32 array backed by the file on disk
+        y: (rows,) float32 label array backed by the file on disk
+
+    Selecting a subset of feature_names copies just those columns.
+    """
+    with open(os.path.join(dataset_dir, MANIFEST_NAME), 'r') as f:
+        manifest = json.load(f)
+
+    X = np.load(os.path.join(dataset_dir, manifest['features_file']), mmap_mode='r')
+    y = np.load(os.path.join(dataset_dir, manifest['label_file']), mmap_mode='r')
+
+    if feature_names is not None and list(feature_names) != manifest['feature_names']:
+        indices = [manifest['feature_names'].index(name) for name in feature_names]
+        X = X[:, indices]
+
+    return X, y
+
+
+def assign_delivery_ids(X, feature_names=FEATURE_NAMES):
+    """
+    Rebuild a delivery ID for every frame-level row
+
+    FastDataCollector.FinalizeBall writes all frames of a delivery in a
+    row, and spinType/speed are constant within a delivery. A new delivery
+    starts wherever timeSinceRelease stops increasing or spinType/speed
+    change.
+
+    Returns:
+        int64 array of delivery IDs, numbered from 0 in file order
+    """
+    time = X[:, feature_names.index('timeSinceRelease')]
+    spin = X[:, feature_names.index('spinType')]
+    speed = X[:, feature_names.index('speed')]
+
+    new_delivery = np.ones(len(time), dtype=bool)
+    new_delivery[1:] = ((time[1:] <= time[:-1]) |
+                        (spin[1:] != spin[:-1]) |
+                        (speed[1:] != speed[:-1]))
+
+    return np.cumsum(new_delivery) - 1
+
+
+def delivery_validation_mask(X, val_fraction=0.2, seed=0, feature_names=FEATURE_NAMES):
+    """
+    Assign whole deliveries to validation without needing delivery IDs
+
+    Hashes each row's (spinType, speed) pair, which is constant within a
+    delivery, so the split is stable across chunk boundaries and shards.
+    """
+    speed = np.ascontiguousarray(X[:, feature_names.index('speed')], dtype=np.float32)
+    spin = X[:, feature_names.index('spinType')].astype(np.uint64)
+
+    # splitmix64 finaliser over the speed bits, spin type and seed
+    with np.errstate(over='ignore'):
+        key = speed.view(np.uint32).astype(np.uint64) ^ (spin << np.uint64(32))
+        key += np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        key ^= key >> np.uint64(30)
+        key *= np.uint64(0xBF58476D1CE4E5B9)
+        key ^= key >> np.uint64(27)
+        key *= np.uint64(0x94D049BB133111EB)
+        key ^= key >> np.uint64(31)
+
+    return (key >> np.uint64(11)).astype(np.float64) / float(1 << 53) < val_fraction
+
+
+def impact_row_indices(X, feature_names=FEATURE_NAMES):
+    """
+    Index of the impact row of every delivery
+
+    The impact row is the first frame recorded with reachedPad set (the
+    frame RecordAllActiveBalls writes as the ball reaches the pad), or the
+    delivery's last frame if it never got there.
+    """
+    delivery_ids = assign_delivery_ids(X, feature_names)
+    n_deliveries = delivery_ids[-1] + 1 if len(delivery_ids) else 0
+
+    last_rows = np.flatnonzero(np.r_[delivery_ids[1:] != delivery_ids[:-1], True])
+
+    reached = np.flatnonzero(X[:, feature_names.index('reachedPad')] == 1)
+    first_reached = np.full(n_deliveries, -1)
+    # Assigning in reverse leaves the earliest row per delivery
+    first_reached[delivery_ids[reached][::-1]] = reached[::-1]
+
+    return np.where(first_reached >= 0, first_reached, last_rows)
+
+
+def reduce_to_impacts(X, y, feature_names=FEATURE_NAMES):
+    """
+    One row per delivery, still in the full frame-level column order
+
+    Every frame of a delivery carries the same label, so nothing is lost
+    for the impact-only model. Select IMPACT_FEATURE_NAMES afterwards with
+    select_features.
+    """
+    rows = impact_row_indices(X, feature_names)
+    return np.asarray(X)[rows], np.asarray(y)[rows]
+
+
+def select_features(X, names, feature_names=FEATURE_NAMES):
+    return np.asarray(X)[:, [feature_names.index(name) for name in names]]
+
+
+def is_columnar_dataset(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def main():
+    """Convert the Unity training and test exports"""
+    if len(sys.argv) == 3:
+        exports = [(sys.argv[1], sys.argv[2])]
+    else:
+        exports = [
+            ('../Unity/2dLBW/Assets/LBWTrainingData.csv', 'data/LBWTrainingData'),
+            ('../Unity/2dLBW/Assets/LBWTestData.csv', 'data/LBWTestData'),
+        ]
+
+    for source, out_dir in exports:
+        if not os.path.exists(source):
+            print(f"Skipping {source} (not found)")
+            continue
+
+        if source.endswith('.json'):
+            manifest = convert_json_to_columnar(source, out_dir)
+        else:
+            manifest = convert_csv_to_columnar(source, out_dir)
+
+        print(f"Converted {manifest['rows']} rows from {source} to {out_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import onnx
+from onnx import helper, TensorProto
+import json
+import os
+import sys
+import time
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from columnar_dataset import FEATURE_NAMES, assign_delivery_ids
+from train_lbw_model import LBWPredictor, load_dataset, split_by_delivery, train_model_fast
+from test_lbw_model import load_model_and_scaler, load_test_data, predict_lbw_batch
+from export_to_onnx import OPSET_VERSION, IR_VERSION, fold_scaler_into_model, export_onnx, simplify_onnx
+from export_scalar_to_json import scaler_params
+from test_onnx import load_scaler_params
+from quantize_lbw_model import measure_variant
+from lbw_simulator import STUMPS_POSITION, GRAVITY
+
+# Teacher logits are clipped before the tree model regresses on them,
+# sigmoid(10) is already 0.99995
+MAX_LOGIT = 10.0
+
+# Physics features the logistic regression gets on top of the raw 13
+ENGINEERED_FEATURE_NAMES = ['timeToStumps', 'heightAtStumps', 'offsetFromStumps']
+
+
+def soft_targets(teacher_probs, y, alpha=0.7):
+    """Blend the teacher's probabilities with the true labels"""
+    return (alpha * teacher_probs + (1 - alpha) * np.asarray(y, dtype=np.float32)).astype(np.float32)
+
+
+class EngineeredFeatures(nn.Module):
+    """
+    Raw features plus a ballistic guess at where the ball meets the stumps
+
+    Straight-line flight time to the stumps' x, the height the ball would
+    be at by then under gravity alone (no bounce, no pad) and its distance
+    from the middle of the stumps. Exports as Slice, Sub, Add, Mul, Div,
+    Clip (the clamp), Abs and Concat, all ops Barracuda runs.
+    """
+
+    def forward(self, x):
+        pos_x, pos_y = x[:, 4:5], x[:, 5:6]
+        vel_x, vel_y = x[:, 6:7], x[:, 7:8]
+
+        time_to_stumps = (STUMPS_POSITION[0] - pos_x) / torch.clamp(vel_x, min=1.0)
+        height = pos_y + vel_y * time_to_stumps + 0.5 * GRAVITY * time_to_stumps * time_to_stumps
+        offset = torch.abs(height - STUMPS_POSITION[1])
+
+        return torch.cat([x, time_to_stumps, height, offset], dim=1)
+
+
+class LogisticStudent(nn.Module):
+    """Logistic regression on EngineeredFeatures, taking raw features"""
+
+    def __init__(self, input_size=13):
+        super(LogisticStudent, self).__init__()
+        self.features = EngineeredFeatures()
+        self.linear = nn.Linear(input_size + len(ENGINEERED_FEATURE_NAMES), 1)
+
+    def forward(self, x):
+        return torch.sigmoid(self.linear(self.features(x)))
+
+
+def distill_mlp(X_train, soft_train, X_val, soft_val, scaler, hidden=16, epochs=200,
+                checkpoint_path='lbw_student_mlp.pth'):
+    """
+    Train a 13 -> hidden -> 1 LBWPredictor on the soft targets
+
+    BCELoss takes probabilities as targets, so train_model_fast is reused
+    as is (its accuracy counts are meaningless for soft targets and are
+    ignored). The best weights (on scaled inputs) are kept in
+    checkpoint_path; the returned student has the scaler folded in.
+    """
+    student = LBWPredictor(input_size=X_train.shape[1], hidden_sizes=(hidden,), dropout_layers=0)
+    train = (torch.from_numpy(scaler.transform(X_train).astype(np.float32)),
+             torch.from_numpy(soft_train).unsqueeze(1))
+    val = (torch.from_numpy(scaler.transform(X_val).astype(np.float32)),
+           torch.from_numpy(soft_val).unsqueeze(1))
+
+    train_model_fast(student, train, val, epochs=epochs, lr=0.003, checkpoint_path=checkpoint_path,
+                     verbose=False, patience=20, min_delta=1e-5)
+
+    # Best validation epoch, not the last one
+    student.load_state_dict(torch.load(checkpoint_path))
+    student = student.cpu().eval()
+    return fold_scaler_into_model(student, scaler)
+
+
+def distill_logistic(X_train, soft_train):
+    """
+    Fit LogisticStudent to the soft targets
+
+    Cross-entropy against a soft target p is the same as two copies of each
+    row labelled 1 and 0 with weights p and 1 - p, which LogisticRegression
+    fits directly. The engineered features are standardised for the fit and
+    the standardisation is folded into the linear layer afterwards.
+    """
+    student = LogisticStudent(input_size=X_train.shape[1]).eval()
+    with torch.no_grad():
+        features = student.features(torch.from_numpy(np.asarray(X_train, dtype=np.float32))).numpy()
+
+    scaler = StandardScaler().fit(features)
+    scaled = scaler.transform(features)
+    n = len(scaled)
+
+    regression = LogisticRegression(max_iter=2000)
+    regression.fit(np.concatenate([scaled, scaled]),
+                   np.concatenate([np.ones(n), np.zeros(n)]),
+                   sample_weight=np.concatenate([soft_train, 1 - soft_train]))
+
+    weight = regression.coef_[0] / scaler.scale_
+    bias = regression.intercept_[0] - weight @ scaler.mean_
+    with torch.no_grad():
+        student.linear.weight.copy_(torch.as_tensor(weight[None, :], dtype=torch.float32))
+        student.linear.bias.copy_(torch.as_tensor([bias], dtype=torch.float32))
+
+    return student
+
+
+def distill_gbt(X_train, teacher_probs, trees=200, depth=4, seed=0):
+    """
+    Gradient-boosted trees regressing the teacher's logits
+
+    Trees split on raw feature values, so no scaler is needed; the
+    prediction is a logit and goes through a sigmoid at inference.
+    """
+    probs = np.clip(teacher_probs.astype(np.float64), 1 / (1 + np.exp(MAX_LOGIT)),
+                    1 / (1 + np.exp(-MAX_LOGIT)))
+    logits = np.log(probs / (1 - probs))
+
+    gbt = GradientBoostingRegressor(n_estimators=trees, max_depth=depth,
+                                    learning_rate=0.1, subsample=0.8, random_state=seed)
+    return gbt.fit(np.asarray(X_train, dtype=np.float32), logits)
+
+
+def predict_gbt(gbt, X):
+    return (1 / (1 + np.exp(-gbt.predict(np.asarray(X, dtype=np.float32))))).astype(np.float32)
+
+
+def float32_threshold(threshold):
+    """
+    Largest float32 <= threshold
+
+    scikit-learn compares float32 features against float64 thresholds;
+    rounding the threshold down keeps x <= t exact once both are float32.
+    """
+    t = np.float32(threshold)
+    if t > threshold:
+        t = np.nextafter(t, np.float32(-np.inf))
+    return float(t)
+
+
+def export_gbt_onnx(gbt, onnx_path, input_size=13):
+    """
+    Write the tree model as TreeEnsembleRegressor -> Sigmoid
+
+    Same contract as the other exports: 'input' (batch, 13) raw features,
+    'output' (batch, 1) stump-hit probability. TreeEnsembleRegressor is in
+    the ai.onnx.ml domain, which onnxruntime runs but Barracuda does not.
+    """
+    attrs = {key: [] for key in ('nodes_treeids', 'nodes_nodeids', 'nodes_featureids',
+                                 'nodes_values', 'nodes_modes', 'nodes_truenodeids',
+                                 'nodes_falsenodeids', 'target_treeids', 'target_nodeids',
+                                 'target_ids', 'target_weights')}
+
+    for tree_id, estimator in enumerate(gbt.estimators_[:, 0]):
+        tree = estimator.tree_
+        for node in range(tree.node_count):
+            leaf = tree.children_left[node] == -1
+            attrs['nodes_treeids'].append(tree_id)
+            attrs['nodes_nodeids'].append(node)
+            attrs['nodes_featureids'].append(0 if leaf else int(tree.feature[node]))
+            attrs['nodes_values'].append(0.0 if leaf else float32_threshold(tree.threshold[node]))
+            attrs['nodes_modes'].append('LEAF' if leaf else 'BRANCH_LEQ')
+            attrs['nodes_truenodeids'].append(0 if leaf else int(tree.children_left[node]))
+            attrs['nodes_falsenodeids'].append(0 if leaf else int(tree.children_right[node]))
+            if leaf:
+                attrs['target_treeids'].append(tree_id)
+                attrs['target_nodeids'].append(node)
+                attrs['target_ids'].append(0)
+                attrs['target_weights'].append(float(gbt.learning_rate * tree.value[node, 0, 0]))
+
+    ensemble = helper.make_node('TreeEnsembleRegressor', ['input'], ['logit'], domain='ai.onnx.ml',
+                                n_targets=1, aggregate_function='SUM', post_transform='NONE',
+                                base_values=[float(gbt.init_.constant_.ravel()[0])], **attrs)
+    sigmoid = helper.make_node('Sigmoid', ['logit'], ['output'])
+
+    graph = helper.make_graph(
+        [ensemble, sigmoid], 'lbw_gbt_student',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['batch_size', input_size])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, ['batch_size', 1])])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', OPSET_VERSION),
+                                                    helper.make_opsetid('ai.onnx.ml', 1)])
+    model.ir_version = IR_VERSION
+    onnx.checker.check_model(model)
+    onnx.save(model, onnx_path)
+
+
+def export_torch_student(model, onnx_path, input_size=13):
+    export_onnx(model, onnx_path, input_size=input_size)
+    simplify_onnx(onnx_path)
+
+
+def predict_torch(model, X):
+    with torch.inference_mode():
+        return model(torch.from_numpy(np.asarray(X, dtype=np.float32))).squeeze(1).numpy()
+
+
+def simulated_rows(deliveries, seed=0):
+    """Extra unlabelled frames from lbw_simulator.py, for the teacher to label"""
+    from generate_lbw_data import CURRICULUM
+    from lbw_simulator import simulate_deliveries
+
+    rng = np.random.default_rng(seed)
+    # Same stage split as plan_shards: each stage starts at its fraction
+    boundaries = [int(round(fraction * deliveries)) for fraction, _, _ in CURRICULUM] + [deliveries]
+    parts = []
+    for (_, angle_min, angle_max), start, end in zip(CURRICULUM, boundaries, boundaries[1:]):
+        if end > start:
+            X, _, _ = simulate_deliveries(end - start, rng, params={'angle_min': angle_min,
+                                                                    'angle_max': angle_max})
+            parts.append(X)
+
+    return np.concatenate(parts)
+
+
+def print_table(report):
+    print("\n" + "="*104)
+    print("DISTILLATION REPORT")
+    print("="*104)
+    print(f"{'model':<12}{'params':>9}{'size (B)':>10}{'single p50 (us)':>17}{'single p99 (us)':>17}"
+          f"{'batched (us/row)':>18}{'accuracy':>10}{'recall':>10}")
+    for name, r in report.items():
+        print(f"{name:<12}{r['parameters']:>9,}{r['size_bytes']:>10,}{r['single_p50_us']:>17.1f}"
+              f"{r['single_p99_us']:>17.1f}{r['batched_us_per_row']:>18.3f}"
+              f"{r['accuracy']:>10.2%}{r['recall']:>10.2%}")
+
+
+def cheapest_meeting(report, min_accuracy, min_recall=0.0):
+    """Name of the model with the lowest single-row p50 latency that clears the bar"""
+    passing = [(r['single_p50_us'], name) for name, r in report.items()
+               if r['accuracy'] >= min_accuracy and r['recall'] >= min_recall]
+    return min(passing)[1] if passing else None
+
+
+def main():
+    """
+    Usage: python distill_lbw_model.py [--hidden 16] [--trees 200] [--depth 4] [--simulated N]
+                                       [--min-accuracy 0.98] [--min-recall 0.95]
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    teacher_path = 'lbw_model_best.pth'
+    scaler_path = 'scaler.pkl'
+    train_csv = '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+
+    for path in (teacher_path, scaler_path, train_csv, test_csv):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found, run train_lbw_model.py first")
+            return
+
+    teacher, scaler = load_model_and_scaler(teacher_path, scaler_path)
+    if teacher.network[0].in_features != len(FEATURE_NAMES):
+        print("ERROR: distillation needs the 13-feature frame-level teacher")
+        return
+
+    print("Labelling training data with the teacher...")
+    X, y = load_dataset(train_csv)
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    train_idx, val_idx = split_by_delivery(assign_delivery_ids(X))
+
+    X_train, y_train = X[train_idx], y[train_idx]
+    teacher_train = predict_lbw_batch(teacher, scaler, X_train)
+    soft_train = soft_targets(teacher_train, y_train)
+
+    simulated = int(option('--simulated', 0))
+    if simulated:
+        X_sim = simulated_rows(simulated)
+        sim_probs = predict_lbw_batch(teacher, scaler, X_sim)
+        print(f"  + {len(X_sim):,} simulated frames from {simulated:,} deliveries")
+        X_train = np.concatenate([X_train, X_sim])
+        teacher_train = np.concatenate([teacher_train, sim_probs])
+        # No ground truth for simulated rows here, the teacher is the target
+        soft_train = np.concatenate([soft_train, sim_probs])
+
+    X_val = X[val_idx]
+    soft_val = soft_targets(predict_lbw_batch(teacher, scaler, X_val), y[val_idx])
+    print(f"Train rows: {len(X_train):,}, validation rows: {len(X_val):,}")
+
+    students = {}
+
+    print(f"\nDistilling 2-layer MLP (13 -> {option('--hidden', 16)} -> 1)...")
+    start = time.perf_counter()
+    mlp = distill_mlp(X_train, soft_train, X_val, soft_val, scaler, hidden=int(option('--hidden', 16)))
+    students['mlp'] = ('lbw_student_mlp.onnx', mlp, lambda X_: predict_torch(mlp, X_), time.perf_counter() - start)
+    export_torch_student(mlp, 'lbw_student_mlp.onnx')
+
+    print("Distilling gradient-boosted trees...")
+    start = time.perf_counter()
+    gbt = distill_gbt(X_train, teacher_train, trees=int(option('--trees', 200)),
+                      depth=int(option('--depth', 4)))
+    students['gbt'] = ('lbw_student_gbt.onnx', gbt, lambda X_: predict_gbt(gbt, X_), time.perf_counter() - start)
+    export_gbt_onnx(gbt, 'lbw_student_gbt.onnx')
+
+    print("Distilling logistic regression on engineered features...")
+    start = time.perf_counter()
+    logistic = distill_logistic(X_train, soft_train)
+    students['logistic'] = ('lbw_student_logistic.onnx', logistic,
+                            lambda X_: predict_torch(logistic, X_), time.perf_counter() - start)
+    export_torch_student(logistic, 'lbw_student_logistic.onnx')
+
+    # The teacher goes through the same export, so the table compares like with like
+    teacher_onnx = 'lbw_teacher.onnx'
+    export_torch_student(fold_scaler_into_model(teacher, scaler), teacher_onnx)
+
+    # Every export takes raw features, pair them with the identity scaler params
+    with open('scaler_params_student.json', 'w') as f:
+        json.dump(scaler_params(scaler, folded=True), f, indent=2)
+    folded_params = load_scaler_params('scaler_params_student.json')
+
+    print("\nMeasuring on the test set...")
+    X_test, y_true = load_test_data(test_csv)
+    X_test = np.asarray(X_test, dtype=np.float32)
+    teacher_probs = predict_lbw_batch(teacher, scaler, X_test)
+
+    report = {}
+    models = {'teacher': (teacher_onnx, teacher, lambda X_: teacher_probs, None)}
+    models.update(students)
+    for name, (onnx_path, model, predict, seconds) in models.items():
+        result = measure_variant(onnx_path, X_test, y_true, folded_params)
+        probs = result.pop('probabilities')
+        native = predict(X_test)
+
+        if isinstance(model, nn.Module):
+            result['parameters'] = sum(p.numel() for p in model.parameters())
+        else:
+            result['parameters'] = sum(e.tree_.node_count for e in model.estimators_[:, 0])
+        result['max_diff_vs_native'] = float(np.abs(probs - native).max())
+        result['agreement_with_teacher'] = float(np.mean((probs >= 0.5) == (teacher_probs >= 0.5)))
+        result['distill_seconds'] = seconds
+        result['path'] = onnx_path
+        report[name] = result
+
+    print_table(report)
+    print(f"\n{'model':<12}{'agrees w/ teacher':>19}{'max |onnx - native|':>21}")
+    for name, r in report.items():
+        print(f"{name:<12}{r['agreement_with_teacher']:>19.2%}{r['max_diff_vs_native']:>21.2e}")
+
+    min_accuracy = float(option('--min-accuracy', report['teacher']['accuracy'] - 0.005))
+    min_recall = float(option('--min-recall', 0.0))
+    choice = cheapest_meeting(report, min_accuracy, min_recall)
+    print(f"\nCheapest model with accuracy >= {min_accuracy:.2%} and recall >= {min_recall:.2%}: "
+          f"{choice or 'none'}")
+
+    with open('distillation_report.json', 'w') as f:
+        json.dump({'min_accuracy': min_accuracy, 'min_recall': min_recall,
+                   'recommended': choice, 'models': report}, f, indent=2)
+    print("Saved distillation_report.json")
+
+    print("\nTo use a student in Unity, copy it and scaler_params_student.json into")
+    print("Unity/2dLBW/Assets/Resources/. The gbt student uses ai.onnx.ml, which")
+    print("Barracuda cannot load; it is for onnxruntime consumers (e.g. lbw_server.py).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,509 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from sklearn.preprocessing import StandardScaler
+from sklearn.isotonic import IsotonicRegression
+from scipy.optimize import minimize_scalar
+import pickle
+import copy
+import json
+import time
+import os
+import sys
+from columnar_dataset import assign_delivery_ids
+from train_lbw_model import LBWPredictor, load_dataset, split_by_delivery, EarlyStopping, report_stopping
+from export_to_onnx import OPSET_VERSION, simplify_onnx
+from export_scalar_to_json import scaler_params
+
+ENSEMBLE_MODEL_PATH = 'lbw_ensemble_best.pth'
+ENSEMBLE_SCALER_PATH = 'scaler_ensemble.pkl'
+ENSEMBLE_ONNX_PATH = 'lbw_ensemble.onnx'
+ENSEMBLE_SCALER_JSON = 'scaler_params_ensemble.json'
+
+CALIBRATION_METHODS = ('temperature', 'isotonic', 'none')
+
+
+class LBWEnsemble(nn.Module):
+    """
+    K LBWPredictors trained together as stacked weight tensors
+
+    Layer i holds a (K, out, in) weight and a (K, out) bias, so one
+    batched matmul per layer runs every member. Members are initialised
+    as standalone LBWPredictors with seeds seed..seed+K-1 and stacked
+    with torch.func.stack_module_state.
+
+    Calibration is kept in buffers so it is saved with the weights:
+    temperature divides every member's logit, and when isotonic_x is
+    non-empty the mean probability is then mapped through the isotonic
+    fit (linear between knots).
+    """
+
+    def __init__(self, members=5, input_size=13, hidden_sizes=(128, 64, 32, 16),
+                 dropout=0.2, dropout_layers=2, seed=0):
+        super(LBWEnsemble, self).__init__()
+        models = []
+        for k in range(members):
+            torch.manual_seed(seed + k)
+            models.append(LBWPredictor(input_size, hidden_sizes, dropout, dropout_layers))
+        params, _ = torch.func.stack_module_state(models)
+
+        linear_keys = sorted({key.rsplit('.', 1)[0] for key in params}, key=lambda k: int(k.split('.')[1]))
+        self.weights = nn.ParameterList([nn.Parameter(params[f'{key}.weight'].detach()) for key in linear_keys])
+        self.biases = nn.ParameterList([nn.Parameter(params[f'{key}.bias'].detach()) for key in linear_keys])
+        self.dropout = dropout
+        self.dropout_layers = dropout_layers
+
+        self.register_buffer('temperature', torch.ones(()))
+        self.register_buffer('isotonic_x', torch.zeros(0))
+        self.register_buffer('isotonic_y', torch.zeros(0))
+
+    @property
+    def members(self):
+        return self.weights[0].shape[0]
+
+    def logits(self, x):
+        """
+        Member logits for scaled features
+
+        x is (N, features) to give every member the same rows, or
+        (K, N, features) for a different batch per member. Returns (K, N).
+        """
+        h = x
+        last = len(self.weights) - 1
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            h = torch.matmul(h, weight.transpose(1, 2)) + bias.unsqueeze(1)
+            if i < last:
+                h = torch.relu(h)
+                if i < self.dropout_layers:
+                    h = nn.functional.dropout(h, self.dropout, self.training)
+        return h.squeeze(2)
+
+    def forward(self, x):
+        """Uncalibrated member probabilities, (K, N)"""
+        return torch.sigmoid(self.logits(x))
+
+    def predict(self, x):
+        """
+        Calibrated mean probability and the variance across members, both (N,)
+
+        The variance is of the temperature-scaled member probabilities.
+        With isotonic calibration only the mean is remapped, so the
+        variance is on the pre-isotonic scale, not the returned mean's.
+        """
+        probs = torch.sigmoid(self.logits(x) / self.temperature)
+        mean = probs.mean(dim=0)
+        variance = probs.var(dim=0, unbiased=False)
+        if len(self.isotonic_x):
+            mean = interpolate(mean, self.isotonic_x, self.isotonic_y)
+        return mean, variance
+
+    def member(self, k):
+        """Member k as a standalone LBWPredictor (for comparison with K separate passes)"""
+        sizes = tuple(w.shape[1] for w in self.weights[:-1])
+        model = LBWPredictor(self.weights[0].shape[2], sizes, self.dropout, self.dropout_layers)
+        linears = [layer for layer in model.network if isinstance(layer, nn.Linear)]
+        with torch.no_grad():
+            for layer, weight, bias in zip(linears, self.weights, self.biases):
+                layer.weight.copy_(weight[k])
+                layer.bias.copy_(bias[k])
+        return model.eval()
+
+
+def interpolate(x, knots_x, knots_y):
+    """np.interp for tensors: linear between knots, flat outside them"""
+    idx = torch.searchsorted(knots_x, x).clamp(1, len(knots_x) - 1)
+    x0, x1 = knots_x[idx - 1], knots_x[idx]
+    y0, y1 = knots_y[idx - 1], knots_y[idx]
+    t = ((x - x0) / (x1 - x0)).clamp(0, 1)
+    return y0 + t * (y1 - y0)
+
+
+def train_ensemble(ensemble, train_data, val_data, epochs=100, lr=0.001, batch_size=1024,
+                   patience=10, verbose=True):
+    """
+    Train every member at once, each on its own shuffle of the training rows
+
+    Each member keeps the weights of its own best validation epoch, so
+    members that converge at different speeds are not cut short or
+    overtrained together. Training stops when the members' mean
+    validation loss stops improving.
+
+    Returns:
+        Per-epoch list of member validation losses
+    """
+    X_train, y_train = train_data
+    X_val, y_val = val_data
+    K = ensemble.members
+
+    optimizer = optim.Adam(ensemble.parameters(), lr=lr)
+    stopper = EarlyStopping(patience)
+    best_loss = torch.full((K,), float('inf'))
+    best_params = [p.detach().clone() for p in ensemble.parameters()]
+    history = []
+
+    # Still defined for report_stopping when epochs is 0
+    epoch = -1
+    for epoch in range(epochs):
+        ensemble.train()
+        permutations = torch.stack([torch.randperm(len(X_train)) for _ in range(K)])
+        for start in range(0, len(X_train), batch_size):
+            idx = permutations[:, start:start + batch_size]
+            logits = ensemble.logits(X_train[idx])
+            loss = nn.functional.binary_cross_entropy_with_logits(logits, y_train[idx], reduction='none')
+
+            optimizer.zero_grad(set_to_none=True)
+            # Members share no weights, summing their mean losses trains each independently
+            loss.mean(dim=1).sum().backward()
+            optimizer.step()
+
+        ensemble.eval()
+        with torch.inference_mode():
+            logits = ensemble.logits(X_val)
+            val_losses = nn.functional.binary_cross_entropy_with_logits(
+                logits, y_val.expand_as(logits), reduction='none').mean(dim=1)
+
+        improved = val_losses < best_loss
+        best_loss = torch.where(improved, val_losses, best_loss)
+        for best, param in zip(best_params, ensemble.parameters()):
+            best[improved] = param.detach()[improved]
+        history.append(val_losses.tolist())
+
+        if verbose and (epoch + 1) % 10 == 0:
+            print(f'Epoch [{epoch+1}/{epochs}]')
+            print(f'  Member val losses: {", ".join(f"{v:.4f}" for v in val_losses.tolist())}')
+
+        if stopper.step(epoch, val_losses.mean().item()):
+            break
+
+    if verbose:
+        report_stopping(stopper, stopper.best_epoch, epoch, epochs)
+
+    with torch.no_grad():
+        for best, param in zip(best_params, ensemble.parameters()):
+            param.copy_(best)
+    ensemble.eval()
+    return history
+
+
+def nll(probs, y, eps=1e-7):
+    probs = np.clip(probs, eps, 1 - eps)
+    return float(-np.mean(y * np.log(probs) + (1 - y) * np.log(1 - probs)))
+
+
+def expected_calibration_error(probs, y, bins=10):
+    """Mean |hit rate - mean probability| over equal-width bins, weighted by count"""
+    index = np.minimum((np.asarray(probs) * bins).astype(int), bins - 1)
+    mean_prob = np.bincount(index, weights=probs, minlength=bins)
+    hits = np.bincount(index, weights=y, minlength=bins)
+    return float(np.abs(hits - mean_prob).sum() / len(probs))
+
+
+def calibrate(ensemble, X_val, y_val, method='temperature'):
+    """
+    Fit the ensemble's calibration on validation rows, in place
+
+    'temperature' picks the single logit temperature with the lowest
+    validation NLL of the mean probability; 'isotonic' fits a monotone
+    map from the uncalibrated mean to the hit rate.
+    """
+    with torch.inference_mode():
+        logits = ensemble.logits(X_val).double().numpy()
+    y = y_val.numpy().astype(np.float64)
+
+    ensemble.temperature.fill_(1.0)
+    ensemble.isotonic_x = torch.zeros(0)
+    ensemble.isotonic_y = torch.zeros(0)
+
+    if method == 'temperature':
+        def loss(log_t):
+            return nll((1 / (1 + np.exp(-logits / np.exp(log_t)))).mean(axis=0), y)
+        result = minimize_scalar(loss, bounds=(-3, 3), method='bounded')
+        ensemble.temperature.fill_(float(np.exp(result.x)))
+    elif method == 'isotonic':
+        mean = (1 / (1 + np.exp(-logits))).mean(axis=0)
+        isotonic = IsotonicRegression(y_min=0, y_max=1, out_of_bounds='clip').fit(mean, y)
+        ensemble.isotonic_x = torch.as_tensor(isotonic.X_thresholds_, dtype=torch.float32)
+        ensemble.isotonic_y = torch.as_tensor(isotonic.y_thresholds_, dtype=torch.float32)
+
+
+def predict_ensemble(ensemble, scaler, X, batch_size=65536):
+    """Calibrated mean probability and member variance for raw feature rows"""
+    X = scaler.transform(np.asarray(X)).astype(np.float32)
+    means, variances = [], []
+    with torch.inference_mode():
+        for start in range(0, len(X), batch_size):
+            mean, variance = ensemble.predict(torch.from_numpy(X[start:start + batch_size]))
+            means.append(mean.numpy())
+            variances.append(variance.numpy())
+    return np.concatenate(means), np.concatenate(variances)
+
+
+def save_ensemble(ensemble, scaler, model_path=ENSEMBLE_MODEL_PATH, scaler_path=ENSEMBLE_SCALER_PATH):
+    torch.save(ensemble.state_dict(), model_path)
+    with open(scaler_path, 'wb') as f:
+        pickle.dump(scaler, f)
+
+
+def load_ensemble(model_path=ENSEMBLE_MODEL_PATH, scaler_path=ENSEMBLE_SCALER_PATH):
+    """Rebuild the ensemble from the stacked shapes in its state dict"""
+    state_dict = torch.load(model_path)
+    weights = [state_dict[f'weights.{i}'] for i in range(sum(k.startswith('weights.') for k in state_dict))]
+    ensemble = LBWEnsemble(members=weights[0].shape[0], input_size=weights[0].shape[2],
+                           hidden_sizes=tuple(w.shape[1] for w in weights[:-1]))
+    ensemble.isotonic_x = torch.zeros_like(state_dict['isotonic_x'])
+    ensemble.isotonic_y = torch.zeros_like(state_dict['isotonic_y'])
+    ensemble.load_state_dict(state_dict)
+    ensemble.eval()
+
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+
+    return ensemble, scaler
+
+
+class EnsembleGraph(nn.Module):
+    """
+    The calibrated ensemble as one plain feed-forward graph
+
+    Members are laid side by side: the first layer concatenates their
+    weights and every later layer is block-diagonal, so a single
+    Gemm per layer runs all K members using only 2-D ops that Barracuda
+    supports. The scaler is folded into the first layer and the
+    temperature into the last. Isotonic calibration becomes a sum of
+    clamped ramps, one per pair of knots, which is the same
+    piecewise-linear map.
+
+    forward(input) -> (output, variance), both (batch, 1). As in
+    LBWEnsemble.predict, variance is across the temperature-scaled member
+    probabilities, before any isotonic map applied to output.
+    """
+
+    def __init__(self, ensemble, scaler=None):
+        super(EnsembleGraph, self).__init__()
+        weights = [w.detach().double() for w in ensemble.weights]
+        biases = [b.detach().double() for b in ensemble.biases]
+
+        if scaler is not None:
+            mean = torch.as_tensor(scaler.mean_, dtype=torch.float64)
+            scale = torch.as_tensor(scaler.scale_, dtype=torch.float64)
+            biases[0] = biases[0] - (weights[0] / scale) @ mean
+            weights[0] = weights[0] / scale
+
+        weights[-1] = weights[-1] / ensemble.temperature.double()
+        biases[-1] = biases[-1] / ensemble.temperature.double()
+
+        self.layers = nn.ModuleList()
+        for i, (weight, bias) in enumerate(zip(weights, biases)):
+            stacked = torch.cat(list(weight)) if i == 0 else torch.block_diag(*weight)
+            layer = nn.Linear(stacked.shape[1], stacked.shape[0])
+            with torch.no_grad():
+                layer.weight.copy_(stacked.float())
+                layer.bias.copy_(bias.reshape(-1).float())
+            self.layers.append(layer)
+
+        K = ensemble.members
+        self.register_buffer('average', torch.full((K, 1), 1.0 / K))
+
+        knots_x = ensemble.isotonic_x.double()
+        knots_y = ensemble.isotonic_y.double()
+        self.isotonic = len(knots_x) > 1
+        if self.isotonic:
+            # Ramp i goes 0 -> 1 between knots i and i+1 and adds that
+            # segment's rise; bounded terms keep float32 error small
+            self.register_buffer('ramp_start', knots_x[:-1].float().unsqueeze(0))
+            self.register_buffer('ramp_scale', (1 / (knots_x[1:] - knots_x[:-1])).float().unsqueeze(0))
+            self.register_buffer('rise', (knots_y[1:] - knots_y[:-1]).float().unsqueeze(1))
+            self.low = float(knots_y[0])
+
+    def forward(self, x):
+        h = x
+        for layer in self.layers[:-1]:
+            h = torch.relu(layer(h))
+        probs = torch.sigmoid(self.layers[-1](h))
+
+        mean = torch.matmul(probs, self.average)
+        # Mean of squared deviations: E[p^2] - E[p]^2 cancels in float32
+        # and can go negative when the members agree
+        centred = probs - mean
+        variance = torch.matmul(centred * centred, self.average)
+        if self.isotonic:
+            ramps = torch.clamp((mean - self.ramp_start) * self.ramp_scale, 0, 1)
+            mean = torch.matmul(ramps, self.rise) + self.low
+        return mean, variance
+
+
+def export_ensemble_onnx(ensemble, scaler, onnx_path=ENSEMBLE_ONNX_PATH):
+    """
+    Export EnsembleGraph: 'input' (batch, 13) raw features -> 'output' and 'variance'
+
+    'output' stays the first output so LBWPredictor.cs reads the
+    calibrated mean exactly as it reads the single model's probability.
+    """
+    graph = EnsembleGraph(ensemble, scaler).eval()
+    torch.onnx.export(
+        graph, torch.zeros(1, ensemble.weights[0].shape[2]), onnx_path,
+        dynamo=False,
+        opset_version=OPSET_VERSION,
+        do_constant_folding=True,
+        input_names=['input'],
+        output_names=['output', 'variance'],
+        dynamic_axes={name: {0: 'batch_size'} for name in ('input', 'output', 'variance')},
+    )
+    return simplify_onnx(onnx_path)
+
+
+def time_single_row(fn, row, runs=2000):
+    for _ in range(50):
+        fn(row)
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(row)
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def compare_passes(ensemble, scaler, X_test, onnx_path=ENSEMBLE_ONNX_PATH):
+    """Single-row latency of the one-pass ensemble against K separate member passes"""
+    from export_to_onnx import export_onnx, fold_scaler_into_model
+    from test_onnx import create_session
+
+    row = np.asarray(X_test[:1], dtype=np.float32)
+    ensemble_session = create_session(onnx_path)
+
+    member_path = 'lbw_ensemble_member.onnx'
+    export_onnx(fold_scaler_into_model(ensemble.member(0), scaler), member_path)
+    member_session = create_session(member_path)
+    os.remove(member_path)
+
+    K = ensemble.members
+    scaled = torch.from_numpy(scaler.transform(row).astype(np.float32))
+    members = [ensemble.member(k) for k in range(K)]
+
+    def torch_separate(_):
+        with torch.inference_mode():
+            return [member(scaled) for member in members]
+
+    def torch_stacked(_):
+        with torch.inference_mode():
+            return ensemble.predict(scaled)
+
+    return {
+        'torch_separate_us': time_single_row(torch_separate, row),
+        'torch_stacked_us': time_single_row(torch_stacked, row),
+        'onnx_separate_us': K * time_single_row(lambda r: member_session.run(None, {'input': r}), row),
+        'onnx_single_pass_us': time_single_row(lambda r: ensemble_session.run(None, {'input': r}), row),
+    }
+
+
+def main():
+    """
+    Usage: python ensemble_lbw_model.py [data] [--members 5] [--epochs 100] [--lr 0.001]
+                                        [--calibration temperature|isotonic|none]
+
+    Trains the ensemble on LBWTrainingData.csv (or data), calibrates it
+    on the validation deliveries, exports lbw_ensemble.onnx and reports
+    calibration and latency on LBWTestData.csv. Evaluate it like the
+    single model with: python test_lbw_model.py --ensemble
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    positional = [a for i, a in enumerate(args)
+                  if not a.startswith('--') and (i == 0 or not args[i - 1].startswith('--'))]
+    data_path = positional[0] if positional else '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+    method = option('--calibration', 'temperature')
+
+    if method not in CALIBRATION_METHODS:
+        print(f"ERROR: unknown calibration {method}, choose from {', '.join(CALIBRATION_METHODS)}")
+        return
+    if not os.path.exists(data_path):
+        print(f"ERROR: {data_path} not found")
+        return
+
+    X, y = load_dataset(data_path)
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    print(f"Dataset size: {len(X)}")
+
+    delivery_ids = assign_delivery_ids(X)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X).astype(np.float32)
+    train_idx, val_idx = split_by_delivery(delivery_ids)
+    train_data = (torch.from_numpy(X_scaled[train_idx]), torch.from_numpy(y[train_idx]))
+    val_data = (torch.from_numpy(X_scaled[val_idx]), torch.from_numpy(y[val_idx]))
+
+    ensemble = LBWEnsemble(members=int(option('--members', 5)), input_size=X.shape[1])
+    print(f"\nTraining {ensemble.members} members together "
+          f"({sum(p.numel() for p in ensemble.parameters()):,} parameters)...")
+    start = time.perf_counter()
+    train_ensemble(ensemble, train_data, val_data, epochs=int(option('--epochs', 100)),
+                   lr=float(option('--lr', 0.001)))
+    print(f"Trained in {time.perf_counter() - start:.1f}s")
+
+    if method != 'none':
+        calibrate(ensemble, *val_data, method=method)
+        if method == 'temperature':
+            print(f"Calibrated: temperature {ensemble.temperature.item():.3f}")
+        else:
+            print(f"Calibrated: isotonic map with {len(ensemble.isotonic_x)} knots")
+
+    save_ensemble(ensemble, scaler)
+    print(f"Saved {ENSEMBLE_MODEL_PATH} and {ENSEMBLE_SCALER_PATH}")
+
+    export_ensemble_onnx(ensemble, scaler)
+    with open(ENSEMBLE_SCALER_JSON, 'w') as f:
+        json.dump(scaler_params(scaler, folded=True), f, indent=2)
+    print(f"Saved {ENSEMBLE_ONNX_PATH} ({os.path.getsize(ENSEMBLE_ONNX_PATH):,} bytes) "
+          f"and {ENSEMBLE_SCALER_JSON}")
+
+    if not os.path.exists(test_csv):
+        print(f"Skipping evaluation, {test_csv} not found")
+        return
+
+    from test_lbw_model import load_test_data
+    from test_onnx import create_session
+    X_test, y_test = load_test_data(test_csv)
+    X_test = np.asarray(X_test, dtype=np.float32)
+
+    mean, variance = predict_ensemble(ensemble, scaler, X_test)
+    uncalibrated = copy.deepcopy(ensemble)
+    calibrate(uncalibrated, *val_data, method='none')
+    raw_mean, _ = predict_ensemble(uncalibrated, scaler, X_test)
+    members = [ensemble.member(k) for k in range(ensemble.members)]
+    with torch.inference_mode():
+        scaled_test = torch.from_numpy(scaler.transform(X_test).astype(np.float32))
+        member_probs = [m(scaled_test).squeeze(1).numpy() for m in members]
+
+    print("\n" + "="*60)
+    print("ENSEMBLE ON TEST DATA")
+    print("="*60)
+    print(f"{'model':<24}{'accuracy':>10}{'NLL':>9}{'Brier':>9}{'ECE':>9}")
+    rows = [(f'member {k}', p) for k, p in enumerate(member_probs)]
+    rows += [('ensemble (uncalibrated)', raw_mean), (f'ensemble ({method})', mean)]
+    for name, probs in rows:
+        print(f"{name:<24}{np.mean((probs >= 0.5) == y_test):>10.2%}{nll(probs, y_test):>9.4f}"
+              f"{np.mean((probs - y_test) ** 2):>9.4f}{expected_calibration_error(probs, y_test):>9.4f}")
+
+    wrong = (mean >= 0.5) != y_test
+    print(f"\nMean variance: {variance[~wrong].mean():.5f} on correct rows, "
+          f"{variance[wrong].mean():.5f} on wrong ones")
+
+    session = create_session(ENSEMBLE_ONNX_PATH)
+    onnx_mean, onnx_variance = session.run(None, {'input': X_test})
+    print(f"ONNX vs PyTorch: max |diff| mean {np.abs(onnx_mean[:, 0] - mean).max():.2e}, "
+          f"variance {np.abs(onnx_variance[:, 0] - variance).max():.2e}")
+
+    timings = compare_passes(ensemble, scaler, X_test)
+    K = ensemble.members
+    print(f"\nSingle-row latency ({K} members):")
+    print(f"  PyTorch, {K} separate passes: {timings['torch_separate_us']:.1f} us")
+    print(f"  PyTorch, stacked weights:    {timings['torch_stacked_us']:.1f} us")
+    print(f"  ONNX, {K} separate passes:    {timings['onnx_separate_us']:.1f} us")
+    print(f"  ONNX, single pass:           {timings['onnx_single_pass_us']:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import json
+import pickle
+import sys
+from columnar_dataset import FEATURE_NAMES
+
+
+def scaler_params(scaler, feature_names=FEATURE_NAMES, folded=False):
+    """
+    Scaler parameters in the format LBWPredictor.cs reads
+
+    When the scaler has been folded into the ONNX model the stored
+    mean/scale are the identity, so older builds that still normalise
+    get the same result, and newer ones skip NormalizeFeatures entirely.
+    """
+    if folded:
+        mean = [0.0] * len(feature_names)
+        scale = [1.0] * len(feature_names)
+    else:
+        mean = [float(m) for m in scaler.mean_]
+        scale = [float(s) for s in scaler.scale_]
+
+    return {
+        'mean': mean,
+        'scale': scale,
+        'feature_names': list(feature_names),
+        'folded': folded,
+    }
+
+
+def export_scaler_to_json(scaler_path='scaler.pkl', json_path='scaler_params.json',
+                          folded=False):
+    """Write scaler.pkl out as scaler_params.json for Unity"""
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+
+    params = scaler_params(scaler, folded=folded)
+    with open(json_path, 'w') as f:
+        json.dump(params, f, indent=2)
+
+    return params
+
+
+def main():
+    folded = '--folded' in sys.argv[1:]
+    params = export_scaler_to_json(folded=folded)
+
+    print(f"Saved scaler_params.json ({len(params['mean'])} features, folded={folded})")
+    print("Copy it to Unity/2dLBW/Assets/Resources/ and assign it to LBWPredictor")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import torch
+import onnx
+import copy
+import json
+import os
+from test_lbw_model import load_model_and_scaler
+from export_scalar_to_json import scaler_params
+from test_onnx import check_onnx_parity
+
+# Barracuda in Unity reads up to opset 13 / IR version 7
+OPSET_VERSION = 13
+IR_VERSION = 7
+
+
+def fold_scaler_into_model(model, scaler):
+    """
+    Return a copy of model that takes raw (unscaled) features
+
+    The first Linear layer computes W @ ((x - mean) / scale) + b, which is
+    W' @ x + b' with W' = W / scale and b' = b - W' @ mean, so the
+    StandardScaler disappears into the weights.
+    """
+    folded = copy.deepcopy(model)
+    first = folded.network[0]
+
+    mean = torch.as_tensor(scaler.mean_, dtype=torch.float64)
+    scale = torch.as_tensor(scaler.scale_, dtype=torch.float64)
+
+    with torch.no_grad():
+        weight = first.weight.double() / scale
+        bias = first.bias.double() - weight @ mean
+        first.weight.copy_(weight.float())
+        first.bias.copy_(bias.float())
+
+    return folded
+
+
+def export_onnx(model, onnx_path, input_size=13):
+    """Export with a dynamic batch dimension, named like the existing Unity model"""
+    model.eval()
+    dummy_input = torch.zeros(1, input_size)
+
+    torch.onnx.export(
+        model, dummy_input, onnx_path,
+        dynamo=False,
+        opset_version=OPSET_VERSION,
+        do_constant_folding=True,
+        input_names=['input'],
+        output_names=['output'],
+        dynamic_axes={'input': {0: 'batch_size'}, 'output': {0: 'batch_size'}},
+    )
+
+
+def simplify_onnx(onnx_path):
+    """
+    Simplify the exported graph in place and pin the IR version for Barracuda
+
+    Uses onnxsim when it is installed; otherwise the exporter's own
+    constant folding is all that runs.
+    """
+    model = onnx.load(onnx_path)
+
+    try:
+        from onnxsim import simplify
+        simplified, ok = simplify(model)
+        if ok:
+            model = simplified
+        else:
+            print("onnxsim could not validate the simplified model, keeping the original")
+    except ImportError:
+        print("onnxsim not installed, skipping graph simplification")
+
+    # Intermediate shape annotations are not needed at runtime
+    del model.graph.value_info[:]
+
+    model.ir_version = IR_VERSION
+    onnx.checker.check_model(model)
+    onnx.save(model, onnx_path)
+
+    return model
+
+
+def main():
+    model_path = 'lbw_model_best.pth'
+    scaler_path = 'scaler.pkl'
+    onnx_path = 'lbw_model_legacy.onnx'
+    scaler_json = 'scaler_params.json'
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+
+    for path in (model_path, scaler_path):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found, run train_lbw_model.py first")
+            return
+
+    print("Loading model and scaler...")
+    model, scaler = load_model_and_scaler(model_path, scaler_path)
+
+    # Normalisation now happens inside the first layer
+    folded = fold_scaler_into_model(model, scaler)
+
+    print(f"Exporting {onnx_path} (opset {OPSET_VERSION}, dynamic batch)...")
+    export_onnx(folded, onnx_path)
+    graph = simplify_onnx(onnx_path).graph
+    print(f"  Nodes: {[node.op_type for node in graph.node]}")
+    print(f"  Size: {os.path.getsize(onnx_path):,} bytes")
+
+    # Identity scaler params tell LBWPredictor.cs to skip NormalizeFeatures
+    with open(scaler_json, 'w') as f:
+        json.dump(scaler_params(scaler, folded=True), f, indent=2)
+    print(f"Saved {scaler_json} (scaler folded into model)")
+
+    if os.path.exists(test_csv):
+        print("\nVerifying against PyTorch with onnxruntime...")
+        check_onnx_parity(onnx_path, scaler_json, test_csv, model_path, scaler_path)
+
+    print("\nCopy these into Unity/2dLBW/Assets/Resources/:")
+    print(f"  - {onnx_path}")
+    print(f"  - {scaler_json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import numpy as np
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from columnar_dataset import SHARD_MANIFEST
+from lbw_simulator import DELIVERY_DEFAULTS, simulate_deliveries, write_lbw_csv
+
+# FastDataCollector.SpawnBallsRoutine narrows the bowling angle window as
+# collection progresses: (fraction of the target reached, angle min, angle max)
+CURRICULUM = [
+    (0.0, -22.5, -5.0),
+    (0.5, -22.5, -15.0),
+    (0.75, -21.5, -17.0),
+    (0.9, -20.5, -18.5),
+]
+
+
+def plan_shards(total_deliveries, shard_size, base_seed, curriculum=CURRICULUM):
+    """
+    Split the target into shards that each sit inside one curriculum stage
+
+    Every shard gets its own seed spawned from base_seed, so a shard's
+    contents depend only on its index and not on which worker ran it.
+    """
+    boundaries = [int(round(fraction * total_deliveries)) for fraction, _, _ in curriculum]
+    boundaries.append(total_deliveries)
+
+    shards = []
+    for stage, (_, angle_min, angle_max) in enumerate(curriculum):
+        for start in range(boundaries[stage], boundaries[stage + 1], shard_size):
+            count = min(shard_size, boundaries[stage + 1] - start)
+            shards.append({
+                'index': len(shards),
+                'file': f'shard_{len(shards):05d}.csv',
+                'first_delivery': start,
+                'deliveries': count,
+                'angle_min': angle_min,
+                'angle_max': angle_max,
+            })
+
+    seeds = np.random.SeedSequence(base_seed).spawn(len(shards))
+    for shard, seed in zip(shards, seeds):
+        shard['seed'] = int(seed.generate_state(1, dtype=np.uint64)[0])
+
+    return shards
+
+
+def generate_shard(shard, out_dir, params):
+    """Simulate one shard and write it; the file only appears once complete"""
+    start = time.perf_counter()
+    rng = np.random.default_rng(shard['seed'])
+    shard_params = dict(params, angle_min=shard['angle_min'], angle_max=shard['angle_max'])
+
+    X, y, _ = simulate_deliveries(shard['deliveries'], rng, shard_params)
+
+    path = os.path.join(out_dir, shard['file'])
+    write_lbw_csv(path + '.tmp', X, y)
+    os.replace(path + '.tmp', path)
+
+    return shard['index'], len(y), int(y.sum()), time.perf_counter() - start
+
+
+def load_shard_manifest(out_dir):
+    path = os.path.join(out_dir, SHARD_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_shard_manifest(out_dir, manifest):
+    """Write via a temporary file so an interrupted run never leaves half a manifest"""
+    path = os.path.join(out_dir, SHARD_MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def generate_sharded(out_dir, total_deliveries, shard_size=50_000, seed=0,
+                     workers=None, params=None):
+    """
+    Generate a sharded simulated dataset in parallel, resuming if possible
+
+    An existing manifest in out_dir with the same settings is resumed:
+    shards already marked done (and still on disk) are kept, the rest are
+    regenerated. Different settings are refused rather than mixed.
+
+    Returns:
+        The manifest dict
+    """
+    params = dict(DELIVERY_DEFAULTS, **(params or {}))
+    settings = {
+        'total_deliveries': total_deliveries,
+        'shard_size': shard_size,
+        'seed': seed,
+        'params': params,
+        'curriculum': CURRICULUM,
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_shard_manifest(out_dir)
+
+    if manifest is not None:
+        # JSON round trip turns tuples into lists
+        if manifest['settings'] != json.loads(json.dumps(settings)):
+            raise ValueError(f"{out_dir} holds shards generated with different settings, "
+                             f"use another directory")
+        print(f"Resuming {out_dir}")
+    else:
+        manifest = {'settings': settings,
+                    'shards': plan_shards(total_deliveries, shard_size, seed)}
+        save_shard_manifest(out_dir, manifest)
+
+    pending = [shard for shard in manifest['shards']
+               if not (shard.get('done') and
+                       os.path.exists(os.path.join(out_dir, shard['file'])))]
+    print(f"{len(manifest['shards']) - len(pending)}/{len(manifest['shards'])} shards "
+          f"already done, generating {len(pending)}")
+
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)),
+                                 mp_context=get_context('spawn')) as pool:
+            futures = [pool.submit(generate_shard, shard, out_dir, params) for shard in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                index, rows, positives, seconds = future.result()
+                shard = manifest['shards'][index]
+                shard.update(done=True, rows=rows, positive_rows=positives)
+                save_shard_manifest(out_dir, manifest)
+                print(f"[{done}/{len(pending)}] {shard['file']}: {rows:,} rows "
+                      f"(angles {shard['angle_min']} to {shard['angle_max']}) in {seconds:.1f}s")
+
+    return manifest
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else 'data/SimulatedTrainingData'
+
+    start = time.perf_counter()
+    manifest = generate_sharded(out_dir, total)
+    elapsed = time.perf_counter() - start
+
+    rows = sum(shard['rows'] for shard in manifest['shards'])
+    positives = sum(shard['positive_rows'] for shard in manifest['shards'])
+    print(f"\n{total:,} deliveries, {rows:,} rows ({100*positives/rows:.1f}% hit stumps) "
+          f"in {out_dir} after {elapsed:.1f}s")
+    print(f"Train on it with: python train_lbw_model.py {out_dir}")
+
+
+if __name__ == '__main__':
+    main()
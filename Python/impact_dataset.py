@@ -0,0 +1,49 @@
+import numpy as np
+import os
+import sys
+from columnar_dataset import reduce_to_impacts
+from lbw_simulator import write_lbw_csv
+from train_lbw_model import load_dataset
+
+
+def reduce_csv_to_impacts(source, out_csv):
+    """
+    Reduce a frame-level export to one impact row per delivery
+
+    The output keeps the LBWData.SaveAsCSV schema, so every loader that
+    reads the frame-level CSVs reads it too.
+
+    Returns:
+        (frame rows read, impact rows written)
+    """
+    X, y = load_dataset(source)
+    X_impact, y_impact = reduce_to_impacts(X, y)
+
+    os.makedirs(os.path.dirname(out_csv) or '.', exist_ok=True)
+    write_lbw_csv(out_csv, X_impact, np.asarray(y_impact, dtype=int))
+
+    return len(y), len(y_impact)
+
+
+def main():
+    """Reduce the Unity training and test exports"""
+    if len(sys.argv) == 3:
+        exports = [(sys.argv[1], sys.argv[2])]
+    else:
+        exports = [
+            ('../Unity/2dLBW/Assets/LBWTrainingData.csv', 'data/LBWTrainingImpacts.csv'),
+            ('../Unity/2dLBW/Assets/LBWTestData.csv', 'data/LBWTestImpacts.csv'),
+        ]
+
+    for source, out_csv in exports:
+        if not os.path.exists(source):
+            print(f"Skipping {source} (not found)")
+            continue
+
+        frames, impacts = reduce_csv_to_impacts(source, out_csv)
+        print(f"Reduced {frames} frames from {source} to {impacts} impact rows "
+              f"in {out_csv} ({frames / impacts:.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import numpy as np
+import json
+import math
+import os
+import sys
+import time
+
+# Importing this module pulls in NumPy only. Exporting from a .pth and the
+# checks in main() import torch/sklearn lazily, the runtime never does.
+
+# Model file written by export_npz
+NPZ_PATH = 'lbw_model.npz'
+
+
+def export_npz(model_path='lbw_model_best.pth', scaler_path='scaler.pkl', npz_path=NPZ_PATH):
+    """
+    Write an LBWPredictor checkpoint and its scaler to one compact .npz
+
+    Layout: weight_0, bias_0, ... for the Linear layers in order (float32,
+    ReLU between them, Sigmoid after the last) plus the scaler's mean and
+    scale. Dropout is a no-op at inference and is not stored.
+    """
+    import torch
+    import pickle
+
+    state_dict = torch.load(model_path)
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+
+    # network.<index>.weight in Sequential order
+    indices = sorted(int(key.split('.')[1]) for key in state_dict if key.endswith('.weight'))
+    arrays = {}
+    for i, index in enumerate(indices):
+        arrays[f'weight_{i}'] = state_dict[f'network.{index}.weight'].numpy().astype(np.float32)
+        arrays[f'bias_{i}'] = state_dict[f'network.{index}.bias'].numpy().astype(np.float32)
+    arrays['mean'] = np.asarray(scaler.mean_, dtype=np.float32)
+    arrays['scale'] = np.asarray(scaler.scale_, dtype=np.float32)
+
+    np.savez(npz_path, **arrays)
+    return npz_path
+
+
+class NumpyLBWPredictor:
+    """
+    LBWPredictor forward pass in plain NumPy
+
+    The scaler is folded into the first layer at load time (as
+    fold_scaler_into_model does for ONNX), so prediction is one matmul per
+    layer on raw features. Weights are stored transposed, so each layer is
+    X @ W + b on row-major batches.
+    """
+
+    def __init__(self, weights, biases, mean=None, scale=None):
+        weights = [np.asarray(w, dtype=np.float64) for w in weights]
+        biases = [np.asarray(b, dtype=np.float64) for b in biases]
+
+        if mean is not None:
+            mean = np.asarray(mean, dtype=np.float64)
+            scale = np.asarray(scale, dtype=np.float64)
+            weights[0] = weights[0] / scale
+            biases[0] = biases[0] - weights[0] @ mean
+
+        self.weights = [np.ascontiguousarray(w.T, dtype=np.float32) for w in weights]
+        self.biases = [b.astype(np.float32) for b in biases]
+        self.input_size = self.weights[0].shape[0]
+
+    @classmethod
+    def load(cls, npz_path=NPZ_PATH, scaler_json=None):
+        """
+        Load from export_npz output
+
+        scaler_json (scaler_params.json format) overrides the mean/scale in
+        the .npz; with neither, the weights are assumed to take raw features.
+        A folded scaler_params.json (what export_to_onnx.py writes) only holds
+        an identity scaler for the ONNX model, so the .npz's own mean/scale
+        are kept.
+        """
+        with np.load(npz_path) as data:
+            layers = sum(1 for key in data.files if key.startswith('weight_'))
+            weights = [data[f'weight_{i}'] for i in range(layers)]
+            biases = [data[f'bias_{i}'] for i in range(layers)]
+            mean = data['mean'] if 'mean' in data.files else None
+            scale = data['scale'] if 'scale' in data.files else None
+
+        if scaler_json is not None:
+            with open(scaler_json, 'r') as f:
+                params = json.load(f)
+            if not params.get('folded', False):
+                mean, scale = params['mean'], params['scale']
+
+        return cls(weights, biases, mean, scale)
+
+    def predict_batch(self, X):
+        """Stump-hit probabilities (float32) for the rows of X, raw features"""
+        h = np.asarray(X, dtype=np.float32)
+        if h.ndim == 1:
+            h = h[None, :]
+
+        last = len(self.weights) - 1
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            h = h @ weight
+            h += bias
+            if i < last:
+                np.maximum(h, 0, out=h)
+
+        # Sigmoid; clipping keeps exp() from overflowing on extreme logits
+        z = np.clip(h[:, 0], -88.0, 88.0)
+        return 1 / (1 + np.exp(-z))
+
+    def predict(self, features):
+        """
+        Probability for one row of raw features, like predict_lbw
+
+        Stays 1-D and finishes in Python floats: at one row NumPy's
+        per-call overhead, not arithmetic, is the cost.
+        """
+        h = np.asarray(features, dtype=np.float32)
+        for weight, bias in zip(self.weights[:-1], self.biases[:-1]):
+            h = h @ weight
+            h += bias
+            np.maximum(h, 0, out=h)
+
+        z = float(h @ self.weights[-1][:, 0]) + float(self.biases[-1][0])
+        return 1 / (1 + math.exp(-min(max(z, -88.0), 88.0)))
+
+
+def check_parity(predictor, model_path='lbw_model_best.pth', scaler_path='scaler.pkl',
+                 test_csv='../Unity/2dLBW/Assets/LBWTestData.csv', single_rows=500,
+                 tolerance=1e-4, npz_path=None, scaler_json=None):
+    """
+    Compare with predict_lbw (row by row) and predict_lbw_batch
+
+    With npz_path and scaler_json, also checks that loading the .npz
+    through the JSON scaler gives the same batch probabilities.
+
+    Returns:
+        (max |diff| on single rows, max |diff| over the batch, flipped decisions)
+    """
+    from test_lbw_model import load_model_and_scaler, load_test_data, predict_lbw, predict_lbw_batch
+
+    model, scaler = load_model_and_scaler(model_path, scaler_path)
+    X, _ = load_test_data(test_csv)
+    X = np.asarray(X, dtype=np.float32)
+
+    rows = X[np.linspace(0, len(X) - 1, min(single_rows, len(X))).astype(int)]
+    single_diff = max(abs(predict_lbw(model, scaler, row) - predictor.predict(row)) for row in rows)
+
+    torch_probs = predict_lbw_batch(model, scaler, X)
+    numpy_probs = predictor.predict_batch(X)
+    batch_diff = float(np.abs(torch_probs - numpy_probs).max())
+    flipped = int(((torch_probs >= 0.5) != (numpy_probs >= 0.5)).sum())
+
+    print(f"Parity vs predict_lbw on {len(rows)} rows: max |diff| = {single_diff:.2e}")
+    print(f"Parity vs predict_lbw_batch on {len(X)} rows: max |diff| = {batch_diff:.2e}, "
+          f"flipped decisions = {flipped}")
+    if max(single_diff, batch_diff) > tolerance:
+        print(f"WARNING: NumPy output differs from PyTorch by more than {tolerance}")
+
+    if npz_path is not None and scaler_json is not None and os.path.exists(scaler_json):
+        json_probs = NumpyLBWPredictor.load(npz_path, scaler_json=scaler_json).predict_batch(X)
+        json_diff = float(np.abs(torch_probs - json_probs).max())
+        print(f"Parity of {npz_path} + {scaler_json} vs predict_lbw_batch: max |diff| = {json_diff:.2e}")
+        if json_diff > tolerance:
+            print(f"WARNING: loading with {scaler_json} differs from PyTorch by more than {tolerance}")
+
+    return single_diff, batch_diff, flipped
+
+
+# Run in a fresh interpreter so import costs are not hidden by modules
+# this process has already loaded
+_STARTUP_SCRIPTS = {
+    'numpy': (
+        "import time; start = time.perf_counter()\n"
+        "from lbw_inference import NumpyLBWPredictor\n"
+        "imported = time.perf_counter()\n"
+        "predictor = NumpyLBWPredictor.load({npz!r})\n"
+        "loaded = time.perf_counter()\n"
+        "predictor.predict({row!r})\n"
+    ),
+    'torch': (
+        "import time; start = time.perf_counter()\n"
+        "from test_lbw_model import load_model_and_scaler, predict_lbw\n"
+        "imported = time.perf_counter()\n"
+        "model, scaler = load_model_and_scaler({model!r}, {scaler!r})\n"
+        "loaded = time.perf_counter()\n"
+        "predict_lbw(model, scaler, {row!r})\n"
+    ),
+}
+
+
+def measure_startup(kind, row, npz_path=NPZ_PATH, model_path='lbw_model_best.pth',
+                    scaler_path='scaler.pkl', runs=3):
+    """Median import, load and first-prediction seconds of a cold interpreter"""
+    import subprocess
+
+    script = _STARTUP_SCRIPTS[kind].format(npz=npz_path, model=model_path, scaler=scaler_path,
+                                           row=[float(v) for v in row])
+    script += ("done = time.perf_counter()\n"
+               "import json; print(json.dumps([imported - start, loaded - imported, done - loaded]))\n")
+
+    env = dict(os.environ)
+    here = os.path.dirname(os.path.abspath(__file__))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [here, env.get('PYTHONPATH')]))
+
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-W', 'ignore', '-c', script], env=env,
+                                capture_output=True, text=True, check=True)
+        timings.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    imported, loaded, first = np.median(np.array(timings), axis=0)
+    return {'import_s': float(imported), 'load_s': float(loaded), 'first_prediction_s': float(first),
+            'total_s': float(imported + loaded + first)}
+
+
+def main():
+    """
+    Usage: python lbw_inference.py [model.pth] [scaler.pkl]
+
+    Exports lbw_model.npz, checks it against predict_lbw and times a cold
+    start of both runtimes.
+    """
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    model_path = args[0] if len(args) > 0 else 'lbw_model_best.pth'
+    scaler_path = args[1] if len(args) > 1 else 'scaler.pkl'
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+
+    for path in (model_path, scaler_path):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found, run train_lbw_model.py first")
+            return
+
+    export_npz(model_path, scaler_path, NPZ_PATH)
+    print(f"Saved {NPZ_PATH} ({os.path.getsize(NPZ_PATH):,} bytes)")
+    predictor = NumpyLBWPredictor.load(NPZ_PATH)
+
+    if not os.path.exists(test_csv):
+        print(f"Skipping parity and timing checks, {test_csv} not found")
+        return
+
+    print()
+    check_parity(predictor, model_path, scaler_path, test_csv, npz_path=NPZ_PATH,
+                 scaler_json='scaler_params.json')
+
+    from test_lbw_model import load_test_data
+    X, _ = load_test_data(test_csv)
+    X = np.asarray(X, dtype=np.float32)
+
+    print("\nCold start (fresh interpreter, median of 3):")
+    print(f"{'runtime':<10}{'import (ms)':>13}{'load (ms)':>11}{'first pred (ms)':>17}{'total (ms)':>12}")
+    startup = {}
+    for kind in ('torch', 'numpy'):
+        startup[kind] = s = measure_startup(kind, X[0], NPZ_PATH, model_path, scaler_path)
+        print(f"{kind:<10}{s['import_s']*1e3:>13.1f}{s['load_s']*1e3:>11.1f}"
+              f"{s['first_prediction_s']*1e3:>17.2f}{s['total_s']*1e3:>12.1f}")
+    print(f"NumPy runtime starts {startup['torch']['total_s'] / startup['numpy']['total_s']:.0f}x faster")
+
+    # Warm per-call cost, for completeness
+    row = X[0]
+    for _ in range(100):
+        predictor.predict(row)
+    start = time.perf_counter()
+    for _ in range(2000):
+        predictor.predict(row)
+    single_us = (time.perf_counter() - start) / 2000 * 1e6
+    start = time.perf_counter()
+    predictor.predict_batch(X)
+    batch_us = (time.perf_counter() - start) / len(X) * 1e6
+    print(f"\nWarm NumPy latency: {single_us:.1f} us per single row, {batch_us:.3f} us/row batched")
+
+    from test_lbw_model import load_model_and_scaler, predict_lbw
+    model, scaler = load_model_and_scaler(model_path, scaler_path)
+    for _ in range(100):
+        predict_lbw(model, scaler, row)
+    start = time.perf_counter()
+    for _ in range(2000):
+        predict_lbw(model, scaler, row)
+    print(f"Warm predict_lbw latency: {(time.perf_counter() - start) / 2000 * 1e6:.1f} us per single row")
+
+
+if __name__ == '__main__':
+    main()
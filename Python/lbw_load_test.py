@@ -0,0 +1,121 @@
+import numpy as np
+import asyncio
+import json
+import os
+import sys
+import time
+from test_lbw_model import load_test_data
+
+
+async def open_connection(host, port, unix_socket):
+    if unix_socket:
+        return await asyncio.open_unix_connection(unix_socket)
+    return await asyncio.open_connection(host, port)
+
+
+async def request(reader, writer, method, path, payload=None):
+    """One keep-alive HTTP request, returns the decoded JSON response"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'
+                 f'Content-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = next(int(line.split(b':', 1)[1]) for line in head.split(b'\r\n')
+                  if line.lower().startswith(b'content-length'))
+    return json.loads(await reader.readexactly(length))
+
+
+async def client(rows, requests, host, port, unix_socket, latencies):
+    """A simulated ball: sends requests one after another on one connection"""
+    reader, writer = await open_connection(host, port, unix_socket)
+    try:
+        for i in range(requests):
+            start = time.perf_counter()
+            await request(reader, writer, 'POST', '/predict',
+                          {'features': rows[i % len(rows)].tolist()})
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_load(X, clients=64, requests_per_client=200, host='127.0.0.1', port=8765,
+                   unix_socket=None, seed=0):
+    """
+    Hammer the server with concurrent single-row clients
+
+    Returns:
+        Dict of client-side latency percentiles and throughput, plus the
+        server's own /stats
+    """
+    rng = np.random.default_rng(seed)
+    latencies = []
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(X[rng.choice(len(X), size=requests_per_client)], requests_per_client,
+               host, port, unix_socket, latencies)
+        for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await open_connection(host, port, unix_socket)
+    server_stats = await request(reader, writer, 'GET', '/stats')
+    writer.close()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p99_ms': float(np.percentile(latencies, 99)),
+        'server': server_stats,
+    }
+
+
+def main():
+    """
+    Usage: python lbw_load_test.py [--unix PATH] [--port N] [--clients N] [--requests N]
+
+    Start lbw_server.py first.
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+    if not os.path.exists(test_csv):
+        print(f"ERROR: Test CSV not found at {test_csv}")
+        return
+
+    X, _ = load_test_data(test_csv)
+    X = np.asarray(X, dtype=np.float32)
+
+    clients = int(option('--clients', 64))
+    requests = int(option('--requests', 200))
+    print(f"Sending {clients} x {requests} single-row requests...")
+
+    result = asyncio.run(run_load(X, clients, requests, port=int(option('--port', 8765)),
+                                  unix_socket=option('--unix', None)))
+
+    server = result['server']
+    print("\n" + "="*60)
+    print("LOAD TEST RESULTS")
+    print("="*60)
+    print(f"Throughput: {result['requests_per_second']:,.0f} requests/s "
+          f"({result['requests']:,} in {result['seconds']:.2f}s)")
+    print(f"Client latency: p50 {result['latency_p50_ms']:.2f} ms, p99 {result['latency_p99_ms']:.2f} ms")
+    print(f"Server latency: p50 {server['latency_p50_ms']:.2f} ms, p99 {server['latency_p99_ms']:.2f} ms")
+    print(f"Mean server batch size: {server['mean_batch_size']:.1f} rows "
+          f"(max wait {server['max_wait_ms']} ms)")
+
+    with open('load_test_results.json', 'w') as f:
+        json.dump(result, f, indent=2)
+    print("\nSaved load_test_results.json")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,492 @@
+import numpy as np
+import bisect
+import json
+import math
+import os
+import struct
+import sys
+import time
+from columnar_dataset import FEATURE_NAMES
+
+# Binary layout (little-endian), kept simple enough for a C# reader:
+#   b'LBWL', uint32 version, uint32 header length, UTF-8 JSON header,
+#   then each group's table as uint8/uint16 in C order
+MAGIC = b'LBWL'
+VERSION = 1
+LOOKUP_PATH = 'lbw_lookup_table.bytes'
+
+# Error a table must stay within to stand in for the network
+MAX_P99_ERROR = 0.1
+MAX_FLIP_RATE = 0.01
+
+# LBWPredictor.PredictLBW always passes these
+FIXED_FEATURES = {'spinAmount': 10.0, 'reachedPad': 1.0}
+# Exact table index instead of an interpolated axis
+CATEGORICAL_FEATURES = ['spinType', 'hitPad']
+CONTINUOUS_FEATURES = [f for f in FEATURE_NAMES
+                       if f not in FIXED_FEATURES and f not in CATEGORICAL_FEATURES]
+
+
+def decision_rows(X):
+    """Rows that look like a decision-time query: the frame at the pad"""
+    X = np.asarray(X, dtype=np.float32)
+    return X[X[:, FEATURE_NAMES.index('reachedPad')] == 1]
+
+
+class LookupTable:
+    """
+    Quantized decision surface with multilinear interpolation
+
+    The nine continuous decision-time features are strongly correlated
+    (speed, ballVelX and timeSinceRelease move together, ballAngularVel
+    follows spinType), so a grid over them directly is mostly empty space.
+    Each (spinType, hitPad) group instead gets a grid over the first few
+    principal components of its standardised continuous features, with
+    knots at quantiles of the training rows. A query is projected onto
+    those components, interpolated from the 2^k surrounding cells and
+    rejected (in_domain False) when it lies further from the component
+    subspace, or outside the knots, than any training row did, or when
+    its spinAmount/reachedPad differ from FIXED_FEATURES.
+    """
+
+    def __init__(self, mean, scale, groups, bits=8, error_bound=None):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.groups = groups
+        self.bits = bits
+        self.error_bound = error_bound or {}
+        self.continuous = [FEATURE_NAMES.index(f) for f in CONTINUOUS_FEATURES]
+        self.spin_index = FEATURE_NAMES.index('spinType')
+        self.hit_pad_index = FEATURE_NAMES.index('hitPad')
+        self.fixed = [(FEATURE_NAMES.index(name), value) for name, value in FIXED_FEATURES.items()]
+
+        for group in groups.values():
+            k, size = group['knots'].shape
+            group['strides'] = np.array([size ** (k - 1 - j) for j in range(k)])
+            # Flat index offset and corner bits of all 2^k cell corners
+            group['corners'] = np.array([[(c >> (k - 1 - j)) & 1 for j in range(k)]
+                                         for c in range(1 << k)])
+            group['corner_offsets'] = group['corners'] @ group['strides']
+            # Plain Python copies for the single-row path
+            group['knot_lists'] = group['knots'].tolist()
+            group['stride_list'] = group['strides'].tolist()
+            group['offset_list'] = group['corner_offsets'].tolist()
+            group['flat_table'] = group['table'].ravel().tolist()
+
+    @property
+    def cells(self):
+        return sum(group['table'].size for group in self.groups.values())
+
+    def standardize(self, X):
+        return (np.asarray(X, dtype=np.float64)[:, self.continuous] - self.mean) / self.scale
+
+    def lookup(self, X):
+        """
+        Interpolated probabilities for the rows of X (raw features)
+
+        Returns:
+            (probabilities float32, in_domain bool), rows outside the
+            table's domain are clamped to its edge
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        Z = self.standardize(X)
+
+        probabilities = np.zeros(len(X), dtype=np.float32)
+        in_domain = np.zeros(len(X), dtype=bool)
+        spin = X[:, self.spin_index].astype(int)
+        hit_pad = X[:, self.hit_pad_index].astype(int)
+        # The grid was sampled at these values only
+        fixed = np.ones(len(X), dtype=bool)
+        for index, value in self.fixed:
+            fixed &= X[:, index] == value
+
+        for key, group in self.groups.items():
+            rows = np.flatnonzero((spin == key[0]) & (hit_pad == key[1]))
+            if len(rows) == 0:
+                continue
+
+            centred = Z[rows] - group['center']
+            coords = centred @ group['axes'].T
+            # Axes are orthonormal, so |residual|^2 = |centred|^2 - |coords|^2
+            residual = np.sqrt(np.maximum(np.einsum('ij,ij->i', centred, centred)
+                                          - np.einsum('ij,ij->i', coords, coords), 0))
+            knots = group['knots']
+
+            inside = (residual <= group['residual_limit']) & fixed[rows]
+            base = np.zeros(len(rows), dtype=np.int64)
+            # Corner weights (rows, 2^k) built one axis at a time, first axis
+            # most significant as in corner_offsets
+            weights = np.ones((len(rows), 1))
+            for j in range(len(knots)):
+                x = coords[:, j]
+                inside &= (x >= knots[j, 0]) & (x <= knots[j, -1])
+                x = np.clip(x, knots[j, 0], knots[j, -1])
+                i = np.clip(np.searchsorted(knots[j], x, side='right') - 1, 0, knots.shape[1] - 2)
+                f = (x - knots[j, i]) / (knots[j, i + 1] - knots[j, i])
+                base += i * group['strides'][j]
+                weights = (weights[:, :, None] * np.stack([1 - f, f], axis=1)[:, None, :]).reshape(len(rows), -1)
+
+            values = group['table'].ravel()[base[:, None] + group['corner_offsets'][None, :]]
+            probabilities[rows] = np.einsum('ij,ij->i', weights, values) / ((1 << self.bits) - 1)
+            in_domain[rows] = inside
+
+        return probabilities, in_domain
+
+    def predict_batch(self, X, fallback=None):
+        """
+        Probabilities from the table, with out-of-domain rows sent to fallback
+
+        fallback is a batch predict function such as
+        NumpyLBWPredictor.predict_batch; without one, out-of-domain rows
+        get the clamped table value.
+        """
+        probabilities, in_domain = self.lookup(X)
+        if fallback is not None and not in_domain.all():
+            outside = ~in_domain
+            probabilities[outside] = fallback(np.asarray(X, dtype=np.float32)[outside])
+        return probabilities
+
+    def predict(self, features, fallback=None):
+        """
+        One row of raw features, like predict_lbw
+
+        Same arithmetic as lookup() in Python scalars; at one row the
+        array overhead of the batched path would cost more than the lookup.
+        fallback here is a single-row function such as NumpyLBWPredictor.predict.
+        """
+        x = np.asarray(features, dtype=np.float64)
+        group = self.groups[int(x[self.spin_index]), int(x[self.hit_pad_index])]
+
+        z = (x[self.continuous] - self.mean) / self.scale - group['center']
+        coords = group['axes'] @ z
+        # Axes are orthonormal, so |residual|^2 = |z|^2 - |coords|^2
+        inside = math.sqrt(max(float(z @ z - coords @ coords), 0.0)) <= group['residual_limit']
+        inside = inside and all(x[index] == value for index, value in self.fixed)
+
+        base = 0
+        fractions = []
+        for c, knots, stride in zip(coords.tolist(), group['knot_lists'], group['stride_list']):
+            if c < knots[0] or c > knots[-1]:
+                inside = False
+                c = min(max(c, knots[0]), knots[-1])
+            i = min(max(bisect.bisect_right(knots, c) - 1, 0), len(knots) - 2)
+            fractions.append((c - knots[i]) / (knots[i + 1] - knots[i]))
+            base += i * stride
+
+        if not inside and fallback is not None:
+            return float(fallback(features))
+
+        # Corner weights in corner_offsets order (first axis most significant)
+        weights = [1.0]
+        for f in fractions:
+            weights = [w * g for w in weights for g in (1 - f, f)]
+
+        table = group['flat_table']
+        value = sum(w * table[base + offset] for w, offset in zip(weights, group['offset_list']))
+        return value / ((1 << self.bits) - 1)
+
+    def acceptable(self, max_error=None, max_flip_rate=None):
+        """
+        Whether the error measured against the network is within bounds
+
+        max_error applies to the p99 absolute probability error, and
+        max_flip_rate to the fraction of in-domain decisions that differ.
+        """
+        if max_error is not None and self.error_bound.get('p99_abs_error', math.inf) > max_error:
+            return False
+        if max_flip_rate is not None and self.error_bound.get('flip_rate', math.inf) > max_flip_rate:
+            return False
+        return True
+
+    def save(self, path=LOOKUP_PATH):
+        dtype = np.uint8 if self.bits == 8 else np.uint16
+        header = {
+            'version': VERSION,
+            'featureNames': FEATURE_NAMES,
+            'continuousFeatures': self.continuous,
+            'fixedFeatures': [{'index': FEATURE_NAMES.index(name), 'value': value}
+                              for name, value in FIXED_FEATURES.items()],
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'bits': self.bits,
+            'groups': [],
+            'errorBound': self.error_bound,
+        }
+
+        tables = []
+        offset = 0
+        for (spin, hit_pad), group in self.groups.items():
+            k, size = group['knots'].shape
+            table = group['table'].astype(dtype).tobytes()
+            # Flat float arrays: JsonUtility cannot read nested ones
+            header['groups'].append({
+                'spinType': spin,
+                'hitPad': hit_pad,
+                'components': k,
+                'knotsPerAxis': size,
+                'center': group['center'].tolist(),
+                'axes': group['axes'].ravel().tolist(),
+                'knots': group['knots'].ravel().tolist(),
+                'residualLimit': float(group['residual_limit']),
+                'offset': offset,
+                'length': len(table),
+            })
+            tables.append(table)
+            offset += len(table)
+
+        header_bytes = json.dumps(header).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<II', VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for table in tables:
+                f.write(table)
+        return path
+
+    @classmethod
+    def load(cls, path=LOOKUP_PATH):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not an LBW lookup table")
+        version, header_length = struct.unpack('<II', data[4:12])
+        if version != VERSION:
+            raise ValueError(f"{path} has lookup table version {version}, expected {VERSION}")
+
+        header = json.loads(data[12:12 + header_length])
+        body = 12 + header_length
+        dtype = np.uint8 if header['bits'] == 8 else np.uint16
+
+        groups = {}
+        for g in header['groups']:
+            k, size = g['components'], g['knotsPerAxis']
+            table = np.frombuffer(data, dtype=dtype, count=g['length'] // np.dtype(dtype).itemsize,
+                                  offset=body + g['offset']).reshape([size] * k)
+            groups[g['spinType'], g['hitPad']] = {
+                'center': np.array(g['center']),
+                'axes': np.array(g['axes']).reshape(k, -1),
+                'knots': np.array(g['knots']).reshape(k, size),
+                'residual_limit': g['residualLimit'],
+                'table': table,
+            }
+
+        return cls(header['mean'], header['scale'], groups, header['bits'], header['errorBound'])
+
+
+def build_lookup_table(predict_batch, X_decision, components=5, knots=12, bits=8,
+                       chunk_size=500_000):
+    """
+    Sample predict_batch over a grid per (spinType, hitPad) group
+
+    Args:
+        predict_batch: Batch predict function on raw features (the network)
+        X_decision: Decision-time rows (see decision_rows) the grid is fitted to
+        components: Principal components per group, the grid's dimensions
+        knots: Grid points per component, at quantiles of the training rows
+        bits: 8 or 16 bit probabilities
+
+    The table has 4 * knots^components cells.
+    """
+    X_decision = np.asarray(X_decision, dtype=np.float64)
+    continuous = [FEATURE_NAMES.index(f) for f in CONTINUOUS_FEATURES]
+    mean = X_decision[:, continuous].mean(axis=0)
+    scale = X_decision[:, continuous].std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = (X_decision[:, continuous] - mean) / scale
+
+    spin = X_decision[:, FEATURE_NAMES.index('spinType')].astype(int)
+    hit_pad = X_decision[:, FEATURE_NAMES.index('hitPad')].astype(int)
+    levels = (1 << bits) - 1
+
+    groups = {}
+    for key in ((0, 0), (0, 1), (1, 0), (1, 1)):
+        Z_group = Z[(spin == key[0]) & (hit_pad == key[1])]
+        unseen = len(Z_group) < components + 1
+        if unseen:
+            # Never seen in training, e.g. a spin type that was not collected:
+            # fit the grid to every row so it is well formed, but mark every
+            # query in it out of domain with a negative residual limit
+            Z_group = Z
+
+        center = Z_group.mean(axis=0)
+        _, _, vt = np.linalg.svd(Z_group - center, full_matrices=False)
+        axes = vt[:components]
+        coords = (Z_group - center) @ axes.T
+        residual = np.linalg.norm((Z_group - center) - coords @ axes, axis=1)
+        group_knots = np.stack([np.quantile(coords[:, j], np.linspace(0, 1, knots))
+                                for j in range(components)])
+        # Quantile knots can repeat on tiny groups, keep them strictly increasing
+        group_knots += np.arange(knots) * 1e-9
+
+        # Every grid point back in raw feature space
+        grid = np.indices([knots] * components).reshape(components, -1).T
+        table = np.empty(len(grid), dtype=np.float32)
+        for start in range(0, len(grid), chunk_size):
+            cells = grid[start:start + chunk_size]
+            C = np.stack([group_knots[j, cells[:, j]] for j in range(components)], axis=1)
+            X_grid = np.empty((len(C), len(FEATURE_NAMES)), dtype=np.float32)
+            X_grid[:, continuous] = (center + C @ axes) * scale + mean
+            X_grid[:, FEATURE_NAMES.index('spinType')] = key[0]
+            X_grid[:, FEATURE_NAMES.index('hitPad')] = key[1]
+            for name, value in FIXED_FEATURES.items():
+                X_grid[:, FEATURE_NAMES.index(name)] = value
+            table[start:start + chunk_size] = predict_batch(X_grid)
+
+        quantized = np.round(np.clip(table, 0, 1) * levels)
+        groups[key] = {
+            'center': center,
+            'axes': axes,
+            'knots': group_knots,
+            'residual_limit': -1.0 if unseen else float(residual.max()),
+            'table': quantized.astype(np.uint8 if bits == 8 else np.uint16).reshape([knots] * components),
+        }
+
+    return LookupTable(mean, scale, groups, bits)
+
+
+def measure_error(table, predict_batch, X, y=None, threshold=0.5):
+    """
+    Error of the table against the network on decision-time rows of X
+
+    Only in-domain rows count towards the error figures; coverage is the
+    fraction of rows the table would answer.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    # Unity always sends reachedPad=1 and spinAmount=10
+    for name, value in FIXED_FEATURES.items():
+        X[:, FEATURE_NAMES.index(name)] = value
+
+    network = predict_batch(X)
+    table_probs, in_domain = table.lookup(X)
+    error = np.abs(network - table_probs)[in_domain]
+
+    flipped = int(((network >= threshold) != (table_probs >= threshold))[in_domain].sum())
+    bound = {
+        'rows': int(len(X)),
+        'coverage': float(in_domain.mean()),
+        'max_abs_error': float(error.max()) if len(error) else 0.0,
+        'p99_abs_error': float(np.percentile(error, 99)) if len(error) else 0.0,
+        'mean_abs_error': float(error.mean()) if len(error) else 0.0,
+        'flipped_decisions': flipped,
+        'flip_rate': flipped / max(int(in_domain.sum()), 1),
+    }
+    if y is not None:
+        y = np.asarray(y)
+        bound['network_accuracy'] = float(np.mean((network >= threshold) == y))
+        # Out-of-domain rows fall back to the network
+        combined = np.where(in_domain, table_probs, network)
+        bound['table_accuracy'] = float(np.mean((combined >= threshold) == y))
+
+    return bound
+
+
+def main():
+    """
+    Usage: python lbw_lookup_table.py [--components 5] [--knots 12] [--bits 8]
+
+    Builds lbw_lookup_table.bytes from lbw_model_best.pth, measures its
+    error against the network on the decision-time rows of LBWTestData.csv
+    and times it against the NumPy runtime (lbw_inference.py). In Python
+    the table has not been cheaper than that at any usable error: its
+    projection and 2^components scattered reads cost more than a small
+    MLP's matmuls. It could only pay off where running the network has a
+    large fixed cost per call, such as a Barracuda worker.Execute in
+    Unity, and only with a grid whose error passes the gate below, so
+    there is no Unity integration until one does and has been timed
+    against Barracuda.
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    model_path = 'lbw_model_best.pth'
+    scaler_path = 'scaler.pkl'
+    train_csv = '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+
+    for path in (model_path, scaler_path, train_csv, test_csv):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found")
+            return
+
+    import torch
+    from test_lbw_model import load_model_and_scaler, load_test_data, predict_lbw_batch
+    model, scaler = load_model_and_scaler(model_path, scaler_path)
+    if model.network[0].in_features != len(FEATURE_NAMES):
+        print("ERROR: the lookup table needs the 13-feature frame-level model")
+        return
+    network = lambda X: predict_lbw_batch(model, scaler, X)
+
+    components = int(option('--components', 5))
+    knots = int(option('--knots', 12))
+    bits = int(option('--bits', 8))
+
+    X_train, _ = load_test_data(train_csv)
+    X_decision = decision_rows(X_train)
+    print(f"Fitting the grid to {len(X_decision):,} decision-time training rows")
+    print(f"Sampling the network at 4 x {knots}^{components} = {4 * knots ** components:,} points...")
+    start = time.perf_counter()
+    table = build_lookup_table(network, X_decision, components, knots, bits)
+    print(f"  built in {time.perf_counter() - start:.1f}s")
+
+    X_test, y_test = load_test_data(test_csv)
+    at_pad = np.asarray(X_test)[:, FEATURE_NAMES.index('reachedPad')] == 1
+    table.error_bound = measure_error(table, network, np.asarray(X_test)[at_pad], np.asarray(y_test)[at_pad])
+    table.save(LOOKUP_PATH)
+
+    b = table.error_bound
+    print(f"\nSaved {LOOKUP_PATH} ({os.path.getsize(LOOKUP_PATH):,} bytes, {table.cells:,} cells, "
+          f"{bits}-bit)")
+    print(f"Error vs network on {b['rows']:,} decision-time test rows:")
+    print(f"  coverage (in domain): {b['coverage']:.1%}")
+    print(f"  |table - network|: max {b['max_abs_error']:.4f}, p99 {b['p99_abs_error']:.4f}, "
+          f"mean {b['mean_abs_error']:.4f}")
+    print(f"  flipped decisions: {b['flipped_decisions']} ({b['flip_rate']:.2%})")
+    print(f"  accuracy: network {b['network_accuracy']:.2%}, "
+          f"table with network fallback {b['table_accuracy']:.2%}")
+
+    # Lookup cost against the NumPy runtime, the cheapest way to run the network
+    from lbw_inference import NumpyLBWPredictor
+    linears = [layer for layer in model.network if isinstance(layer, torch.nn.Linear)]
+    numpy_model = NumpyLBWPredictor([layer.weight.detach().numpy() for layer in linears],
+                                    [layer.bias.detach().numpy() for layer in linears],
+                                    scaler.mean_, scaler.scale_)
+    X_query = np.asarray(X_test, dtype=np.float32)[at_pad]
+    loaded = LookupTable.load(LOOKUP_PATH)
+    timings = (
+        ('table, single row', lambda: loaded.predict(X_query[0]), 1),
+        ('NumPy network, single row', lambda: numpy_model.predict(X_query[0]), 1),
+        ('table, batched', lambda: loaded.lookup(X_query), len(X_query)),
+        ('NumPy network, batched', lambda: numpy_model.predict_batch(X_query), len(X_query)),
+    )
+    print("\nPython lookup cost:")
+    cost = {}
+    for name, fn, rows in timings:
+        fn()
+        runs = 1000 if rows == 1 else 10
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        cost[name] = (time.perf_counter() - start) / runs / rows * 1e6
+        print(f"  {name:<26} {cost[name]:8.2f} us/row")
+
+    network_size = sum(w.nbytes + b.nbytes for w, b in zip(numpy_model.weights, numpy_model.biases))
+    for kind in ('single row', 'batched'):
+        ratio = cost[f'table, {kind}'] / cost[f'NumPy network, {kind}']
+        if ratio < 1:
+            print(f"{kind.capitalize()}: the table is {1 / ratio:.1f}x faster than the NumPy network")
+        else:
+            print(f"{kind.capitalize()}: the table does NOT pay off, it is {ratio:.1f}x slower "
+                  f"than the NumPy network")
+    print(f"Size: table {os.path.getsize(LOOKUP_PATH):,} bytes, network weights {network_size:,} bytes")
+    if table.acceptable(max_error=MAX_P99_ERROR, max_flip_rate=MAX_FLIP_RATE):
+        print(f"Error bound passes the gate (p99 {MAX_P99_ERROR}, flip rate {MAX_FLIP_RATE:.0%})")
+    else:
+        print(f"Error bound fails the gate (p99 {MAX_P99_ERROR}, flip rate {MAX_FLIP_RATE:.0%}), "
+              "the table is not usable in place of the network")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Returned by span() while profiling is off, so a disabled span is one
+# attribute check and an empty with-block
+_DISABLED_SPAN = nullcontext()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, None if unavailable"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+
+class Profiler:
+    """
+    Opt-in timing of pipeline phases
+
+    Disabled by default; span() then hands back a shared no-op context and
+    epoch() returns straight away. Once enabled it records:
+      - named spans (nested spans are fine), with the peak RSS at their end
+      - per-epoch throughput in samples/sec, with optional data/compute split
+      - optionally a cProfile or torch.profiler capture around capture()
+
+    report() prints a per-phase summary and writes a JSON trace whose
+    traceEvents open in chrome://tracing or Perfetto.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.cprofile = False
+        self.torch_profiler = False
+        self.reset()
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.epochs = []
+
+    def enable(self, cprofile=False, torch_profiler=False):
+        self.enabled = True
+        self.cprofile = cprofile
+        self.torch_profiler = torch_profiler
+        self.reset()
+
+    def span(self, name):
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.spans.append({
+                'name': name,
+                'start_s': start - self.origin,
+                'seconds': end - start,
+                'peak_rss_mb': peak_rss_mb(),
+            })
+
+    def epoch(self, epoch, samples, seconds, **phases):
+        """Record one epoch; phases are extra second counts, e.g. data_seconds"""
+        if not self.enabled:
+            return
+        self.epochs.append({
+            'epoch': epoch + 1,
+            'samples': samples,
+            'seconds': seconds,
+            'samples_per_second': samples / seconds if seconds > 0 else 0.0,
+            **phases,
+        })
+
+    @contextmanager
+    def capture(self, output_prefix='profile'):
+        """
+        Run the enclosed block under cProfile and/or torch.profiler if enabled
+
+        cProfile stats go to <prefix>.prof (and the top functions are
+        printed); the torch.profiler trace goes to <prefix>_torch.json.
+        """
+        if not self.enabled or not (self.cprofile or self.torch_profiler):
+            yield
+            return
+
+        profile = torch_profile = None
+        if self.cprofile:
+            import cProfile
+            profile = cProfile.Profile()
+        if self.torch_profiler:
+            from torch.profiler import profile as TorchProfile, ProfilerActivity
+            torch_profile = TorchProfile(activities=[ProfilerActivity.CPU], record_shapes=True)
+
+        if torch_profile is not None:
+            torch_profile.__enter__()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                import pstats
+                profile.dump_stats(f'{output_prefix}.prof')
+                print(f"\ncProfile stats saved to {output_prefix}.prof, top functions:")
+                pstats.Stats(profile).sort_stats('cumulative').print_stats(15)
+            if torch_profile is not None:
+                torch_profile.__exit__(None, None, None)
+                torch_profile.export_chrome_trace(f'{output_prefix}_torch.json')
+                print(f"torch.profiler trace saved to {output_prefix}_torch.json")
+                print(torch_profile.key_averages().table(sort_by='cpu_time_total', row_limit=15))
+
+    def summary(self):
+        """Total time per span name, in order of first appearance"""
+        phases = {}
+        for span in self.spans:
+            phase = phases.setdefault(span['name'], {'calls': 0, 'seconds': 0.0})
+            phase['calls'] += 1
+            phase['seconds'] += span['seconds']
+
+        return {
+            'wall_seconds': time.perf_counter() - self.origin,
+            'peak_rss_mb': peak_rss_mb(),
+            'phases': phases,
+            'epochs': len(self.epochs),
+            'mean_samples_per_second': (sum(e['samples_per_second'] for e in self.epochs) /
+                                        len(self.epochs)) if self.epochs else None,
+        }
+
+    def report(self, trace_path):
+        """Print the summary and write the JSON trace (no-op when disabled)"""
+        if not self.enabled:
+            return None
+
+        summary = self.summary()
+        wall = summary['wall_seconds']
+
+        print("\n" + "="*60)
+        print("PROFILE")
+        print("="*60)
+        print(f"{'phase':<28}{'calls':>7}{'seconds':>11}{'% wall':>9}")
+        for name, phase in summary['phases'].items():
+            print(f"{name:<28}{phase['calls']:>7}{phase['seconds']:>11.3f}"
+                  f"{100 * phase['seconds'] / wall:>8.1f}%")
+        print(f"Wall time: {wall:.3f}s")
+        if summary['peak_rss_mb'] is not None:
+            print(f"Peak RSS: {summary['peak_rss_mb']:.1f} MB")
+        if summary['mean_samples_per_second'] is not None:
+            print(f"Training throughput: {summary['mean_samples_per_second']:,.0f} samples/s "
+                  f"(mean over {summary['epochs']} epochs)")
+
+        # Complete events ('X') in microseconds, chrome://tracing format
+        events = [{'name': span['name'], 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                   'ts': span['start_s'] * 1e6, 'dur': span['seconds'] * 1e6,
+                   'args': {'peak_rss_mb': span['peak_rss_mb']}}
+                  for span in self.spans]
+
+        with open(trace_path, 'w') as f:
+            json.dump({'traceEvents': events, 'summary': summary,
+                       'spans': self.spans, 'epochs': self.epochs}, f, indent=2)
+        print(f"Saved profile trace to {trace_path}")
+
+        return summary
+
+
+# Shared by the training and testing scripts, off unless a --profile flag is given
+profiler = Profiler()
+
+
+def enable_from_flags(flags):
+    """
+    Turn profiling on from command-line flags
+
+    --profile          spans, epoch throughput, peak RSS and a JSON trace
+    --profile-cprofile also run under cProfile
+    --profile-torch    also run under torch.profiler
+    """
+    cprofile = '--profile-cprofile' in flags
+    torch_profiler = '--profile-torch' in flags
+    if '--profile' in flags or cprofile or torch_profiler:
+        profiler.enable(cprofile=cprofile, torch_profiler=torch_profiler)
@@ -0,0 +1,305 @@
+import numpy as np
+import matplotlib
+import base64
+import html
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Draw functions fill an empty Figure from plain NumPy arrays. They run
+# in this process with pyplot (interactive mode) or in a worker process
+# on a bare Agg Figure (headless mode), so they must not touch pyplot.
+
+def draw_training_history(fig, train_losses, val_losses, train_accs, val_accs):
+    ax1, ax2 = fig.subplots(1, 2)
+
+    # Loss plot
+    ax1.plot(train_losses, label='Train Loss')
+    ax1.plot(val_losses, label='Val Loss')
+    ax1.set_xlabel('Epoch')
+    ax1.set_ylabel('Loss')
+    ax1.set_title('Training and Validation Loss')
+    ax1.legend()
+    ax1.grid(True)
+
+    # Accuracy plot
+    ax2.plot(train_accs, label='Train Acc')
+    ax2.plot(val_accs, label='Val Acc')
+    ax2.set_xlabel('Epoch')
+    ax2.set_ylabel('Accuracy (%)')
+    ax2.set_title('Training and Validation Accuracy')
+    ax2.legend()
+    ax2.grid(True)
+
+
+def draw_feature_importance(fig, sorted_features, sorted_importance):
+    ax = fig.subplots()
+    ax.barh(range(len(sorted_features)), sorted_importance)
+    ax.set_yticks(range(len(sorted_features)))
+    ax.set_yticklabels(sorted_features)
+    ax.set_xlabel('Average Absolute Weight')
+    ax.set_title('Feature Importance (First Layer Weights)')
+
+
+def draw_test_results(fig, cm, hist_edges, miss_counts, hit_counts, threshold,
+                      predictions_proba, correct, bin_centers,
+                      accuracy_by_confidence, counts_by_confidence,
+                      mean_proba_by_confidence, hit_rate_by_confidence, calibration_error):
+    import seaborn as sns
+    axes = fig.subplots(2, 2)
+
+    # 1. Confusion Matrix
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=axes[0, 0],
+                xticklabels=['Miss', 'Hit'], yticklabels=['Miss', 'Hit'])
+    axes[0, 0].set_title('Confusion Matrix')
+    axes[0, 0].set_ylabel('Actual')
+    axes[0, 0].set_xlabel('Predicted')
+
+    # 2. Probability Distribution, from precomputed histogram counts
+    axes[0, 1].hist(hist_edges[:-1], bins=hist_edges, weights=miss_counts, alpha=0.6,
+                    label='Actually Missed', color='green')
+    axes[0, 1].hist(hist_edges[:-1], bins=hist_edges, weights=hit_counts, alpha=0.6,
+                    label='Actually Hit', color='red')
+    axes[0, 1].axvline(threshold, color='black', linestyle='--',
+                       label=f'Threshold ({threshold})')
+    axes[0, 1].set_xlabel('Predicted Probability')
+    axes[0, 1].set_ylabel('Count')
+    axes[0, 1].set_title('Prediction Probability Distribution')
+    axes[0, 1].legend()
+    axes[0, 1].grid(True, alpha=0.3)
+
+    # 3. Prediction Confidence
+    axes[1, 0].scatter(np.arange(len(predictions_proba)), predictions_proba,
+                       c=correct, cmap='RdYlGn', alpha=0.6)
+    axes[1, 0].axhline(threshold, color='black', linestyle='--',
+                       label=f'Threshold')
+    axes[1, 0].set_xlabel('Sample Index')
+    axes[1, 0].set_ylabel('Predicted Probability')
+    axes[1, 0].set_title('Prediction Confidence (Green=Correct, Red=Wrong)')
+    axes[1, 0].legend()
+    axes[1, 0].grid(True, alpha=0.3)
+
+    # 4. Accuracy by Confidence Level, with the reliability curve
+    axes[1, 1].bar(bin_centers, accuracy_by_confidence, width=0.08,
+                   alpha=0.7, label='Accuracy')
+    axes[1, 1].plot([0, 1], [0, 1], color='gray', linestyle=':', label='Perfectly calibrated')
+    axes[1, 1].plot(mean_proba_by_confidence, hit_rate_by_confidence, 'o-', color='red',
+                    label='Actual hit rate')
+    axes[1, 1].set_xlabel('Prediction Probability Range')
+    axes[1, 1].set_ylabel('Accuracy / Hit Rate')
+    axes[1, 1].set_title(f'Accuracy and Calibration by Confidence (ECE {calibration_error:.4f})')
+    axes[1, 1].set_ylim(0, 1.1)
+    axes[1, 1].legend(loc='lower right')
+    axes[1, 1].grid(True, alpha=0.3)
+
+    # Add sample counts as text
+    for x, y, count in zip(bin_centers, accuracy_by_confidence, counts_by_confidence):
+        if count > 0:
+            axes[1, 1].text(x, y + 0.05, f'n={count}', ha='center', fontsize=8)
+
+
+def draw_threshold_analysis(fig, thresholds, accuracies, recalls, precisions, best_threshold):
+    ax = fig.subplots()
+    ax.plot(thresholds, accuracies, 'b-', label='Accuracy', linewidth=2)
+    ax.plot(thresholds, recalls, 'g--', label='Recall', linewidth=2)
+    ax.plot(thresholds, precisions, 'r--', label='Precision', linewidth=2)
+    ax.axvline(best_threshold, color='black', linestyle=':',
+               label=f'Best Threshold ({best_threshold:.3f})')
+    ax.set_xlabel('Decision Threshold')
+    ax.set_ylabel('Score')
+    ax.set_title('Model Performance vs Decision Threshold')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+
+
+def init_render_worker():
+    matplotlib.use('Agg')
+
+
+def warm_up_render_worker():
+    """Pay the matplotlib/seaborn import and font cache cost up front"""
+    from matplotlib.figure import Figure
+    import seaborn
+    Figure().savefig(io.BytesIO(), format='png')
+
+
+def render_png(draw, figsize, dpi, args):
+    """Draw onto a bare Agg figure and return the PNG bytes"""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    draw(fig, *args)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+def has_display():
+    """False on a Linux box with no X/Wayland display, e.g. a nightly job"""
+    if not sys.platform.startswith('linux'):
+        return True
+    return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+class Reporter:
+    """
+    Collects a run's figures and metrics into one HTML report
+
+    Modes:
+        interactive: render each figure when asked, save it and plt.show()
+                     (the scripts' original behaviour)
+        headless:    Agg backend, figures render in a background process
+                     pool while the caller carries on; PNGs are written
+                     when finish() collects them
+        none:        skip plots and the report entirely
+
+    finish() writes every PNG plus a self-contained HTML report with the
+    figures embedded and the metric tables added with add_metrics().
+    """
+
+    def __init__(self):
+        self.mode = 'interactive'
+        self.workers = 2
+        self.pool = None
+        self.reset()
+
+    def reset(self):
+        self.figures = []
+        self.sections = []
+        self.started = time.time()
+
+    def configure(self, mode, workers=2):
+        if mode not in ('interactive', 'headless', 'none'):
+            raise ValueError(f"Unknown report mode {mode}")
+        self.mode = mode
+        self.workers = workers
+        if mode == 'headless':
+            matplotlib.use('Agg')
+            self.start_pool()
+
+    def start_pool(self):
+        """
+        Start the render workers now, so their startup overlaps the run
+
+        Workers are forked on Linux (cheap, nothing is re-imported) and
+        spawned elsewhere, where they import the calling script again.
+        """
+        if self.pool is not None:
+            return
+        method = 'fork' if sys.platform.startswith('linux') else 'spawn'
+        self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                        mp_context=get_context(method),
+                                        initializer=init_render_worker)
+        for _ in range(self.workers):
+            self.pool.submit(warm_up_render_worker)
+
+    @property
+    def enabled(self):
+        return self.mode != 'none'
+
+    def plot(self, draw, filename, args, figsize, dpi=100, title=None):
+        """Render draw(fig, *args) to filename (now, or in the background)"""
+        if self.mode == 'none':
+            return
+        title = title or os.path.splitext(os.path.basename(filename))[0]
+
+        if self.mode == 'interactive':
+            import matplotlib.pyplot as plt
+            fig = plt.figure(figsize=figsize)
+            draw(fig, *args)
+            fig.tight_layout()
+            fig.savefig(filename, dpi=dpi)
+            with open(filename, 'rb') as f:
+                self.figures.append((title, filename, f.read()))
+            plt.show()
+            return
+
+        self.start_pool()
+        future = self.pool.submit(render_png, draw, figsize, dpi, args)
+        self.figures.append((title, filename, future))
+
+    def add_metrics(self, title, metrics):
+        if self.enabled:
+            self.sections.append((title, metrics))
+
+    def finish(self, report_path, title='LBW report'):
+        """
+        Wait for background renders, write the PNGs and the HTML report
+
+        PNGs are written in submission order, so a file plotted twice
+        ends up with the later figure, as with the synchronous scripts.
+        Returns the report path, or None in 'none' mode.
+        """
+        if self.mode == 'none':
+            return None
+
+        figures = []
+        for figure_title, filename, png in self.figures:
+            if not isinstance(png, bytes):
+                png = png.result()
+                with open(filename, 'wb') as f:
+                    f.write(png)
+            figures.append((figure_title, filename, png))
+
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+        with open(report_path, 'w') as f:
+            f.write(build_html(title, self.started, self.sections, figures))
+
+        self.reset()
+        return report_path
+
+
+def build_html(title, started, sections, figures):
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8">',
+        f'<title>{html.escape(title)}</title>',
+        '<style>body{font-family:sans-serif;margin:2em;max-width:1400px}'
+        'table{border-collapse:collapse;margin-bottom:1.5em}'
+        'td,th{border:1px solid #ccc;padding:4px 10px;text-align:left}'
+        'img{max-width:100%;border:1px solid #eee}</style></head><body>',
+        f'<h1>{html.escape(title)}</h1>',
+        f'<p>Generated {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started))}</p>',
+    ]
+
+    for section_title, metrics in sections:
+        parts.append(f'<h2>{html.escape(section_title)}</h2><table>')
+        for name, value in metrics.items():
+            value = f'{value:.4f}' if isinstance(value, float) else str(value)
+            parts.append(f'<tr><th>{html.escape(str(name))}</th><td>{html.escape(value)}</td></tr>')
+        parts.append('</table>')
+
+    for figure_title, filename, png in figures:
+        encoded = base64.b64encode(png).decode('ascii')
+        parts.append(f'<h2>{html.escape(figure_title)}</h2>'
+                     f'<p>{html.escape(filename)}</p>'
+                     f'<img src="data:image/png;base64,{encoded}">')
+
+    parts.append('</body></html>')
+    return '\n'.join(parts)
+
+
+# Shared by the training and testing scripts
+reporter = Reporter()
+
+
+def configure_from_flags(flags):
+    """
+    Pick the report mode from command-line flags
+
+    --no-plots  skip all plotting
+    --headless  Agg + background rendering (also the default with no display)
+    """
+    if '--no-plots' in flags:
+        reporter.configure('none')
+    elif '--headless' in flags or not has_display():
+        reporter.configure('headless')
+    else:
+        reporter.configure('interactive')
@@ -0,0 +1,314 @@
+import numpy as np
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+
+# Requests wait at most this long for others to share their batch
+DEFAULT_MAX_WAIT_MS = 2.0
+DEFAULT_MAX_BATCH = 1024
+
+
+def load_torch_predictor(model_path='lbw_model_best.pth', scaler_path='scaler.pkl'):
+    """Batch predict function backed by the PyTorch checkpoint"""
+    import torch
+    from test_lbw_model import load_model_and_scaler, predict_lbw_batch
+
+    # One thread per batch, the event loop runs alongside it
+    torch.set_num_threads(1)
+    model, scaler = load_model_and_scaler(model_path, scaler_path)
+    input_size = model.network[0].in_features
+
+    return (lambda X: predict_lbw_batch(model, scaler, X)), input_size
+
+
+def load_onnx_predictor(onnx_path='lbw_model_legacy.onnx', scaler_json='scaler_params.json'):
+    """Batch predict function backed by the ONNX export"""
+    from test_onnx import create_session, load_scaler_params, predict_onnx
+
+    session = create_session(onnx_path)
+    scaler_params = load_scaler_params(scaler_json)
+    input_size = session.get_inputs()[0].shape[1]
+
+    return (lambda X: predict_onnx(session, X, scaler_params)), input_size
+
+
+def load_numpy_predictor(npz_path='lbw_model.npz'):
+    """Batch predict function backed by lbw_inference.py, no torch import"""
+    from lbw_inference import NumpyLBWPredictor
+
+    predictor = NumpyLBWPredictor.load(npz_path)
+    return predictor.predict_batch, predictor.input_size
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent requests into one model call
+
+    Each request puts its rows on a queue and awaits a future. The batch
+    loop takes the first waiting request, then keeps collecting until
+    max_batch rows are queued or max_wait has passed, and runs the model
+    once for all of them in a worker thread.
+    """
+
+    def __init__(self, predict, input_size, threshold=0.5,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.predict = predict
+        self.input_size = input_size
+        self.threshold = threshold
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+
+        self.latencies = deque(maxlen=100_000)
+        self.batch_sizes = deque(maxlen=10_000)
+        self.requests = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    async def submit(self, X):
+        """Probabilities for the rows of X, once their batch has run"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            rows = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+
+            X = np.concatenate([x for x, _ in pending])
+            try:
+                probabilities = await loop.run_in_executor(None, self.predict, X)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.batch_sizes.append(len(X))
+            start = 0
+            for x, future in pending:
+                future.set_result(probabilities[start:start + len(x)])
+                start += len(x)
+
+    def record(self, seconds, rows):
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.rows += rows
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'uptime_seconds': elapsed,
+            'requests_per_second': self.requests / elapsed,
+            'latency_p50_ms': float(np.percentile(latencies, 50)),
+            'latency_p99_ms': float(np.percentile(latencies, 99)),
+            'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+            'threshold': self.threshold,
+        }
+
+
+# Minimal HTTP/1.1 with keep-alive, enough for JSON over localhost
+async def read_request(reader):
+    """
+    (method, path, body) of the next request, or None when the client closed
+
+    Raises ValueError for a request that can't be parsed; the connection
+    can't be trusted to be in sync after that.
+    """
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError('request head too large')
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise ValueError(f'malformed request line {lines[0]!r}')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise ValueError(f"invalid Content-Length {headers['content-length']!r}")
+    if length < 0:
+        raise ValueError(f'invalid Content-Length {length}')
+
+    try:
+        body = await reader.readexactly(length) if length else b''
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        # Client closed before sending the whole body
+        return None
+    return method, path, body
+
+
+def write_response(writer, status, payload):
+    body = json.dumps(payload).encode()
+    reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+    writer.write(f'HTTP/1.1 {status} {reason}\r\n'
+                 f'Content-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+
+
+def parse_features(body, input_size):
+    """
+    Rows from a {"features": [...]} payload
+
+    features is one row of input_size floats (in LBWPredictor.cs order),
+    or a list of such rows.
+    """
+    X = np.asarray(json.loads(body)['features'], dtype=np.float32)
+    if X.ndim == 1:
+        X = X[None, :]
+    if X.ndim != 2 or X.shape[1] != input_size:
+        raise ValueError(f"expected {input_size} features per row, got shape {list(X.shape)}")
+    return X
+
+
+async def handle_request(batcher, method, path, body):
+    """(status, payload) for one parsed request"""
+    if method == 'POST' and path == '/predict':
+        start = time.perf_counter()
+        try:
+            X = parse_features(body, batcher.input_size)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': str(e)}
+
+        try:
+            probabilities = await batcher.submit(X)
+        except Exception as e:
+            # The model call failed for the whole batch, answer instead
+            # of dropping the connection
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+
+        decisions = probabilities >= batcher.threshold
+        if len(X) == 1:
+            payload = {'probability': float(probabilities[0]),
+                       'willHitStumps': bool(decisions[0])}
+        else:
+            payload = {'probability': probabilities.tolist(),
+                       'willHitStumps': decisions.tolist()}
+        batcher.record(time.perf_counter() - start, len(X))
+        return 200, payload
+
+    if method == 'GET' and path == '/stats':
+        return 200, batcher.stats()
+    return 404, {'error': f'no route for {method} {path}'}
+
+
+async def handle_connection(batcher, reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except ValueError as e:
+                # Answer, then close: the rest of the stream can't be framed
+                write_response(writer, 400, {'error': str(e)})
+                await writer.drain()
+                break
+            if request is None:
+                break
+
+            status, payload = await handle_request(batcher, *request)
+            write_response(writer, status, payload)
+            await writer.drain()
+    except ConnectionResetError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(predict, input_size, host='127.0.0.1', port=8765, unix_socket=None,
+                threshold=0.5, max_wait_ms=DEFAULT_MAX_WAIT_MS, max_batch=DEFAULT_MAX_BATCH,
+                report_every=10.0):
+    """
+    Serve predictions over TCP (host:port) or a Unix socket until cancelled
+
+    Prints the latency/throughput stats every report_every seconds while
+    requests are coming in.
+    """
+    batcher = MicroBatcher(predict, input_size, threshold, max_wait_ms, max_batch)
+    handler = lambda reader, writer: handle_connection(batcher, reader, writer)
+
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = await asyncio.start_unix_server(handler, path=unix_socket)
+        print(f"Serving on unix:{unix_socket}")
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        print(f"Serving on http://{host}:{port}")
+
+    print(f"  max wait {max_wait_ms} ms, max batch {max_batch}, threshold {threshold}")
+
+    batch_loop = asyncio.create_task(batcher.run())
+    try:
+        async with server:
+            last_requests = 0
+            while True:
+                await asyncio.sleep(report_every)
+                if batcher.requests != last_requests:
+                    last_requests = batcher.requests
+                    s = batcher.stats()
+                    print(f"{s['requests']:,} requests, {s['requests_per_second']:,.0f} req/s, "
+                          f"p50 {s['latency_p50_ms']:.2f} ms, p99 {s['latency_p99_ms']:.2f} ms, "
+                          f"mean batch {s['mean_batch_size']:.1f}")
+    finally:
+        batch_loop.cancel()
+
+
+def main():
+    """
+    Usage: python lbw_server.py [--onnx | --numpy] [--unix PATH] [--port N] [--max-wait-ms MS]
+                                [--threshold T]
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    if '--onnx' in args:
+        predict, input_size = load_onnx_predictor()
+    elif '--numpy' in args:
+        predict, input_size = load_numpy_predictor()
+    else:
+        predict, input_size = load_torch_predictor()
+
+    try:
+        asyncio.run(serve(predict, input_size,
+                          port=int(option('--port', 8765)),
+                          unix_socket=option('--unix', None),
+                          threshold=float(option('--threshold', 0.5)),
+                          max_wait_ms=float(option('--max-wait-ms', DEFAULT_MAX_WAIT_MS))))
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == '__main__':
+    main()
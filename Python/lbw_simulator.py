@@ -0,0 +1,300 @@
+import numpy as np
+import sys
+import time
+from columnar_dataset import FEATURE_NAMES
+
+# Scene values from SampleScene.unity, Ball.prefab, the physics materials
+# and ProjectSettings (Physics2DSettings / TimeManager)
+FIXED_DT = 0.02
+GRAVITY = -9.81
+VELOCITY_THRESHOLD = 1.0            # below this normal speed bounces are inelastic
+
+BALL_MASS = 1.0
+BALL_RADIUS = 1.135 * 0.15           # CircleCollider2D radius * prefab scale
+BALL_INERTIA = 0.5 * BALL_MASS * BALL_RADIUS ** 2
+BALL_ANGULAR_DAMPING = 0.05
+BOUNCINESS = 0.65
+FRICTION = 0.05
+
+RELEASE_POINT = (-7.0, 1.0)          # Bowling ball position
+GROUND_TOP = -4.0 + 0.5              # Floor at y=-4, BoxCollider2D height 1
+
+STUMPS_POSITION = (8.0, -3.0)
+STUMPS_HALF_SIZE = (0.4 * 0.7 / 2, 2.0 / 2)  # BoxCollider2D size * scale
+
+PAD_START_X = 5.92
+PAD_Y = -2.74
+PAD_SCALE = 0.5
+PAD_MIN_X, PAD_MAX_X, PAD_MOVE_VARIATION = 2.0, 8.0, 0.5
+PAD_POLYGON = np.array([
+    (0.06, -1.315), (0.05, -1.145), (0.04, -1.025), (0.04, -0.875), (0.09, -0.705),
+    (0.15, -0.635), (0.17, -0.585), (0.23, -0.445), (0.30, -0.285), (0.33, -0.135),
+    (0.34, 0.005), (0.32, 0.185), (0.28, 0.355), (0.29, 0.525), (0.29, 0.645),
+    (0.30, 0.735), (0.29, 0.845), (0.27, 0.925), (0.29, 1.025), (0.30, 1.125),
+    (0.28, 1.225), (0.25, 1.345), (0.18, 1.435), (0.04, 1.475), (-0.05, 1.435),
+    (-0.14, 1.195), (-0.22, 1.015), (-0.32, 0.755), (-0.34, 0.595), (-0.33, 0.505),
+    (-0.29, 0.405), (-0.29, 0.195), (-0.26, -0.655), (-0.26, -0.975), (-0.21, -1.245),
+    (-0.17, -1.335), (-0.15, -1.435), (-0.08, -1.465), (-0.01, -1.455), (0.04, -1.415),
+    (0.06, -1.365),
+]) * PAD_SCALE
+
+# FastDataCollector / Bowling defaults (sampleRate as set in the scene)
+DELIVERY_DEFAULTS = {
+    'angle_min': -22.5,
+    'angle_max': -5.0,
+    'force_multiplier': 10.0,
+    'fixed_distance': 2.0,
+    'top_spin_speed_multiplier': 0.85,
+    'back_spin_speed_multiplier': 1.0,
+    'speed_variation': 0.1,
+    'spin_torque': 10.0,
+    'top_spin_down_force': 0.1,
+    'back_spin_lift_force': 0.1,
+    'sample_rate': 0.05,
+    'balls_per_pad_position': 5,
+    'max_ball_age': 5.0,
+}
+
+# LBWData.SaveAsCSV header, spacing included
+CSV_HEADER = ("spinType,speed,spinAmount,timeSinceRelease,ballPosX,ballPosY,"
+              "ballVelX,ballVelY,ballAngularVel,distanceToStumps,"
+              "distanceToPad,hitPad, reachedPad, willHitStumps")
+CSV_FORMAT = ['%d'] + ['%.6f'] * 10 + ['%d', '%d', '%d']
+
+TOP_SPIN, BACK_SPIN = 0, 1  # Bowling.SpinType
+
+
+def randomize_pad_positions(n_balls, rng, balls_per_position=5):
+    """Pad.RandomizePosition, called every balls_per_position balls"""
+    n_sets = -(-n_balls // balls_per_position)
+    offsets = rng.uniform(-PAD_MOVE_VARIATION, PAD_MOVE_VARIATION, size=n_sets)
+    pad_x = np.clip(PAD_START_X + offsets, PAD_MIN_X, PAD_MAX_X)
+    return np.repeat(pad_x, balls_per_position)[:n_balls]
+
+
+def circle_overlaps_pad(pos, pad_x):
+    """Circle vs the pad's PolygonCollider2D, for each ball"""
+    px = pos[:, 0:1] - pad_x[:, None]
+    py = pos[:, 1:2] - PAD_Y
+
+    ax, ay = PAD_POLYGON[:, 0], PAD_POLYGON[:, 1]
+    bx, by = np.roll(ax, -1), np.roll(ay, -1)
+
+    # Centre inside the polygon (even-odd rule)
+    crosses = ((ay > py) != (by > py)) & (px < (bx - ax) * (py - ay) / (by - ay + 1e-12) + ax)
+    inside = crosses.sum(axis=1) % 2 == 1
+
+    # Or closer than the radius to any edge
+    ex, ey = bx - ax, by - ay
+    t = np.clip(((px - ax) * ex + (py - ay) * ey) / (ex * ex + ey * ey), 0.0, 1.0)
+    dist_sq = (px - ax - t * ex) ** 2 + (py - ay - t * ey) ** 2
+    touching = dist_sq.min(axis=1) < BALL_RADIUS ** 2
+
+    return inside | touching
+
+
+def circle_overlaps_stumps(pos):
+    """Circle vs the stumps' BoxCollider2D trigger"""
+    dx = np.maximum(np.abs(pos[:, 0] - STUMPS_POSITION[0]) - STUMPS_HALF_SIZE[0], 0.0)
+    dy = np.maximum(np.abs(pos[:, 1] - STUMPS_POSITION[1]) - STUMPS_HALF_SIZE[1], 0.0)
+    return dx * dx + dy * dy < BALL_RADIUS ** 2
+
+
+def resolve_ground_contact(pos, vel, omega, touching):
+    """
+    Bounce and friction against the floor for balls in contact
+
+    Restitution applies above the velocity threshold; friction is a
+    Coulomb-clamped impulse at the contact point that couples the slip
+    velocity with spin, like Box2D's contact solver.
+    """
+    idx = np.flatnonzero(touching)
+    if len(idx) == 0:
+        return
+
+    vy = vel[idx, 1]
+    restitution = np.where(-vy > VELOCITY_THRESHOLD, BOUNCINESS, 0.0)
+    normal_impulse = BALL_MASS * (1.0 + restitution) * np.maximum(-vy, 0.0)
+    # Resting contact still carries the weight of the ball
+    normal_impulse = np.maximum(normal_impulse, BALL_MASS * -GRAVITY * FIXED_DT)
+
+    vel[idx, 1] = np.maximum(-restitution * vy, 0.0)
+    pos[idx, 1] = GROUND_TOP + BALL_RADIUS
+
+    # Contact point velocity at the bottom of the ball
+    slip = vel[idx, 0] + omega[idx] * BALL_RADIUS
+    tangent_impulse = -slip / (1.0 / BALL_MASS + BALL_RADIUS ** 2 / BALL_INERTIA)
+    limit = FRICTION * normal_impulse
+    tangent_impulse = np.clip(tangent_impulse, -limit, limit)
+
+    vel[idx, 0] += tangent_impulse / BALL_MASS
+    omega[idx] += tangent_impulse * BALL_RADIUS / BALL_INERTIA
+
+
+def simulate_deliveries(n_balls, rng, params=None, pad_x=None, angles=None,
+                        spin_types=None, speed_variations=None):
+    """
+    Bowl n_balls deliveries in lockstep and record them like FastDataCollector
+
+    Each ball is launched like FastDataCollector.SpawnBall (impulse from
+    the bowling angle, spin speed multiplier and variation, +-torque),
+    with Bowling's top-spin down force / back-spin lift while airborne.
+    Frames are sampled every sample_rate seconds until the ball reaches
+    the (ghost) pad, plus one frame at the pad, and every frame of a ball
+    gets the ball's final stumps-hit label.
+
+    Any of pad_x, angles, spin_types or speed_variations can be passed to
+    pin those delivery parameters instead of drawing them at random.
+
+    Returns:
+        X: (rows, 13) float32 features in FEATURE_NAMES order
+        y: (rows,) int labels
+        delivery: (rows,) ball index of each row
+    """
+    p = dict(DELIVERY_DEFAULTS, **(params or {}))
+
+    if angles is None:
+        angles = rng.uniform(p['angle_min'], p['angle_max'], size=n_balls)
+    if spin_types is None:
+        spin_types = rng.integers(0, 2, size=n_balls)
+    if speed_variations is None:
+        speed_variations = rng.uniform(1 - p['speed_variation'], 1 + p['speed_variation'], size=n_balls)
+    if pad_x is None:
+        pad_x = randomize_pad_positions(n_balls, rng, p['balls_per_pad_position'])
+
+    spin_types = np.asarray(spin_types)
+    speed_mult = np.where(spin_types == TOP_SPIN, p['top_spin_speed_multiplier'],
+                          p['back_spin_speed_multiplier'])
+    speed = speed_mult * speed_variations
+    torque = np.where(spin_types == TOP_SPIN, p['spin_torque'], -p['spin_torque'])
+
+    radians = np.deg2rad(angles)
+    impulse = p['fixed_distance'] * p['force_multiplier'] * speed
+    pos = np.tile(np.array(RELEASE_POINT, dtype=np.float64), (n_balls, 1))
+    vel = np.stack([np.cos(radians), np.sin(radians)], axis=1) * (impulse / BALL_MASS)[:, None]
+    # AddTorque in Force mode acts for one fixed step
+    omega = torque * FIXED_DT / BALL_INERTIA
+
+    spin_force = np.where(spin_types == TOP_SPIN, -p['top_spin_down_force'], p['back_spin_lift_force'])
+
+    active = np.ones(n_balls, dtype=bool)
+    reached_pad = np.zeros(n_balls, dtype=bool)
+    hit_pad = np.zeros(n_balls, dtype=bool)
+    hit_stumps = np.zeros(n_balls, dtype=bool)
+    last_sample = np.zeros(n_balls)
+
+    recorded = []
+    t = 0.0
+    while active.any() and t < p['max_ball_age']:
+        # Integrate (semi-implicit Euler, as Box2D does)
+        airborne = pos[:, 1] - BALL_RADIUS > GROUND_TOP + 1e-6
+        vel[:, 1] += GRAVITY * FIXED_DT
+        vel[airborne, 1] += spin_force[airborne] / BALL_MASS * FIXED_DT
+        omega /= 1.0 + FIXED_DT * BALL_ANGULAR_DAMPING
+        pos += vel * FIXED_DT
+        t += FIXED_DT
+
+        touching = (pos[:, 1] - BALL_RADIUS <= GROUND_TOP) & active
+        resolve_ground_contact(pos, vel, omega, touching)
+
+        # Trigger checks only for balls near the pad / stumps
+        near_pad = active & (np.abs(pos[:, 0] - pad_x) < 0.5)
+        if near_pad.any():
+            hit_pad[near_pad] |= circle_overlaps_pad(pos[near_pad], pad_x[near_pad])
+        near_stumps = active & (np.abs(pos[:, 0] - STUMPS_POSITION[0]) < 0.5)
+        if near_stumps.any():
+            hit_stumps[near_stumps] |= circle_overlaps_stumps(pos[near_stumps])
+
+        # RecordAllActiveBalls
+        before_pad = active & ~reached_pad & (pos[:, 0] < pad_x)
+        sample = before_pad & (t - last_sample >= p['sample_rate'] - 1e-9)
+        arriving = active & ~reached_pad & (pos[:, 0] >= pad_x)
+        reached_pad |= arriving
+        sample |= arriving
+        last_sample[sample] = t
+
+        idx = np.flatnonzero(sample)
+        if len(idx):
+            recorded.append(record_frames(idx, t, pos, vel, omega, pad_x,
+                                          hit_pad, spin_types, speed, torque))
+
+        # FinalizeBall once past the stumps (or far away)
+        active &= ~(pos[:, 0] >= STUMPS_POSITION[0] + 0.5)
+        active &= pos[:, 0] <= 20.0
+
+    if not recorded:
+        return np.empty((0, len(FEATURE_NAMES)), np.float32), np.empty(0, int), np.empty(0, int)
+
+    delivery = np.concatenate([r[0] for r in recorded])
+    X = np.concatenate([r[1] for r in recorded])
+
+    # Group rows per ball, in time order, like FinalizeBall writes them
+    order = np.argsort(delivery, kind='stable')
+    delivery, X = delivery[order], X[order]
+    y = hit_stumps[delivery].astype(int)
+
+    return X, y, delivery
+
+
+def record_frames(idx, t, pos, vel, omega, pad_x, hit_pad, spin_types, speed, torque):
+    """One RecordSample row for every ball in idx"""
+    ball_pos = pos[idx]
+    pad_pos = np.stack([pad_x[idx], np.full(len(idx), PAD_Y)], axis=1)
+
+    X = np.empty((len(idx), len(FEATURE_NAMES)), dtype=np.float32)
+    X[:, 0] = spin_types[idx]
+    X[:, 1] = speed[idx]
+    X[:, 2] = np.abs(torque[idx])
+    X[:, 3] = t
+    X[:, 4:6] = ball_pos
+    X[:, 6:8] = vel[idx]
+    X[:, 8] = np.rad2deg(omega[idx])  # Rigidbody2D.angularVelocity is in deg/s
+    X[:, 9] = np.hypot(*(ball_pos - np.array(STUMPS_POSITION)).T)
+    X[:, 10] = np.hypot(*(ball_pos - pad_pos).T)
+    X[:, 11] = hit_pad[idx]
+    X[:, 12] = ball_pos[:, 0] >= pad_x[idx]
+
+    return idx, X
+
+
+def write_lbw_csv(path, X, y, mode='w'):
+    """Write rows in the exact LBWData.SaveAsCSV format"""
+    table = np.column_stack([X.astype(np.float64), y])
+    with open(path, mode) as f:
+        np.savetxt(f, table, fmt=CSV_FORMAT, delimiter=',',
+                   header=CSV_HEADER if mode == 'w' else '', comments='')
+
+
+def generate_dataset(n_deliveries, csv_path, seed=0, params=None, batch_size=20000):
+    """
+    Simulate n_deliveries in lockstep batches and write them to csv_path
+
+    Returns the number of rows written.
+    """
+    rng = np.random.default_rng(seed)
+    rows = 0
+
+    for start in range(0, n_deliveries, batch_size):
+        n_balls = min(batch_size, n_deliveries - start)
+        X, y, _ = simulate_deliveries(n_balls, rng, params)
+        write_lbw_csv(csv_path, X, y, mode='w' if start == 0 else 'a')
+        rows += len(y)
+
+    return rows
+
+
+def main():
+    n_deliveries = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else 'SimulatedTrainingData.csv'
+
+    print(f"Simulating {n_deliveries:,} deliveries...")
+    start = time.perf_counter()
+    rows = generate_dataset(n_deliveries, csv_path)
+    elapsed = time.perf_counter() - start
+
+    print(f"Wrote {rows:,} rows to {csv_path} in {elapsed:.1f}s "
+          f"({n_deliveries / elapsed:,.0f} deliveries/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import numpy as np
+import onnx
+import json
+import os
+import time
+from onnxruntime.quantization import (quantize_dynamic, quantize_static, QuantType,
+                                      QuantFormat, CalibrationDataReader)
+from test_lbw_model import load_test_data
+from test_onnx import create_session, load_scaler_params, predict_onnx
+
+
+class CSVCalibrationReader(CalibrationDataReader):
+    """Feed rows sampled from a training CSV to the static quantizer"""
+
+    def __init__(self, X, input_name='input', batch_size=256):
+        self.batches = iter([{input_name: X[start:start + batch_size]}
+                             for start in range(0, len(X), batch_size)])
+
+    def get_next(self):
+        return next(self.batches, None)
+
+
+def calibration_rows(train_csv_path, scaler_json_path, samples=5000, seed=0):
+    """Random training rows, in the form the exported model takes as input"""
+    X, _ = load_test_data(train_csv_path)
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X, dtype=np.float32)[rng.choice(len(X), size=min(samples, len(X)), replace=False)]
+
+    params = load_scaler_params(scaler_json_path)
+    if not params['folded']:
+        X = (X - params['mean']) / params['scale']
+
+    return X.astype(np.float32)
+
+
+def first_layer_nodes(onnx_path):
+    """
+    Names of the first Gemm node, as seen by both quantizers
+
+    With the scaler folded in, the first layer sees raw features whose
+    ranges differ by four orders of magnitude (speed ~1, ballAngularVel
+    ~800), so one per-tensor INT8 scale for its input would wipe out the
+    small features. It stays float32 in both INT8 variants.
+
+    quantize_dynamic splits Gemm into MatMul + Add before quantizing and
+    names the MatMul "<gemm name>_MatMul", so both names are returned.
+    """
+    graph = onnx.load(onnx_path).graph
+    first_gemm = next(node.name for node in graph.node if node.op_type == 'Gemm')
+    return [first_gemm, f'{first_gemm}_MatMul']
+
+
+def export_int8_dynamic(onnx_path, out_path):
+    quantize_dynamic(onnx_path, out_path, weight_type=QuantType.QInt8,
+                     nodes_to_exclude=first_layer_nodes(onnx_path))
+
+
+def export_int8_static(onnx_path, out_path, calibration_X):
+    quantize_static(onnx_path, out_path, CSVCalibrationReader(calibration_X),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QInt8, weight_type=QuantType.QInt8,
+                    nodes_to_exclude=first_layer_nodes(onnx_path))
+
+
+def export_fp16(onnx_path, out_path):
+    """
+    Store weights and compute in float16, keeping float32 input/output
+
+    Needs onnxconverter-common; returns False when it is not installed.
+    """
+    try:
+        from onnxconverter_common import float16
+    except ImportError:
+        print("onnxconverter-common not installed, skipping fp16 variant")
+        return False
+
+    model = float16.convert_float_to_float16(onnx.load(onnx_path), keep_io_types=True)
+    onnx.save(model, out_path)
+    return True
+
+
+def measure_variant(onnx_path, X_test, y_true, scaler_params, single_runs=2000):
+    """Size, latency and accuracy of one exported model"""
+    session = create_session(onnx_path)
+    input_name = session.get_inputs()[0].name
+
+    # Single-sample latency, the Unity per-ball call pattern
+    single = X_test[:1]
+    if not scaler_params['folded']:
+        single = (single - scaler_params['mean']) / scaler_params['scale']
+    for _ in range(50):
+        session.run(None, {input_name: single})
+    timings = np.empty(single_runs)
+    for i in range(single_runs):
+        start = time.perf_counter()
+        session.run(None, {input_name: single})
+        timings[i] = time.perf_counter() - start
+
+    # Whole test set in one batch
+    start = time.perf_counter()
+    probs = predict_onnx(session, X_test, scaler_params)
+    batched_seconds = time.perf_counter() - start
+
+    predictions = probs >= 0.5
+    tp = int((predictions & (y_true == 1)).sum())
+    fn = int((~predictions & (y_true == 1)).sum())
+
+    return {
+        'size_bytes': os.path.getsize(onnx_path),
+        'single_p50_us': float(np.percentile(timings, 50) * 1e6),
+        'single_p99_us': float(np.percentile(timings, 99) * 1e6),
+        'batched_us_per_row': batched_seconds / len(X_test) * 1e6,
+        'accuracy': float(np.mean(predictions == y_true)),
+        'recall': tp / (tp + fn) if tp + fn > 0 else 0.0,
+        'probabilities': probs,
+    }
+
+
+def main():
+    onnx_path = 'lbw_model_legacy.onnx'
+    scaler_json = 'scaler_params.json'
+    train_csv = '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+
+    for path in (onnx_path, scaler_json, train_csv, test_csv):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found, run export_to_onnx.py first")
+            return
+
+    variants = {'float32': onnx_path}
+
+    print("Building quantized variants...")
+    if export_fp16(onnx_path, 'lbw_model_fp16.onnx'):
+        variants['fp16'] = 'lbw_model_fp16.onnx'
+
+    export_int8_dynamic(onnx_path, 'lbw_model_int8_dynamic.onnx')
+    variants['int8_dynamic'] = 'lbw_model_int8_dynamic.onnx'
+
+    calibration_X = calibration_rows(train_csv, scaler_json)
+    export_int8_static(onnx_path, 'lbw_model_int8_static.onnx', calibration_X)
+    variants['int8_static'] = 'lbw_model_int8_static.onnx'
+
+    print("Measuring on the test set...")
+    X_test, y_true = load_test_data(test_csv)
+    X_test = np.asarray(X_test, dtype=np.float32)
+    scaler_params = load_scaler_params(scaler_json)
+
+    report = {}
+    reference = None
+    for name, path in variants.items():
+        result = measure_variant(path, X_test, y_true, scaler_params)
+        probs = result.pop('probabilities')
+        if reference is None:
+            reference = probs
+        result['max_diff_vs_float32'] = float(np.abs(probs - reference).max())
+        result['path'] = path
+        report[name] = result
+
+    print("\n" + "="*96)
+    print("QUANTIZATION REPORT")
+    print("="*96)
+    print(f"{'variant':<14}{'size (B)':>10}{'single p50 (us)':>17}{'single p99 (us)':>17}"
+          f"{'batched (us/row)':>18}{'accuracy':>10}{'recall':>10}")
+    for name, r in report.items():
+        print(f"{name:<14}{r['size_bytes']:>10,}{r['single_p50_us']:>17.1f}{r['single_p99_us']:>17.1f}"
+              f"{r['batched_us_per_row']:>18.3f}{r['accuracy']:>10.2%}{r['recall']:>10.2%}")
+
+    with open('quantization_report.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print("\nSaved quantization_report.json")
+    print("Note: Barracuda has no INT8 kernels, the INT8 variants are for onnxruntime consumers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import pickle
+import shutil
+import json
+import copy
+import time
+import os
+import sys
+from columnar_dataset import FEATURE_NAMES, assign_delivery_ids
+from train_lbw_model import load_dataset, split_by_delivery, train_model_fast
+from test_lbw_model import load_model_and_scaler, file_hash
+
+# Everything incremental training keeps between runs: the lineage
+# manifest, the replay reservoir and each generation's parent checkpoint
+HISTORY_DIR = 'retrain_history'
+LINEAGE_FILE = 'lineage.json'
+REPLAY_FILE = 'replay.npz'
+
+# Rows kept in the replay reservoir, a uniform sample of all data seen
+REPLAY_CAPACITY = 200_000
+
+
+def load_lineage(history_dir=HISTORY_DIR):
+    path = os.path.join(history_dir, LINEAGE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_lineage(lineage, history_dir=HISTORY_DIR):
+    """Write via a temporary file so an interrupted run never leaves half a manifest"""
+    path = os.path.join(history_dir, LINEAGE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(lineage, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def load_replay(history_dir=HISTORY_DIR):
+    """(X, y, rows seen so far) of the replay reservoir, empty if there is none"""
+    path = os.path.join(history_dir, REPLAY_FILE)
+    if not os.path.exists(path):
+        return (np.empty((0, len(FEATURE_NAMES)), dtype=np.float32),
+                np.empty(0, dtype=np.float32), 0)
+    data = np.load(path)
+    return data['X'], data['y'], int(data['seen'])
+
+
+def save_replay(X, y, seen, history_dir=HISTORY_DIR):
+    path = os.path.join(history_dir, REPLAY_FILE)
+    # np.savez adds .npz to names without it, so the temporary name keeps it
+    np.savez(path + '.tmp.npz', X=X, y=y, seen=seen)
+    os.replace(path + '.tmp.npz', path)
+
+
+def update_reservoir(X_res, y_res, seen, X_new, y_new, capacity=REPLAY_CAPACITY, seed=0):
+    """
+    Add new rows to a uniform reservoir sample (Algorithm R)
+
+    Row i of the whole history ends up in the reservoir with probability
+    capacity / seen, whatever order the batches arrived in. Cost is linear
+    in the new rows only.
+
+    Returns:
+        (X, y, seen) of the updated reservoir
+    """
+    rng = np.random.default_rng([seed, seen])
+    X_res, y_res = X_res.copy(), y_res.copy()
+
+    # Fill any free space first
+    free = min(capacity - len(X_res), len(X_new))
+    if free > 0:
+        X_res = np.concatenate([X_res, X_new[:free]])
+        y_res = np.concatenate([y_res, y_new[:free]])
+
+    # Then row seen + i replaces a random slot with probability capacity / (seen + i + 1)
+    positions = seen + np.arange(free, len(X_new))
+    slots = rng.integers(0, positions + 1)
+    keep = slots < capacity
+    # Later rows win duplicate slots, as they would applied one by one
+    X_res[slots[keep]] = X_new[free:][keep]
+    y_res[slots[keep]] = y_new[free:][keep]
+
+    return X_res, y_res, seen + len(X_new)
+
+
+def rescale_first_layer(model, old_scaler, new_scaler):
+    """
+    Adjust the first layer so the model gives the same outputs under new_scaler
+
+    The model was trained on (x - m0) / s0. Fed (x - m1) / s1 instead, the
+    first Linear layer keeps its function if W' = W * s1 / s0 and
+    b' = b + W @ ((m1 - m0) / s0), so updating the scaler does not throw
+    away what the warm-started weights learned.
+    """
+    first = model.network[0]
+    m0 = torch.as_tensor(old_scaler.mean_, dtype=torch.float64)
+    s0 = torch.as_tensor(old_scaler.scale_, dtype=torch.float64)
+    m1 = torch.as_tensor(new_scaler.mean_, dtype=torch.float64)
+    s1 = torch.as_tensor(new_scaler.scale_, dtype=torch.float64)
+
+    with torch.no_grad():
+        weight = first.weight.double()
+        bias = first.bias.double() + weight @ ((m1 - m0) / s0)
+        first.weight.copy_((weight * s1 / s0).float())
+        first.bias.copy_(bias.float())
+
+
+def validation_loss(model, X, y):
+    """Mean BCE of model on already-scaled rows"""
+    model.eval()
+    with torch.inference_mode():
+        outputs = model(torch.from_numpy(X))
+        return float(nn.functional.binary_cross_entropy(outputs, torch.from_numpy(y).unsqueeze(1)))
+
+
+def data_summary(path, X, y):
+    return {
+        'path': path,
+        'sha256': file_hash(path),
+        'rows': int(len(y)),
+        'positives': int(np.sum(y == 1)),
+    }
+
+
+def register_base(data_path, model_path, scaler_path, history_dir=HISTORY_DIR):
+    """
+    Start a lineage from the current model and the data it was trained on
+
+    No training happens; the data seeds the replay reservoir, so later
+    fine-tunes rehearse it.
+    """
+    X, y = load_dataset(data_path)
+    X_res, y_res, seen = update_reservoir(*load_replay(history_dir), np.asarray(X, dtype=np.float32),
+                                          np.asarray(y, dtype=np.float32))
+    save_replay(X_res, y_res, seen, history_dir)
+
+    lineage = {
+        'model': model_path,
+        'scaler': scaler_path,
+        'generations': [{
+            'generation': 0,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'model_sha256': file_hash(model_path),
+            'parent_sha256': None,
+            'data': data_summary(data_path, X, y),
+            'replay_rows': int(len(y_res)),
+            'rows_seen': seen,
+        }],
+    }
+    save_lineage(lineage, history_dir)
+    return lineage
+
+
+def fine_tune(data_path, model_path='lbw_model_best.pth', scaler_path='scaler.pkl',
+              history_dir=HISTORY_DIR, replay_ratio=1.0, epochs=10, lr=3e-4, patience=3,
+              capacity=REPLAY_CAPACITY, seed=0):
+    """
+    Warm-start from model_path and fine-tune on new data plus replayed old rows
+
+    1. partial_fit the scaler on the new rows and rescale the first layer
+       to match (see rescale_first_layer)
+    2. draw replay_ratio * new rows from the replay reservoir
+    3. split both by delivery and run train_model_fast from the current
+       weights, keeping the epoch with the best validation loss
+    4. archive the parent checkpoint, overwrite model_path/scaler_path,
+       add the new rows to the reservoir and append to the lineage
+
+    Work is proportional to the new rows (and the replay sample drawn for
+    them), not to the whole history.
+
+    Returns:
+        The new lineage entry
+    """
+    lineage = load_lineage(history_dir)
+    data_hash = file_hash(data_path)
+    if any(g['data']['sha256'] == data_hash for g in lineage['generations']):
+        return None
+
+    start = time.perf_counter()
+    X_new, y_new = load_dataset(data_path)
+    X_new = np.asarray(X_new, dtype=np.float32)
+    y_new = np.asarray(y_new, dtype=np.float32)
+
+    model, old_scaler = load_model_and_scaler(model_path, scaler_path)
+    parent_hash = file_hash(model_path)
+
+    scaler = copy.deepcopy(old_scaler)
+    scaler.partial_fit(X_new)
+    rescale_first_layer(model, old_scaler, scaler)
+
+    # Replay sample, drawn fresh from the reservoir each generation
+    rng = np.random.default_rng([seed, len(lineage['generations'])])
+    X_res, y_res, seen = load_replay(history_dir)
+    n_replay = min(len(X_res), int(round(replay_ratio * len(X_new))))
+    replay_idx = rng.choice(len(X_res), size=n_replay, replace=False)
+    X_replay, y_replay = X_res[replay_idx], y_res[replay_idx]
+
+    # New rows keep whole deliveries together; reservoir rows are already
+    # scattered frames, so a plain 80/20 split is all they can get
+    train_idx, val_idx = split_by_delivery(assign_delivery_ids(X_new), seed=seed)
+    replay_val = rng.random(n_replay) < 0.2
+
+    def scaled(X):
+        return scaler.transform(X).astype(np.float32)
+
+    X_train = scaled(np.concatenate([X_new[train_idx], X_replay[~replay_val]]))
+    y_train = np.concatenate([y_new[train_idx], y_replay[~replay_val]])
+    X_val_new, y_val_new = scaled(X_new[val_idx]), y_new[val_idx]
+    X_val_old, y_val_old = scaled(X_replay[replay_val]), y_replay[replay_val]
+    X_val = np.concatenate([X_val_new, X_val_old])
+    y_val = np.concatenate([y_val_new, y_val_old])
+
+    before = {'new': validation_loss(model, X_val_new, y_val_new),
+              'replay': validation_loss(model, X_val_old, y_val_old) if len(y_val_old) else None}
+
+    history_checkpoint = os.path.join(history_dir, 'fine_tune_best.pth')
+    _, val_losses, _, _ = train_model_fast(
+        model, (torch.from_numpy(X_train), torch.from_numpy(y_train).unsqueeze(1)),
+        (torch.from_numpy(X_val), torch.from_numpy(y_val).unsqueeze(1)),
+        epochs=epochs, lr=lr, checkpoint_path=history_checkpoint, verbose=False, patience=patience)
+    model.load_state_dict(torch.load(history_checkpoint))
+    os.remove(history_checkpoint)
+
+    after = {'new': validation_loss(model, X_val_new, y_val_new),
+             'replay': validation_loss(model, X_val_old, y_val_old) if len(y_val_old) else None}
+
+    # Keep the parent so a bad generation can be rolled back by hand
+    generation = len(lineage['generations'])
+    parent_copy = os.path.join(history_dir, f'generation_{generation - 1:04d}.pth')
+    shutil.copyfile(model_path, parent_copy)
+    shutil.copyfile(scaler_path, os.path.join(history_dir, f'generation_{generation - 1:04d}_scaler.pkl'))
+
+    torch.save(model.state_dict(), model_path)
+    with open(scaler_path, 'wb') as f:
+        pickle.dump(scaler, f)
+
+    X_res, y_res, seen = update_reservoir(X_res, y_res, seen, X_new, y_new, capacity, seed)
+    save_replay(X_res, y_res, seen, history_dir)
+
+    entry = {
+        'generation': generation,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model_sha256': file_hash(model_path),
+        'parent_sha256': parent_hash,
+        'parent_checkpoint': parent_copy,
+        'data': data_summary(data_path, X_new, y_new),
+        'replay_sample_rows': int(n_replay),
+        'train_rows': int(len(y_train)),
+        'epochs_run': len(val_losses),
+        'lr': lr,
+        'val_loss_before': before,
+        'val_loss_after': after,
+        'scaler_rows_seen': int(np.max(scaler.n_samples_seen_)),
+        'replay_rows': int(len(y_res)),
+        'rows_seen': int(seen),
+        'seconds': time.perf_counter() - start,
+    }
+    lineage['generations'].append(entry)
+    save_lineage(lineage, history_dir)
+    return entry
+
+
+def main():
+    """
+    Usage: python retrain_lbw_model.py [data] [--replay-ratio 1.0] [--epochs 10] [--lr 3e-4]
+
+    The first run registers the current model and data as generation 0.
+    Each later run with new data (e.g. a fresh LBWTrainingData.csv from
+    FastDataCollector) fine-tunes lbw_model_best.pth / scaler.pkl in place.
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    positional = [a for i, a in enumerate(args)
+                  if not a.startswith('--') and (i == 0 or not args[i - 1].startswith('--'))]
+    data_path = positional[0] if positional else '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+    model_path = 'lbw_model_best.pth'
+    scaler_path = 'scaler.pkl'
+
+    for path in (data_path, model_path, scaler_path):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found, run train_lbw_model.py first")
+            return
+
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    if load_lineage() is None:
+        lineage = register_base(data_path, model_path, scaler_path)
+        base = lineage['generations'][0]
+        print(f"Registered {model_path} as generation 0, trained on {data_path} "
+              f"({base['data']['rows']:,} rows)")
+        print("Collect new data and run again to fine-tune on it")
+        return
+
+    print(f"Fine-tuning {model_path} on {data_path}...")
+    entry = fine_tune(data_path, model_path, scaler_path,
+                      replay_ratio=float(option('--replay-ratio', 1.0)),
+                      epochs=int(option('--epochs', 10)),
+                      lr=float(option('--lr', 3e-4)))
+    if entry is None:
+        print(f"{data_path} is already in the lineage, nothing new to train on")
+        return
+
+    before, after = entry['val_loss_before'], entry['val_loss_after']
+    print(f"\nGeneration {entry['generation']}: {entry['data']['rows']:,} new rows "
+          f"+ {entry['replay_sample_rows']:,} replayed, {entry['epochs_run']} epochs "
+          f"in {entry['seconds']:.1f}s")
+    print(f"  Val loss on new data:    {before['new']:.4f} -> {after['new']:.4f}")
+    if before['replay'] is not None:
+        print(f"  Val loss on replay data: {before['replay']:.4f} -> {after['replay']:.4f}")
+        if after['replay'] > before['replay'] * 1.1:
+            print("  WARNING: the model got noticeably worse on old data, "
+                  "consider a higher --replay-ratio")
+    print(f"  Parent saved to {entry['parent_checkpoint']}")
+    print(f"Updated {model_path} and {scaler_path}, lineage in "
+          f"{os.path.join(HISTORY_DIR, LINEAGE_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,491 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from sklearn.preprocessing import StandardScaler
+import pickle
+import copy
+import json
+import math
+import time
+import os
+import sys
+from columnar_dataset import FEATURE_NAMES, assign_delivery_ids, impact_row_indices
+from train_lbw_model import load_dataset, split_by_delivery, EarlyStopping, report_stopping
+from test_lbw_model import load_model_and_scaler, predict_lbw, predict_lbw_batch
+from export_to_onnx import OPSET_VERSION, simplify_onnx
+from export_scalar_to_json import scaler_params
+
+SEQUENCE_MODEL_PATH = 'lbw_sequence_model_best.pth'
+SEQUENCE_SCALER_PATH = 'scaler_sequence.pkl'
+SEQUENCE_ONNX_PATH = 'lbw_sequence_model.onnx'
+SEQUENCE_SCALER_JSON = 'scaler_params_sequence.json'
+BENCHMARK_FILE = 'sequence_benchmark.json'
+
+
+def build_sequences(X, y):
+    """
+    Regroup frame-level rows into one padded sequence per delivery
+
+    Deliveries are rebuilt with assign_delivery_ids, so frames stay in
+    the order FinalizeBall wrote them (every sampleRate seconds until the
+    pad, as recorded).
+
+    Returns:
+        sequences: (deliveries, max frames, features) float32, zero padded
+        mask: (deliveries, max frames) bool, True on real frames
+        labels: (deliveries,) float32 willHitStumps of each delivery
+        delivery_ids: (rows,) delivery of each input row
+        positions: (rows,) frame index of each row within its delivery
+    """
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    delivery_ids = assign_delivery_ids(X)
+
+    starts = np.flatnonzero(np.r_[True, delivery_ids[1:] != delivery_ids[:-1]])
+    lengths = np.diff(np.r_[starts, len(X)])
+    positions = np.arange(len(X)) - starts[delivery_ids]
+
+    sequences = np.zeros((len(starts), lengths.max(), X.shape[1]), dtype=np.float32)
+    mask = np.zeros(sequences.shape[:2], dtype=bool)
+    sequences[delivery_ids, positions] = X
+    mask[delivery_ids, positions] = True
+
+    return sequences, mask, y[starts], delivery_ids, positions
+
+
+class LBWSequencePredictor(nn.Module):
+    """
+    GRU over a delivery's frames with a stump-hit probability per frame
+
+    The prediction at frame t only depends on frames 0..t, so running
+    the cell one frame at a time (see SequenceStep) gives the same
+    outputs as the full forward pass.
+    """
+
+    def __init__(self, input_size=13, hidden_size=32):
+        super(LBWSequencePredictor, self).__init__()
+        self.gru = nn.GRU(input_size, hidden_size, batch_first=True)
+        self.head = nn.Linear(hidden_size, 1)
+
+    def forward(self, x, state=None):
+        """x: (batch, frames, features) scaled -> (batch, frames) probabilities, final state"""
+        outputs, state = self.gru(x, None if state is None else state.unsqueeze(0))
+        return torch.sigmoid(self.head(outputs)).squeeze(2), state.squeeze(0)
+
+
+class SequenceStep(nn.Module):
+    """
+    One GRU cell step on raw features, the incremental inference graph
+
+    The GRU weights are split per gate into plain Linear layers so the
+    graph is only MatMul/Add/Sigmoid/Tanh/Mul (no GRU op, which Barracuda
+    can't run), and the scaler is folded into the input layers like
+    fold_scaler_into_model does for the MLP.
+
+    forward(input, state) -> (probability, next state), both (batch, ...)
+    """
+
+    def __init__(self, model, scaler=None):
+        super(SequenceStep, self).__init__()
+        gru = model.gru
+        hidden = gru.hidden_size
+        weight_ih = gru.weight_ih_l0.detach().double()
+        bias_ih = gru.bias_ih_l0.detach().double()
+
+        if scaler is not None:
+            mean = torch.as_tensor(scaler.mean_, dtype=torch.float64)
+            scale = torch.as_tensor(scaler.scale_, dtype=torch.float64)
+            weight_ih = weight_ih / scale
+            bias_ih = bias_ih - weight_ih @ mean
+
+        def linear(weight, bias):
+            layer = nn.Linear(weight.shape[1], weight.shape[0])
+            with torch.no_grad():
+                layer.weight.copy_(weight.float())
+                layer.bias.copy_(bias.float())
+            return layer
+
+        # PyTorch stacks the gates as reset, update, new
+        gates = [slice(0, hidden), slice(hidden, 2 * hidden), slice(2 * hidden, 3 * hidden)]
+        weight_hh, bias_hh = gru.weight_hh_l0.detach(), gru.bias_hh_l0.detach()
+        self.input_reset, self.input_update, self.input_new = (
+            linear(weight_ih[g], bias_ih[g]) for g in gates)
+        self.state_reset, self.state_update, self.state_new = (
+            linear(weight_hh[g], bias_hh[g]) for g in gates)
+        self.head = copy.deepcopy(model.head)
+
+    def forward(self, x, state):
+        reset = torch.sigmoid(self.input_reset(x) + self.state_reset(state))
+        update = torch.sigmoid(self.input_update(x) + self.state_update(state))
+        new = torch.tanh(self.input_new(x) + reset * self.state_new(state))
+        state = new + update * (state - new)
+        return torch.sigmoid(self.head(state)), state
+
+
+class IncrementalLBWPredictor:
+    """
+    Per-ball hidden state over SequenceStep weights, in plain NumPy
+
+    Call predict_frame(ball, features) for each new frame of a ball, in
+    order, with raw features as LBWPredictor.PredictLBW takes them; every
+    call is one cell step on that ball's state. end_ball forgets a ball
+    once it has been decided or destroyed.
+    """
+
+    def __init__(self, step):
+        def stacked(*layers):
+            weight = torch.cat([layer.weight for layer in layers]).detach().numpy()
+            bias = torch.cat([layer.bias for layer in layers]).detach().numpy()
+            return np.ascontiguousarray(weight.T, dtype=np.float32), bias.astype(np.float32)
+
+        # Reset and update gates share one matmul, the new gate needs its
+        # input and state halves separately
+        self.input_weight, self.input_bias = stacked(step.input_reset, step.input_update,
+                                                     step.input_new)
+        self.state_weight, self.state_bias = stacked(step.state_reset, step.state_update,
+                                                     step.state_new)
+        self.head_weight = step.head.weight.detach().numpy()[0].astype(np.float32)
+        self.head_bias = float(step.head.bias.detach()[0])
+        self.hidden_size = len(self.head_weight)
+        self.states = {}
+
+    def initial_state(self):
+        return np.zeros(self.hidden_size, dtype=np.float32)
+
+    def step(self, features, state):
+        """(probability, next state) for one frame of raw features"""
+        H = self.hidden_size
+        gi = np.asarray(features, dtype=np.float32) @ self.input_weight
+        gi += self.input_bias
+        gh = state @ self.state_weight
+        gh += self.state_bias
+
+        gates = gi[:2 * H] + gh[:2 * H]
+        gates = 1 / (1 + np.exp(-gates))
+        reset, update = gates[:H], gates[H:]
+        new = np.tanh(gi[2 * H:] + reset * gh[2 * H:])
+        state = new + update * (state - new)
+
+        z = float(state @ self.head_weight) + self.head_bias
+        return 1 / (1 + math.exp(-min(max(z, -88.0), 88.0))), state
+
+    def predict_frame(self, ball, features):
+        state = self.states.get(ball)
+        if state is None:
+            state = self.initial_state()
+        probability, self.states[ball] = self.step(features, state)
+        return probability
+
+    def end_ball(self, ball):
+        self.states.pop(ball, None)
+
+
+def scale_sequences(sequences, mask, scaler):
+    scaled = np.zeros_like(sequences)
+    scaled[mask] = scaler.transform(sequences[mask]).astype(np.float32)
+    return scaled
+
+
+def masked_bce(probs, labels, mask):
+    """Summed BCE over real frames, each frame labelled with its delivery's outcome"""
+    targets = labels[:, None].expand_as(probs)
+    losses = nn.functional.binary_cross_entropy(probs, targets, reduction='none')
+    return (losses * mask).sum()
+
+
+def train_sequence_model(model, train_data, val_data, epochs=100, lr=0.003, batch_size=64,
+                         patience=10, checkpoint_path=SEQUENCE_MODEL_PATH, verbose=True):
+    """
+    Train on padded (sequences, mask, labels) tensors, one delivery per sample
+
+    Loss and accuracy are per frame over real frames only. The best
+    weights by validation loss are kept and written to checkpoint_path.
+    """
+    X_train, mask_train, y_train = train_data
+    X_val, mask_val, y_val = val_data
+    frames_train = mask_train.sum().item()
+    frames_val = mask_val.sum().item()
+
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    stopper = EarlyStopping(patience)
+    best_state = None
+    val_losses = []
+
+    # Still defined for report_stopping when epochs is 0
+    epoch = -1
+    for epoch in range(epochs):
+        model.train()
+        train_loss = 0.0
+        permutation = torch.randperm(len(X_train))
+        for start in range(0, len(X_train), batch_size):
+            idx = permutation[start:start + batch_size]
+            optimizer.zero_grad(set_to_none=True)
+            probs, _ = model(X_train[idx])
+            loss = masked_bce(probs, y_train[idx], mask_train[idx])
+            (loss / mask_train[idx].sum()).backward()
+            optimizer.step()
+            train_loss += loss.item()
+
+        model.eval()
+        with torch.inference_mode():
+            probs, _ = model(X_val)
+            val_loss = masked_bce(probs, y_val, mask_val).item() / frames_val
+            correct = (((probs >= 0.5).float() == y_val[:, None]) & mask_val).sum().item()
+
+        val_losses.append(val_loss)
+        if val_loss < stopper.best_loss:
+            best_state = copy.deepcopy(model.state_dict())
+
+        if verbose and (epoch + 1) % 10 == 0:
+            print(f'Epoch [{epoch+1}/{epochs}]')
+            print(f'  Train Loss: {train_loss / frames_train:.4f}')
+            print(f'  Val Loss: {val_loss:.4f}, Val Acc: {100 * correct / frames_val:.2f}%')
+
+        if stopper.step(epoch, val_loss):
+            break
+
+    if verbose:
+        report_stopping(stopper, stopper.best_epoch, epoch, epochs)
+
+    # No best state with epochs=0 or a validation loss that was never finite
+    if best_state is not None:
+        model.load_state_dict(best_state)
+        if checkpoint_path is not None:
+            torch.save(best_state, checkpoint_path)
+    return val_losses
+
+
+def load_sequence_model(model_path=SEQUENCE_MODEL_PATH, scaler_path=SEQUENCE_SCALER_PATH):
+    state_dict = torch.load(model_path)
+    hidden_size, input_size = state_dict['gru.weight_hh_l0'].shape[1], state_dict['gru.weight_ih_l0'].shape[1]
+    model = LBWSequencePredictor(input_size, hidden_size)
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+
+    return model, scaler
+
+
+def predict_sequences(model, scaler, X, y):
+    """Per-row probabilities of the sequence model on frame-level rows, in row order"""
+    sequences, mask, _, delivery_ids, positions = build_sequences(X, y)
+    with torch.inference_mode():
+        probs, _ = model(torch.from_numpy(scale_sequences(sequences, mask, scaler)))
+    return probs.numpy()[delivery_ids, positions]
+
+
+def export_sequence_onnx(model, scaler, onnx_path=SEQUENCE_ONNX_PATH):
+    """
+    Export SequenceStep with explicit state inputs and outputs
+
+    Inputs 'input' (batch, 13) raw features and 'state_in' (batch, hidden);
+    outputs 'output' (batch, 1) probability and 'state_out' (batch, hidden),
+    fed back as state_in for the ball's next frame (zeros on its first).
+    """
+    step = SequenceStep(model, scaler).eval()
+    hidden = model.gru.hidden_size
+
+    torch.onnx.export(
+        step, (torch.zeros(1, model.gru.input_size), torch.zeros(1, hidden)), onnx_path,
+        dynamo=False,
+        opset_version=OPSET_VERSION,
+        do_constant_folding=True,
+        input_names=['input', 'state_in'],
+        output_names=['output', 'state_out'],
+        dynamic_axes={name: {0: 'batch_size'} for name in ('input', 'state_in', 'output', 'state_out')},
+    )
+    return simplify_onnx(onnx_path)
+
+
+def run_onnx_sequences(session, sequences, mask, hidden_size):
+    """Step every delivery through the ONNX graph frame by frame, all deliveries batched"""
+    state = np.zeros((len(sequences), hidden_size), dtype=np.float32)
+    probs = np.zeros(mask.shape, dtype=np.float32)
+    for t in range(sequences.shape[1]):
+        output, state = session.run(None, {'input': sequences[:, t], 'state_in': state})
+        probs[:, t] = output[:, 0]
+    return probs
+
+
+def classification_metrics(probs, y, threshold=0.5):
+    predictions = probs >= threshold
+    tp = int((predictions & (y == 1)).sum())
+    fn = int((~predictions & (y == 1)).sum())
+    return {
+        'accuracy': float(np.mean(predictions == y)),
+        'recall': tp / (tp + fn) if tp + fn > 0 else 0.0,
+    }
+
+
+def time_per_frame(fn, mask, deliveries=200, repeats=3):
+    """
+    Median seconds per frame of fn(delivery, t) over whole deliveries
+
+    Frames are fed in order, so stateful callers see the same pattern as
+    a ball tracked through the scene.
+    """
+    lengths = mask.sum(axis=1)
+    deliveries = min(deliveries, len(mask))
+    frames = int(lengths[:deliveries].sum())
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for d in range(deliveries):
+            for t in range(lengths[d]):
+                fn(d, t)
+        timings.append((time.perf_counter() - start) / frames)
+    return float(np.median(timings))
+
+
+def benchmark(model, scaler, mlp, mlp_scaler, X_test, y_test, onnx_path=SEQUENCE_ONNX_PATH):
+    """Accuracy on every frame and on decision frames, and per-frame latency of each runtime"""
+    from lbw_inference import NumpyLBWPredictor
+    from test_onnx import create_session
+
+    X_test = np.asarray(X_test, dtype=np.float32)
+    y_test = np.asarray(y_test)
+    decision_rows = impact_row_indices(X_test)
+
+    results = {'accuracy': {}, 'latency_us': {}}
+    mlp_probs = predict_lbw_batch(mlp, mlp_scaler, X_test)
+    seq_probs = predict_sequences(model, scaler, X_test, y_test)
+    for name, probs in (('mlp', mlp_probs), ('sequence', seq_probs)):
+        results['accuracy'][name] = {
+            'all_frames': classification_metrics(probs, y_test),
+            'decision_frames': classification_metrics(probs[decision_rows], y_test[decision_rows]),
+        }
+
+    # ONNX step graph, stepped over the test deliveries
+    sequences, mask, _, delivery_ids, positions = build_sequences(X_test, y_test)
+    session = create_session(onnx_path)
+    onnx_probs = run_onnx_sequences(session, sequences, mask, model.gru.hidden_size)
+    results['onnx_max_abs_diff'] = float(np.abs(onnx_probs[delivery_ids, positions] - seq_probs).max())
+
+    # Per-frame cost, each frame of each ball in turn
+    weights = [mlp_state.numpy() for key, mlp_state in mlp.state_dict().items() if key.endswith('.weight')]
+    biases = [mlp_state.numpy() for key, mlp_state in mlp.state_dict().items() if key.endswith('.bias')]
+    numpy_mlp = NumpyLBWPredictor(weights, biases, mlp_scaler.mean_, mlp_scaler.scale_)
+    incremental = IncrementalLBWPredictor(SequenceStep(model, scaler))
+    step = SequenceStep(model, scaler).eval()
+    hidden = model.gru.hidden_size
+    torch_state = {}
+    onnx_state = {}
+
+    def torch_step(d, t):
+        with torch.inference_mode():
+            state = torch_state.get(d, torch.zeros(1, hidden))
+            _, torch_state[d] = step(torch.from_numpy(sequences[d, t:t + 1]), state)
+
+    def onnx_step(d, t):
+        state = onnx_state.get(d, np.zeros((1, hidden), dtype=np.float32))
+        _, onnx_state[d] = session.run(None, {'input': sequences[d, t:t + 1], 'state_in': state})
+
+    scaled = scale_sequences(sequences, mask, scaler)
+
+    def rerun_prefix(d, t):
+        # What the sequence model costs without carried state: the whole
+        # history again on every frame
+        with torch.inference_mode():
+            model(torch.from_numpy(scaled[d:d + 1, :t + 1]))
+
+    runs = {
+        'mlp_torch': lambda d, t: predict_lbw(mlp, mlp_scaler, sequences[d, t]),
+        'mlp_numpy': lambda d, t: numpy_mlp.predict(sequences[d, t]),
+        'sequence_torch_step': torch_step,
+        'sequence_onnx_step': onnx_step,
+        'sequence_numpy_step': lambda d, t: incremental.predict_frame(d, sequences[d, t]),
+        'sequence_torch_rerun_prefix': rerun_prefix,
+    }
+    for name, fn in runs.items():
+        torch_state.clear()
+        onnx_state.clear()
+        incremental.states.clear()
+        results['latency_us'][name] = time_per_frame(fn, mask) * 1e6
+
+    return results
+
+
+def print_benchmark(results):
+    print("\n" + "="*60)
+    print("SEQUENCE MODEL VS FRAME-INDEPENDENT MLP")
+    print("="*60)
+    print(f"{'model':<12}{'frame acc':>11}{'frame recall':>14}{'decision acc':>14}{'decision recall':>17}")
+    for name, accuracy in results['accuracy'].items():
+        frames, decisions = accuracy['all_frames'], accuracy['decision_frames']
+        print(f"{name:<12}{frames['accuracy']:>11.2%}{frames['recall']:>14.2%}"
+              f"{decisions['accuracy']:>14.2%}{decisions['recall']:>17.2%}")
+
+    print(f"\n{'per-frame latency':<32}{'us':>8}")
+    for name, us in results['latency_us'].items():
+        print(f"{name:<32}{us:>8.1f}")
+    print(f"\nONNX step graph vs PyTorch: max |diff| = {results['onnx_max_abs_diff']:.2e}")
+
+
+def main():
+    """
+    Usage: python sequence_lbw_model.py [--hidden 32] [--epochs 100] [--lr 0.003]
+
+    Trains the GRU on LBWTrainingData.csv deliveries, exports the step
+    graph to ONNX and benchmarks it against lbw_model_best.pth.
+    """
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    train_csv = '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+    mlp_path = 'lbw_model_best.pth'
+    mlp_scaler_path = 'scaler.pkl'
+
+    for path in (train_csv, test_csv, mlp_path, mlp_scaler_path):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found")
+            return
+
+    X, y = load_dataset(train_csv)
+    sequences, mask, labels, delivery_ids, _ = build_sequences(X, y)
+    print(f"Loaded {len(labels):,} deliveries ({mask.sum():,} frames, "
+          f"up to {mask.shape[1]} per delivery) from {train_csv}")
+
+    scaler = StandardScaler().fit(sequences[mask])
+    scaled = scale_sequences(sequences, mask, scaler)
+    train_idx, val_idx = split_by_delivery(np.arange(len(labels)))
+
+    def tensors(idx):
+        return (torch.from_numpy(scaled[idx]), torch.from_numpy(mask[idx]),
+                torch.from_numpy(labels[idx]))
+
+    torch.manual_seed(0)
+    model = LBWSequencePredictor(input_size=len(FEATURE_NAMES), hidden_size=int(option('--hidden', 32)))
+    print(f"\nTraining GRU ({sum(p.numel() for p in model.parameters()):,} parameters)...")
+    start = time.perf_counter()
+    train_sequence_model(model, tensors(train_idx), tensors(val_idx),
+                         epochs=int(option('--epochs', 100)), lr=float(option('--lr', 0.003)))
+    print(f"Trained in {time.perf_counter() - start:.1f}s, saved {SEQUENCE_MODEL_PATH}")
+    model.eval()
+
+    with open(SEQUENCE_SCALER_PATH, 'wb') as f:
+        pickle.dump(scaler, f)
+
+    export_sequence_onnx(model, scaler, SEQUENCE_ONNX_PATH)
+    with open(SEQUENCE_SCALER_JSON, 'w') as f:
+        json.dump(scaler_params(scaler, folded=True), f, indent=2)
+    print(f"Saved {SEQUENCE_ONNX_PATH} ({os.path.getsize(SEQUENCE_ONNX_PATH):,} bytes) "
+          f"and {SEQUENCE_SCALER_JSON}")
+
+    mlp, mlp_scaler = load_model_and_scaler(mlp_path, mlp_scaler_path)
+    X_test, y_test = load_dataset(test_csv)
+    results = benchmark(model, scaler, mlp, mlp_scaler, X_test, y_test)
+    print_benchmark(results)
+
+    with open(BENCHMARK_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {BENCHMARK_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import numpy as np
+import torch
+import itertools
+import json
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
+from sklearn.preprocessing import StandardScaler
+from train_lbw_model import (LBWPredictor, FEATURE_NAMES, load_dataset,
+                             assign_delivery_ids, split_by_delivery, train_model_fast)
+
+# Default search space, every combination is trained
+SEARCH_SPACE = {
+    'hidden_sizes': [(128, 64, 32, 16), (64, 32, 16), (32, 16), (256, 128, 64)],
+    'dropout': [0.0, 0.2],
+    'lr': [0.001, 0.003],
+    'batch_size': [256, 1024],
+    'drop_features': [(), ('timeSinceRelease',)],
+}
+
+
+def expand_search_space(search_space, max_configs=None, seed=0):
+    """Every combination of the search space, optionally a random subset"""
+    keys = list(search_space)
+    configs = [dict(zip(keys, values))
+               for values in itertools.product(*(search_space[k] for k in keys))]
+
+    if max_configs is not None and max_configs < len(configs):
+        rng = np.random.default_rng(seed)
+        chosen = rng.choice(len(configs), size=max_configs, replace=False)
+        configs = [configs[i] for i in sorted(chosen)]
+
+    return configs
+
+
+# Shared dataset, attached once per worker process
+class SharedArrays:
+    """
+    Numpy arrays placed in shared memory so workers map them without copying
+
+    The parent creates the blocks; workers attach with describe() output.
+    """
+
+    def __init__(self, arrays):
+        self.blocks = {}
+        self.arrays = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[:] = array
+            self.blocks[name] = block
+            self.arrays[name] = view
+
+    def describe(self):
+        return {name: (self.blocks[name].name, array.shape, array.dtype.str)
+                for name, array in self.arrays.items()}
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+
+_worker_arrays = {}
+_worker_blocks = []
+
+
+def init_worker(description, threads_per_worker):
+    """Attach the shared dataset and cap torch threads for this worker"""
+    torch.set_num_threads(threads_per_worker)
+
+    for name, (block_name, shape, dtype) in description.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        _worker_arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def run_config(config, epochs, seed):
+    """Train one configuration on the shared dataset and summarise it"""
+    torch.manual_seed(seed)
+
+    X = torch.from_numpy(_worker_arrays['X'])
+    y = torch.from_numpy(_worker_arrays['y']).unsqueeze(1)
+    train_idx = torch.from_numpy(_worker_arrays['train_idx'])
+    val_idx = torch.from_numpy(_worker_arrays['val_idx'])
+
+    features = [i for i, name in enumerate(FEATURE_NAMES)
+                if name not in config['drop_features']]
+    X = X[:, features]
+
+    model = LBWPredictor(input_size=len(features),
+                         hidden_sizes=config['hidden_sizes'],
+                         dropout=config['dropout'])
+
+    start = time.perf_counter()
+    _, val_losses, _, val_accs = train_model_fast(
+        model, (X[train_idx], y[train_idx]), (X[val_idx], y[val_idx]),
+        epochs=epochs, lr=config['lr'], batch_size=config['batch_size'],
+        checkpoint_path=None, verbose=False)
+    train_time = time.perf_counter() - start
+
+    best_epoch = int(np.argmin(val_losses))
+    return {
+        **config,
+        'best_val_loss': val_losses[best_epoch],
+        'best_val_acc': val_accs[best_epoch],
+        'best_epoch': best_epoch + 1,
+        'parameters': sum(p.numel() for p in model.parameters()),
+        'train_seconds': train_time,
+    }
+
+
+def run_sweep(data_path, search_space=SEARCH_SPACE, epochs=100, workers=None,
+              threads_per_worker=1, max_configs=None, seed=0):
+    """
+    Train every configuration in a process pool and rank them
+
+    The dataset is loaded, scaled and split by delivery once in this
+    process, then shared with the workers through shared memory.
+    """
+    configs = expand_search_space(search_space, max_configs, seed)
+    workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    X, y = load_dataset(data_path)
+    train_idx, val_idx = split_by_delivery(assign_delivery_ids(X), seed=seed)
+
+    # Columns scale independently, so dropping a feature later is the same
+    # as fitting the scaler without it
+    X = StandardScaler().fit_transform(X).astype(np.float32)
+
+    shared = SharedArrays({'X': X, 'y': np.asarray(y, dtype=np.float32),
+                           'train_idx': train_idx, 'val_idx': val_idx})
+    print(f"Sweeping {len(configs)} configurations on {workers} workers "
+          f"({threads_per_worker} torch thread(s) each)")
+
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                 initializer=init_worker,
+                                 initargs=(shared.describe(), threads_per_worker)) as pool:
+            futures = [pool.submit(run_config, config, epochs, seed) for config in configs]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                print(f"[{done}/{len(configs)}] val loss {result['best_val_loss']:.4f}, "
+                      f"val acc {result['best_val_acc']:.2f}% - {format_config(result)}")
+    finally:
+        shared.close()
+
+    return sorted(results, key=lambda r: r['best_val_loss'])
+
+
+def format_config(config):
+    dropped = ','.join(config['drop_features']) or 'none'
+    return (f"layers={'-'.join(map(str, config['hidden_sizes']))} "
+            f"dropout={config['dropout']} lr={config['lr']} "
+            f"batch={config['batch_size']} drop={dropped}")
+
+
+def write_leaderboard(results, path='sweep_leaderboard'):
+    """Write the ranked results to <path>.json and <path>.csv"""
+    with open(f'{path}.json', 'w') as f:
+        json.dump(results, f, indent=2)
+
+    fields = list(results[0])
+    with open(f'{path}.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['rank'] + fields)
+        writer.writeheader()
+        for rank, result in enumerate(results, 1):
+            row = {**result,
+                   'hidden_sizes': '-'.join(map(str, result['hidden_sizes'])),
+                   'drop_features': ' '.join(result['drop_features'])}
+            writer.writerow({'rank': rank, **row})
+
+
+def main():
+    data_path = sys.argv[1] if len(sys.argv) > 1 else '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+
+    if not os.path.exists(data_path):
+        print(f"ERROR: Could not find training data at {data_path}")
+        return
+
+    results = run_sweep(data_path)
+    write_leaderboard(results)
+
+    print("\n" + "="*60)
+    print("LEADERBOARD (by best validation loss)")
+    print("="*60)
+    for rank, result in enumerate(results[:10], 1):
+        print(f"{rank:2d}. loss {result['best_val_loss']:.4f}  acc {result['best_val_acc']:.2f}%  "
+              f"epoch {result['best_epoch']:3d}  {format_config(result)}")
+    print("\nSaved sweep_leaderboard.json and sweep_leaderboard.csv")
+
+
+if __name__ == '__main__':
+    main()
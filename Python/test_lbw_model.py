@@ -2,18 +2,34 @@ import pandas as pd
 import numpy as np
 import torch
 import pickle
-from train_lbw_model import LBWPredictor
-from sklearn.metrics import confusion_matrix, classification_report
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-def load_model_and_scaler():
+import hashlib
+import os
+import sys
+from train_lbw_model import LBWPredictor, load_dataset, resolve_shards
+from columnar_dataset import (FEATURE_NAMES, IMPACT_FEATURE_NAMES, MANIFEST_NAME,
+                              SHARD_MANIFEST, load_columnar, is_columnar_dataset,
+                              reduce_to_impacts, select_features)
+from sklearn.metrics import classification_report
+from lbw_profiling import profiler, enable_from_flags
+from lbw_report import (reporter, configure_from_flags, draw_test_results,
+                        draw_threshold_analysis)
+
+def load_model_and_scaler(model_path='lbw_model_best.pth', scaler_path='scaler.pkl'):
     """Load the trained model and scaler"""
-    model = LBWPredictor(input_size=13)
-    model.load_state_dict(torch.load('lbw_model_best.pth'))
+    state_dict = torch.load(model_path)
+    # Architecture from the checkpoint: 13 inputs for the frame-level
+    # model (fewer for the impact-only one), and any hidden widths, e.g.
+    # distilled students or sweep configs
+    indices = sorted(int(key.split('.')[1]) for key in state_dict if key.endswith('.weight'))
+    hidden_sizes = tuple(state_dict[f'network.{i}.weight'].shape[0] for i in indices[:-1])
+    # Linear, ReLU and a Dropout put 3 modules between Linears, 2 without
+    dropout_layers = sum(1 for a, b in zip(indices, indices[1:]) if b - a == 3)
+    model = LBWPredictor(input_size=state_dict['network.0.weight'].shape[1],
+                         hidden_sizes=hidden_sizes, dropout_layers=dropout_layers)
+    model.load_state_dict(state_dict)
     model.eval()
 
-    with open('scaler.pkl', 'rb') as f:
+    with open(scaler_path, 'rb') as f:
         scaler = pickle.load(f)
 
     return model, scaler
@@ -41,50 +57,235 @@ def predict_lbw(model, scaler, features):
 
     return probability
 
-def test_from_csv(test_csv_path, threshold=0.5):
+def predict_lbw_batch(model, scaler, X, batch_size=65536):
+    """
+    Predict stump-hit probabilities for a whole feature matrix
+
+    Scales every row in one scaler.transform call, then runs the model
+    over the scaled matrix in chunks of batch_size rows. Features are in
+    the same order as predict_lbw.
+
+    Returns:
+        1D float32 array of probabilities, one per row of X
+    """
+    # Normalize features
+    features_scaled = scaler.transform(np.asarray(X)).astype(np.float32)
+
+    probabilities = np.empty(len(features_scaled), dtype=np.float32)
+
+    # Predict chunk by chunk
+    with torch.inference_mode():
+        for start in range(0, len(features_scaled), batch_size):
+            batch = torch.from_numpy(features_scaled[start:start + batch_size])
+            output = model(batch)
+            probabilities[start:start + batch_size] = output.squeeze(1).numpy()
+
+    return probabilities
+
+def load_test_data(test_csv_path, impact=False):
+    """
+    Load features and labels from a Unity test CSV, columnar dataset or shard directory
+
+    With impact=True, returns one impact row per delivery with IMPACT_FEATURE_NAMES.
+    """
+    if impact:
+        X_test, y_true = reduce_to_impacts(*load_test_data(test_csv_path))
+        return select_features(X_test, IMPACT_FEATURE_NAMES), y_true
+
+    if is_columnar_dataset(test_csv_path):
+        return load_columnar(test_csv_path)
+    if os.path.isdir(test_csv_path):
+        return load_dataset(test_csv_path)
+
+    df = pd.read_csv(test_csv_path)
+    df.columns = df.columns.str.strip()
+
+    X_test = df[FEATURE_NAMES].values
+    y_true = df['willHitStumps'].values
+
+    return X_test, y_true
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks"""
+    # A columnar dataset or shard directory is identified by its manifest
+    if is_columnar_dataset(path):
+        path = os.path.join(path, MANIFEST_NAME)
+    elif os.path.isdir(path):
+        if not os.path.exists(os.path.join(path, SHARD_MANIFEST)):
+            # A plain directory of shards, hash each one in resolve_shards order
+            digest = hashlib.sha256()
+            for shard in resolve_shards(path):
+                digest.update(os.path.basename(shard).encode())
+                digest.update(file_hash(shard, chunk_size).encode())
+            return digest.hexdigest()
+        path = os.path.join(path, SHARD_MANIFEST)
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class EvaluationSession:
+    """
+    Predict a test CSV once and reuse the probabilities for every metric
+
+    Probabilities are cached in cache_dir under a key built from the
+    content hashes of the model checkpoint, scaler and test CSV, so a
+    re-run with unchanged files skips both the CSV parse and the model.
+    Thresholds, confusion matrices and plots are all computed from the
+    cached arrays.
+    """
+
+    def __init__(self, test_csv_path, model_path='lbw_model_best.pth',
+                 scaler_path='scaler.pkl', cache_dir='eval_cache',
+                 batch_size=65536, impact=False, ensemble=False):
+        self.test_csv_path = test_csv_path
+        self.impact = impact
+        # model_path is an ensemble_lbw_model.py checkpoint, probabilities
+        # are its calibrated mean
+        self.ensemble = ensemble
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+
+        self.y_true = None
+        self.probabilities = None
+
+    def cache_path(self):
+        key = hashlib.sha256()
+        for path in (self.model_path, self.scaler_path, self.test_csv_path):
+            key.update(file_hash(path).encode())
+        if self.impact:
+            key.update(b'impact')
+        if self.ensemble:
+            key.update(b'ensemble')
+        return os.path.join(self.cache_dir, f'{key.hexdigest()[:16]}.npz')
+
+    def load(self):
+        """Load cached probabilities, or predict and cache them"""
+        if self.probabilities is not None:
+            return self
+
+        cache_path = self.cache_path()
+        if os.path.exists(cache_path):
+            cached = np.load(cache_path)
+            self.y_true = cached['y_true']
+            self.probabilities = cached['probabilities']
+            print(f"Loaded cached predictions from {cache_path}")
+            return self
+
+        with profiler.span('load_model'):
+            if self.ensemble:
+                # Imported here, ensemble_lbw_model imports this module
+                from ensemble_lbw_model import load_ensemble, predict_ensemble
+                model, scaler = load_ensemble(self.model_path, self.scaler_path)
+            else:
+                model, scaler = load_model_and_scaler(self.model_path, self.scaler_path)
+        with profiler.span('load_test_data'):
+            X_test, self.y_true = load_test_data(self.test_csv_path, self.impact)
+
+        print("\nMaking predictions...")
+        with profiler.span('predict'):
+            if self.ensemble:
+                self.probabilities, _ = predict_ensemble(model, scaler, X_test,
+                                                         self.batch_size)
+            else:
+                self.probabilities = predict_lbw_batch(model, scaler, X_test,
+                                                       self.batch_size)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        np.savez(cache_path, y_true=self.y_true,
+                 probabilities=self.probabilities)
+        print(f"Cached predictions to {cache_path}")
+
+        return self
+
+    def example_features(self, n=10):
+        """First n raw feature rows, without parsing the whole CSV"""
+        # Impact rows are found by scanning whole deliveries
+        if self.impact:
+            X_test, y_true = reduce_to_impacts(*load_test_data(self.test_csv_path))
+            return X_test[:n]
+
+        path = self.test_csv_path
+        # A shard directory's first rows are in its first shard
+        if os.path.isdir(path) and not is_columnar_dataset(path):
+            path = resolve_shards(path)[0]
+
+        if is_columnar_dataset(path):
+            X_test, _ = load_columnar(path)
+            return np.asarray(X_test[:n])
+
+        df = pd.read_csv(path, nrows=n)
+        df.columns = df.columns.str.strip()
+        return df[FEATURE_NAMES].values
+
+    def predict(self, threshold):
+        return (self.probabilities >= threshold).astype(int)
+
+    def confusion_matrix(self, threshold):
+        """[[tn, fp], [fn, tp]] at the given threshold"""
+        return binary_confusion_matrix(self.y_true, self.predict(threshold))
+
+    def sweep_thresholds(self, thresholds):
+        """
+        Accuracy, recall and precision at every threshold in one pass
+
+        Sorts the probabilities of each class once, then counts the
+        predicted hits per threshold with searchsorted instead of
+        re-thresholding the whole array for every value.
+        """
+        thresholds = np.asarray(thresholds)
+        hits = np.sort(self.probabilities[self.y_true == 1])
+        misses = np.sort(self.probabilities[self.y_true == 0])
+
+        tp = len(hits) - np.searchsorted(hits, thresholds, side='left')
+        fp = len(misses) - np.searchsorted(misses, thresholds, side='left')
+        fn = len(hits) - tp
+        tn = len(misses) - fp
+
+        accuracies = (tp + tn) / len(self.probabilities)
+        recalls = np.divide(tp, tp + fn, out=np.zeros(len(thresholds)),
+                            where=(tp + fn) > 0)
+        precisions = np.divide(tp, tp + fp, out=np.zeros(len(thresholds)),
+                               where=(tp + fp) > 0)
+
+        return accuracies, recalls, precisions
+
+def binary_confusion_matrix(y_true, predictions_binary):
+    """2x2 confusion matrix [[tn, fp], [fn, tp]] from a single bincount"""
+    codes = 2 * np.asarray(y_true, dtype=int) + np.asarray(predictions_binary, dtype=int)
+    return np.bincount(codes, minlength=4).reshape(2, 2)
+
+def test_from_csv(test_csv_path, threshold=0.5, batch_size=65536, session=None):
     """
     Test model using CSV data from Unity
 
     Args:
         test_csv_path: Path to test CSV file
         threshold: Decision threshold (default 0.5)
+        batch_size: Rows per forward pass in predict_lbw_batch
+        session: Optional EvaluationSession to reuse cached predictions
     """
     print("="*60)
     print("TESTING LBW MODEL WITH UNITY DATA")
     print("="*60)
 
-    # Load model and scaler
-    model, scaler = load_model_and_scaler()
+    # Load (or reuse) predictions for this model, scaler and CSV
+    if session is None:
+        session = EvaluationSession(test_csv_path, batch_size=batch_size)
+    session.load()
 
-    # Load test data
-    df = pd.read_csv(test_csv_path)
-    df.columns = df.columns.str.strip()
+    y_true = session.y_true
+    predictions_proba = session.probabilities
+    predictions_binary = session.predict(threshold)
 
-    print(f"\nLoaded {len(df)} test samples from {test_csv_path}")
+    print(f"\nLoaded {len(y_true)} test samples from {test_csv_path}")
     print(f"Test set distribution:")
-    print(f"  Hit stumps: {df['willHitStumps'].sum()} ({100*df['willHitStumps'].mean():.1f}%)")
-    print(f"  Missed stumps: {len(df) - df['willHitStumps'].sum()} ({100*(1-df['willHitStumps'].mean()):.1f}%)")
-
-    # Extract features
-    X_test = df[['spinType', 'speed', 'spinAmount', 'timeSinceRelease',
-                 'ballPosX', 'ballPosY', 'ballVelX', 'ballVelY',
-                 'ballAngularVel', 'distanceToStumps', 'distanceToPad',
-                 'hitPad', 'reachedPad']].values
-
-    y_true = df['willHitStumps'].values
-
-    # Make predictions
-    print("\nMaking predictions...")
-    predictions_proba = []
-    predictions_binary = []
-
-    for features in X_test:
-        prob = predict_lbw(model, scaler, features)
-        predictions_proba.append(prob)
-        predictions_binary.append(1 if prob >= threshold else 0)
-
-    predictions_proba = np.array(predictions_proba)
-    predictions_binary = np.array(predictions_binary)
+    print(f"  Hit stumps: {y_true.sum()} ({100*y_true.mean():.1f}%)")
+    print(f"  Missed stumps: {len(y_true) - y_true.sum()} ({100*(1-y_true.mean()):.1f}%)")
 
     # Calculate metrics
     accuracy = np.mean(predictions_binary == y_true)
@@ -96,7 +297,7 @@ def test_from_csv(test_csv_path, threshold=0.5):
     print(f"Threshold: {threshold}")
 
     # Confusion Matrix
-    cm = confusion_matrix(y_true, predictions_binary)
+    cm = session.confusion_matrix(threshold)
     tn, fp, fn, tp = cm.ravel()
 
     print("\nConfusion Matrix:")
@@ -114,10 +315,23 @@ def test_from_csv(test_csv_path, threshold=0.5):
         precision = tp / (tp + fp)
         print(f"Precision (correct when predicting hit): {precision:.2%}")
 
+    reporter.add_metrics(f'Test results (threshold {threshold:.3f})', {
+        'test data': test_csv_path,
+        'samples': len(y_true),
+        'accuracy': float(accuracy),
+        'true negatives': int(tn),
+        'false positives': int(fp),
+        'false negatives': int(fn),
+        'true positives': int(tp),
+        'recall': tp / (tp + fn) if tp + fn > 0 else 0.0,
+        'precision': tp / (tp + fp) if tp + fp > 0 else 0.0,
+    })
+
     # Classification report
     print("\nDetailed Classification Report:")
-    print(classification_report(y_true, predictions_binary,
-                                target_names=['Miss Stumps', 'Hit Stumps']))
+    with profiler.span('classification_report'):
+        print(classification_report(y_true, predictions_binary,
+                                    target_names=['Miss Stumps', 'Hit Stumps']))
 
     # Show some example predictions
     print("\n" + "="*60)
@@ -125,7 +339,8 @@ def test_from_csv(test_csv_path, threshold=0.5):
     print("="*60)
 
     # Show first 10 predictions
-    for i in range(min(10, len(df))):
+    X_test = session.example_features(10)
+    for i in range(len(X_test)):
         print(f"\nSample {i+1}:")
         print(f"  Spin: {'TopSpin' if X_test[i][0] == 1 else 'BackSpin'}")
         print(f"  Speed: {X_test[i][1]:.2f}x")
@@ -138,161 +353,121 @@ def test_from_csv(test_csv_path, threshold=0.5):
         print(f"  {'✓ CORRECT' if predictions_binary[i] == y_true[i] else '✗ WRONG'}")
 
     # Visualizations
-    plot_test_results(y_true, predictions_proba, predictions_binary, threshold)
+    with profiler.span('plot_test_results'):
+        plot_test_results(y_true, predictions_proba, predictions_binary, threshold)
 
     return accuracy, predictions_proba, predictions_binary
 
 def plot_test_results(y_true, predictions_proba, predictions_binary, threshold):
     """Create visualizations of test results"""
-
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-
-    # 1. Confusion Matrix
-    cm = confusion_matrix(y_true, predictions_binary)
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=axes[0, 0],
-                xticklabels=['Miss', 'Hit'], yticklabels=['Miss', 'Hit'])
-    axes[0, 0].set_title('Confusion Matrix')
-    axes[0, 0].set_ylabel('Actual')
-    axes[0, 0].set_xlabel('Predicted')
-
-    # 2. Probability Distribution
-    axes[0, 1].hist(predictions_proba[y_true == 0], bins=20, alpha=0.6,
-                    label='Actually Missed', color='green')
-    axes[0, 1].hist(predictions_proba[y_true == 1], bins=20, alpha=0.6,
-                    label='Actually Hit', color='red')
-    axes[0, 1].axvline(threshold, color='black', linestyle='--',
-                       label=f'Threshold ({threshold})')
-    axes[0, 1].set_xlabel('Predicted Probability')
-    axes[0, 1].set_ylabel('Count')
-    axes[0, 1].set_title('Prediction Probability Distribution')
-    axes[0, 1].legend()
-    axes[0, 1].grid(True, alpha=0.3)
-
-    # 3. Prediction Confidence
+    # Everything the figure needs is reduced with NumPy here; only the
+    # counts (and the scatter's points) go to the renderer
+    cm = binary_confusion_matrix(y_true, predictions_binary)
     correct = predictions_binary == y_true
-    axes[1, 0].scatter(range(len(predictions_proba)), predictions_proba,
-                       c=correct, cmap='RdYlGn', alpha=0.6)
-    axes[1, 0].axhline(threshold, color='black', linestyle='--',
-                       label=f'Threshold')
-    axes[1, 0].set_xlabel('Sample Index')
-    axes[1, 0].set_ylabel('Predicted Probability')
-    axes[1, 0].set_title('Prediction Confidence (Green=Correct, Red=Wrong)')
-    axes[1, 0].legend()
-    axes[1, 0].grid(True, alpha=0.3)
-
-    # 4. Accuracy by Confidence Level
+
+    # Probability distribution, both classes on shared bins
+    hist_edges = np.linspace(0, 1, 21)
+    miss_counts, _ = np.histogram(predictions_proba[y_true == 0], bins=hist_edges)
+    hit_counts, _ = np.histogram(predictions_proba[y_true == 1], bins=hist_edges)
+
+    # Accuracy by Confidence Level
     confidence_bins = np.linspace(0, 1, 11)
-    accuracy_by_confidence = []
-    counts_by_confidence = []
-
-    for i in range(len(confidence_bins) - 1):
-        low, high = confidence_bins[i], confidence_bins[i+1]
-        mask = (predictions_proba >= low) & (predictions_proba < high)
-        if mask.sum() > 0:
-            acc = (predictions_binary[mask] == y_true[mask]).mean()
-            accuracy_by_confidence.append(acc)
-            counts_by_confidence.append(mask.sum())
-        else:
-            accuracy_by_confidence.append(0)
-            counts_by_confidence.append(0)
+    n_bins = len(confidence_bins) - 1
+
+    # Bin every prediction at once; probabilities of exactly 1.0 fall outside
+    bin_index = np.digitize(predictions_proba, confidence_bins) - 1
+    in_range = (bin_index >= 0) & (bin_index < n_bins)
+    counts_by_confidence = np.bincount(bin_index[in_range], minlength=n_bins)
+    correct_by_confidence = np.bincount(bin_index[in_range],
+                                        weights=correct[in_range],
+                                        minlength=n_bins)
+    accuracy_by_confidence = np.divide(correct_by_confidence, counts_by_confidence,
+                                       out=np.zeros(n_bins),
+                                       where=counts_by_confidence > 0)
+
+    # Reliability: how often balls in each bin actually hit, against the
+    # probability given (on the diagonal when calibrated)
+    hits_by_confidence = np.bincount(bin_index[in_range],
+                                     weights=np.asarray(y_true)[in_range],
+                                     minlength=n_bins)
+    hit_rate_by_confidence = np.divide(hits_by_confidence, counts_by_confidence,
+                                       out=np.full(n_bins, np.nan),
+                                       where=counts_by_confidence > 0)
+    mean_proba_by_confidence = np.bincount(bin_index[in_range],
+                                           weights=np.asarray(predictions_proba)[in_range],
+                                           minlength=n_bins)
+    calibration_error = np.abs(hits_by_confidence - mean_proba_by_confidence).sum() / len(y_true)
+    mean_proba_by_confidence = np.divide(mean_proba_by_confidence, counts_by_confidence,
+                                         out=np.full(n_bins, np.nan),
+                                         where=counts_by_confidence > 0)
 
     bin_centers = (confidence_bins[:-1] + confidence_bins[1:]) / 2
-    axes[1, 1].bar(bin_centers, accuracy_by_confidence, width=0.08,
-                   alpha=0.7, label='Accuracy')
-    axes[1, 1].set_xlabel('Prediction Probability Range')
-    axes[1, 1].set_ylabel('Accuracy')
-    axes[1, 1].set_title('Accuracy by Confidence Level')
-    axes[1, 1].set_ylim(0, 1.1)
-    axes[1, 1].grid(True, alpha=0.3)
-
-    # Add sample counts as text
-    for i, (x, y, count) in enumerate(zip(bin_centers, accuracy_by_confidence,
-                                          counts_by_confidence)):
-        if count > 0:
-            axes[1, 1].text(x, y + 0.05, f'n={count}',
-                            ha='center', fontsize=8)
-
-    plt.tight_layout()
-    plt.savefig('test_results.png', dpi=150)
-    print("\nSaved visualization to test_results.png")
-    plt.show()
-
-def test_threshold_sensitivity(test_csv_path):
-    """Test how different thresholds affect accuracy"""
+
+    reporter.plot(draw_test_results, 'test_results.png',
+                  (cm, hist_edges, miss_counts, hit_counts, threshold,
+                   np.asarray(predictions_proba), correct, bin_centers,
+                   accuracy_by_confidence, counts_by_confidence,
+                   mean_proba_by_confidence, hit_rate_by_confidence, calibration_error),
+                  figsize=(14, 10), dpi=150, title=f'Test results (threshold {threshold:.3f})')
+    if reporter.enabled:
+        print("\nSaved visualization to test_results.png")
+
+def test_threshold_sensitivity(test_csv_path, batch_size=65536, session=None,
+                               thresholds=None):
+    """
+    Test how different thresholds affect accuracy
+
+    Args:
+        test_csv_path: Path to test CSV file
+        batch_size: Rows per forward pass in predict_lbw_batch
+        session: Optional EvaluationSession to reuse cached predictions
+        thresholds: Thresholds to sweep (default 0.001 to 0.999, step 0.001)
+    """
     print("\n" + "="*60)
     print("THRESHOLD SENSITIVITY ANALYSIS")
     print("="*60)
 
-    model, scaler = load_model_and_scaler()
-
-    # Load test data
-    df = pd.read_csv(test_csv_path)
-    df.columns = df.columns.str.strip()
-
-    X_test = df[['spinType', 'speed', 'spinAmount', 'timeSinceRelease',
-                 'ballPosX', 'ballPosY', 'ballVelX', 'ballVelY',
-                 'ballAngularVel', 'distanceToStumps', 'distanceToPad',
-                 'hitPad', 'reachedPad']].values
-
-    y_true = df['willHitStumps'].values
-
     # Get predictions
-    predictions_proba = np.array([predict_lbw(model, scaler, x) for x in X_test])
+    if session is None:
+        session = EvaluationSession(test_csv_path, batch_size=batch_size)
+    session.load()
 
     # Test different thresholds
-    thresholds = np.arange(0.1, 1.0, 0.05)
-    accuracies = []
-    recalls = []
-    precisions = []
-
-    for threshold in thresholds:
-        pred = (predictions_proba >= threshold).astype(int)
-        acc = (pred == y_true).mean()
-
-        tp = ((pred == 1) & (y_true == 1)).sum()
-        fp = ((pred == 1) & (y_true == 0)).sum()
-        fn = ((pred == 0) & (y_true == 1)).sum()
-
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-
-        accuracies.append(acc)
-        recalls.append(recall)
-        precisions.append(precision)
+    if thresholds is None:
+        thresholds = np.round(np.arange(0.001, 1.0, 0.001), 3)
+    with profiler.span('threshold_sweep'):
+        accuracies, recalls, precisions = session.sweep_thresholds(thresholds)
 
     # Find best threshold
     best_idx = np.argmax(accuracies)
-    best_threshold = thresholds[best_idx]
+    best_threshold = float(thresholds[best_idx])
     best_accuracy = accuracies[best_idx]
 
-    print(f"\nBest threshold: {best_threshold:.2f}")
+    print(f"\nBest threshold: {best_threshold:.3f}")
     print(f"Best accuracy: {best_accuracy:.2%}")
 
+    reporter.add_metrics('Threshold sweep', {
+        'thresholds tried': len(thresholds),
+        'best threshold': best_threshold,
+        'best accuracy': float(best_accuracy),
+    })
+
     # Plot
-    plt.figure(figsize=(10, 6))
-    plt.plot(thresholds, accuracies, 'b-', label='Accuracy', linewidth=2)
-    plt.plot(thresholds, recalls, 'g--', label='Recall', linewidth=2)
-    plt.plot(thresholds, precisions, 'r--', label='Precision', linewidth=2)
-    plt.axvline(best_threshold, color='black', linestyle=':',
-                label=f'Best Threshold ({best_threshold:.2f})')
-    plt.xlabel('Decision Threshold')
-    plt.ylabel('Score')
-    plt.title('Model Performance vs Decision Threshold')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig('threshold_analysis.png', dpi=150)
-    print("Saved threshold analysis to threshold_analysis.png")
-    plt.show()
+    with profiler.span('plot_threshold_analysis'):
+        reporter.plot(draw_threshold_analysis, 'threshold_analysis.png',
+                      (np.asarray(thresholds), accuracies, recalls, precisions, best_threshold),
+                      figsize=(10, 6), dpi=150, title='Threshold analysis')
+    if reporter.enabled:
+        print("Saved threshold analysis to threshold_analysis.png")
 
     return best_threshold
 
-def main():
+def main(impact=False, ensemble=False):
     """Main testing function"""
-    import os
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
 
-    # Path to test CSV (relative to Python folder)
-    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+    # Path to test CSV (relative to Python folder), or a dataset directory
+    test_csv = args[0] if args else '../Unity/2dLBW/Assets/LBWTestData.csv'
 
     # Check if file exists
     if not os.path.exists(test_csv):
@@ -303,18 +478,44 @@ def main():
     # Run tests
     print("Testing model with Unity test data...\n")
 
+    # Predict once, every pass below reuses the same probabilities
+    if impact:
+        print("Impact-only mode: one row per delivery\n")
+        session = EvaluationSession(test_csv, model_path='lbw_impact_model_best.pth',
+                                    scaler_path='scaler_impact.pkl', impact=True)
+    elif ensemble:
+        print("Ensemble mode: calibrated mean of lbw_ensemble_best.pth\n")
+        session = EvaluationSession(test_csv, model_path='lbw_ensemble_best.pth',
+                                    scaler_path='scaler_ensemble.pkl', ensemble=True)
+    else:
+        session = EvaluationSession(test_csv)
+
     # Test with default threshold
-    accuracy, probs, preds = test_from_csv(test_csv, threshold=0.5)
+    accuracy, probs, preds = test_from_csv(test_csv, threshold=0.5,
+                                           session=session)
 
     # Analyze threshold sensitivity
-    best_threshold = test_threshold_sensitivity(test_csv)
+    best_threshold = test_threshold_sensitivity(test_csv, session=session)
 
     # Re-test with best threshold
     if best_threshold != 0.5:
         print("\n" + "="*60)
-        print(f"RE-TESTING WITH OPTIMAL THRESHOLD ({best_threshold:.2f})")
+        print(f"RE-TESTING WITH OPTIMAL THRESHOLD ({best_threshold:.3f})")
         print("="*60)
-        test_from_csv(test_csv, threshold=best_threshold)
+        test_from_csv(test_csv, threshold=best_threshold, session=session)
+
+    with profiler.span('write_report'):
+        report_path = reporter.finish('test_report.html', 'LBW test report')
+    if report_path:
+        print(f"\nSaved report to {report_path}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+
+    # --profile / --profile-cprofile / --profile-torch, see lbw_profiling.py
+    enable_from_flags(flags)
+    # --headless / --no-plots, see lbw_report.py
+    configure_from_flags(flags)
+    with profiler.capture('test_profile'):
+        main(impact='--impact' in flags, ensemble='--ensemble' in flags)
+    profiler.report('test_profile_trace.json')
\ No newline at end of file
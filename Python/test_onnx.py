@@ -0,0 +1,132 @@
+import numpy as np
+import onnxruntime as ort
+import json
+import os
+import sys
+from test_lbw_model import load_model_and_scaler, load_test_data, predict_lbw_batch
+
+
+def load_scaler_params(json_path):
+    """Read scaler_params.json as written by export_scalar_to_json.py"""
+    with open(json_path, 'r') as f:
+        params = json.load(f)
+
+    return {
+        'mean': np.array(params['mean'], dtype=np.float32),
+        'scale': np.array(params['scale'], dtype=np.float32),
+        'folded': params.get('folded', False),
+    }
+
+
+def create_session(onnx_path):
+    """onnxruntime CPU session with all graph optimisations enabled"""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+
+
+def predict_onnx(session, X, scaler_params=None, batch_size=65536):
+    """
+    Run raw features through an exported model, like LBWPredictor.cs does
+
+    Features are normalised with scaler_params first unless the scaler was
+    folded into the model.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if scaler_params is not None and not scaler_params['folded']:
+        X = (X - scaler_params['mean']) / scaler_params['scale']
+
+    input_name = session.get_inputs()[0].name
+    probabilities = np.empty(len(X), dtype=np.float32)
+    for start in range(0, len(X), batch_size):
+        output = session.run(None, {input_name: X[start:start + batch_size]})[0]
+        probabilities[start:start + batch_size] = output[:, 0]
+
+    return probabilities
+
+
+def check_onnx_parity(onnx_path, scaler_json_path, test_csv_path,
+                      model_path='lbw_model_best.pth', scaler_path='scaler.pkl',
+                      tolerance=1e-4):
+    """
+    Compare the ONNX export with the PyTorch model on a test CSV
+
+    Returns:
+        (max absolute probability difference, number of decisions that flip at 0.5)
+    """
+    model, scaler = load_model_and_scaler(model_path, scaler_path)
+    X_test, y_true = load_test_data(test_csv_path)
+
+    torch_probs = predict_lbw_batch(model, scaler, X_test)
+    onnx_probs = predict_onnx(create_session(onnx_path), X_test,
+                              load_scaler_params(scaler_json_path))
+
+    max_diff = float(np.abs(torch_probs - onnx_probs).max())
+    flipped = int(((torch_probs >= 0.5) != (onnx_probs >= 0.5)).sum())
+
+    print(f"ONNX parity on {len(X_test)} rows: max |diff| = {max_diff:.2e}, "
+          f"flipped decisions = {flipped}")
+    if max_diff > tolerance:
+        print(f"WARNING: ONNX output differs from PyTorch by more than {tolerance}")
+
+    return max_diff, flipped
+
+
+def check_batched_shape(session, X, scaler_params=None, batch_sizes=(1, 5, 32), tolerance=1e-6):
+    """
+    Run one (N, 13) batch per size, as LBWPredictor.PredictLBWBatch does
+
+    Each batch must come back as (N, 1) and match running its rows one at a
+    time, so batching N balls into one worker.Execute changes nothing.
+
+    Returns:
+        Max absolute difference between batched and single-row outputs
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if scaler_params is not None and not scaler_params['folded']:
+        X = (X - scaler_params['mean']) / scaler_params['scale']
+
+    input_name = session.get_inputs()[0].name
+    max_diff = 0.0
+    for n in batch_sizes:
+        batch = X[:n]
+        output = session.run(None, {input_name: batch})[0]
+        if output.shape != (len(batch), 1):
+            raise ValueError(f"Batch of {len(batch)} returned shape {output.shape}")
+
+        single = np.concatenate([session.run(None, {input_name: row[None, :]})[0] for row in batch])
+        max_diff = max(max_diff, float(np.abs(output - single).max()))
+
+    print(f"Batched shapes {list(batch_sizes)}: max |batched - single| = {max_diff:.2e}")
+    if max_diff > tolerance:
+        print(f"WARNING: batched output differs from single-row output by more than {tolerance}")
+
+    return max_diff
+
+
+def main():
+    onnx_path = sys.argv[1] if len(sys.argv) > 1 else 'lbw_model_legacy.onnx'
+    scaler_json = 'scaler_params.json'
+    test_csv = '../Unity/2dLBW/Assets/LBWTestData.csv'
+
+    for path in (onnx_path, scaler_json, test_csv):
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found, run export_to_onnx.py first")
+            return
+
+    check_onnx_parity(onnx_path, scaler_json, test_csv)
+
+    # Accuracy of the exported model on its own
+    X_test, y_true = load_test_data(test_csv)
+    session = create_session(onnx_path)
+    scaler_params = load_scaler_params(scaler_json)
+
+    # Same shape as PredictLBWBatch: one batch of several balls per Execute
+    check_batched_shape(session, X_test, scaler_params)
+
+    probs = predict_onnx(session, X_test, scaler_params)
+    print(f"ONNX accuracy at 0.5: {np.mean((probs >= 0.5) == y_true):.2%}")
+
+
+if __name__ == '__main__':
+    main()
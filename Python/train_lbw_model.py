@@ -3,12 +3,23 @@ import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader, random_split
+from torch.utils.data import (Dataset, IterableDataset, DataLoader, Sampler, Subset,
+                              random_split, get_worker_info)
 from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
 import json
 import pickle
+import copy
+import time
 import os
+import sys
+import glob
+import warnings
+from columnar_dataset import (FEATURE_NAMES, IMPACT_FEATURE_NAMES, load_columnar,
+                              is_columnar_dataset, assign_delivery_ids,
+                              delivery_validation_mask, reduce_to_impacts, select_features)
+from lbw_profiling import profiler, enable_from_flags
+from lbw_report import (reporter, configure_from_flags, draw_training_history,
+                        draw_feature_importance)
 
 # Load data
 def load_data_from_csv(filepath):
@@ -19,10 +30,7 @@ def load_data_from_csv(filepath):
     df.columns = df.columns.str.strip()
 
     # Features - 13 total
-    X = df[['spinType', 'speed', 'spinAmount', 'timeSinceRelease',
-            'ballPosX', 'ballPosY', 'ballVelX', 'ballVelY',
-            'ballAngularVel', 'distanceToStumps', 'distanceToPad',
-            'hitPad', 'reachedPad']].values
+    X = df[FEATURE_NAMES].values
 
     # Labels
     y = df['willHitStumps'].values
@@ -50,12 +58,34 @@ def load_data_from_json(filepath):
 
     return np.array(X, dtype=np.float32), np.array(y, dtype=np.float32)
 
+def load_dataset(path):
+    """
+    Load a columnar dataset directory (see columnar_dataset.py), JSON or CSV
+    export, or a directory of shards (see generate_lbw_data.py) as one dataset
+    """
+    if is_columnar_dataset(path):
+        return load_columnar(path)
+    if os.path.isdir(path):
+        parts = [load_dataset(shard) for shard in resolve_shards(path)]
+        if not parts:
+            raise ValueError(f"No CSV shards or columnar datasets found in {path}")
+        return (np.concatenate([X for X, _ in parts]),
+                np.concatenate([y for _, y in parts]))
+    if path.endswith('.json'):
+        return load_data_from_json(path)
+    return load_data_from_csv(path)
+
 
 # Dataset class
 class LBWDataset(Dataset):
     def __init__(self, X, y):
-        self.X = torch.FloatTensor(X)
-        self.y = torch.FloatTensor(y).unsqueeze(1)
+        # as_tensor shares memory with float32 arrays instead of copying.
+        # Read-only inputs (columnar memmaps, pandas copy-on-write columns)
+        # are fine to share, the tensors are only ever read
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='The given NumPy array is not writable')
+            self.X = torch.as_tensor(X, dtype=torch.float32)
+            self.y = torch.as_tensor(y, dtype=torch.float32).unsqueeze(1)
 
     def __len__(self):
         return len(self.X)
@@ -64,41 +94,285 @@ class LBWDataset(Dataset):
         return self.X[idx], self.y[idx]
 
 
-# Neural Network Model
-class LBWPredictor(nn.Module):
-    def __init__(self, input_size=13):
-        super(LBWPredictor, self).__init__()
+# Delivery-level splitting and batching
+def split_by_delivery(delivery_ids, val_fraction=0.2, seed=0):
+    """
+    Split row indices into train and validation by whole deliveries
+
+    Every frame of a delivery shares its willHitStumps label, so splitting
+    frames at random leaks deliveries into both sets and inflates
+    validation accuracy.
+    """
+    rng = np.random.default_rng(seed)
+    deliveries = np.unique(delivery_ids)
+    n_val = int(round(val_fraction * len(deliveries)))
+    val_deliveries = rng.choice(deliveries, size=n_val, replace=False)
+
+    in_val = np.isin(delivery_ids, val_deliveries)
+    return np.flatnonzero(~in_val), np.flatnonzero(in_val)
+
+class DeliveryBatchSampler(Sampler):
+    """
+    Batch frames of the same delivery together
+
+    Deliveries are shuffled each epoch and packed whole into batches of
+    up to batch_size frames (a delivery longer than batch_size gets a
+    batch of its own).
+    """
+
+    def __init__(self, delivery_ids, batch_size=32, shuffle=True, seed=0):
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+
+        # Row indices of each delivery, in file order
+        order = np.argsort(delivery_ids, kind='stable')
+        boundaries = np.flatnonzero(np.diff(delivery_ids[order])) + 1
+        self.deliveries = np.split(order, boundaries)
+
+    def __iter__(self):
+        delivery_order = (self.rng.permutation(len(self.deliveries))
+                          if self.shuffle else range(len(self.deliveries)))
+
+        batch = []
+        for i in delivery_order:
+            frames = self.deliveries[i]
+            if batch and len(batch) + len(frames) > self.batch_size:
+                yield batch
+                batch = []
+            batch.extend(frames.tolist())
+
+        if batch:
+            yield batch
 
-        self.network = nn.Sequential(
-            nn.Linear(input_size, 128),
-            nn.ReLU(),
-            nn.Dropout(0.2),
+    def __len__(self):
+        # Packing depends on the shuffled order, so this counts the
+        # batches of one unshuffled pass as an estimate
+        batches, batch_len = 0, 0
+        for frames in self.deliveries:
+            if batch_len and batch_len + len(frames) > self.batch_size:
+                batches += 1
+                batch_len = 0
+            batch_len += len(frames)
+        return batches + (1 if batch_len else 0)
+
+
+# Streaming dataset for data that does not fit in memory
+def resolve_shards(path):
+    """List the CSV files / columnar datasets that make up a training set"""
+    if is_columnar_dataset(path) or not os.path.isdir(path):
+        return [path]
+
+    shards = sorted(glob.glob(os.path.join(path, '*.csv')))
+    shards += sorted(d for d in glob.glob(os.path.join(path, '*'))
+                     if is_columnar_dataset(d))
+    return shards
+
+def iter_chunks(path, chunksize=100_000):
+    """Yield (X, y) float32 chunks from a CSV export or columnar dataset"""
+    if is_columnar_dataset(path):
+        X, y = load_columnar(path)
+        for start in range(0, len(y), chunksize):
+            yield (np.asarray(X[start:start + chunksize]),
+                   np.asarray(y[start:start + chunksize]))
+        return
 
-            nn.Linear(128, 64),
-            nn.ReLU(),
-            nn.Dropout(0.2),
+    if path.endswith('.json'):
+        raise ValueError(f"Cannot stream {path}, convert it with columnar_dataset.py first")
 
-            nn.Linear(64, 32),
-            nn.ReLU(),
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=np.float32):
+        # Strip whitespace from column names
+        chunk.columns = chunk.columns.str.strip()
+        yield chunk[FEATURE_NAMES].values, chunk['willHitStumps'].values
 
-            nn.Linear(32, 16),
-            nn.ReLU(),
+def fit_scaler_streaming(shards, chunksize=100_000):
+    """
+    Fit a StandardScaler one chunk at a time with partial_fit
+
+    Returns the scaler plus the total and positive row counts, so the
+    dataset summary can be printed without holding the data in memory.
+    """
+    scaler = StandardScaler()
+    total = 0
+    positives = 0
+
+    for shard in shards:
+        for X_chunk, y_chunk in iter_chunks(shard, chunksize):
+            scaler.partial_fit(X_chunk)
+            total += len(y_chunk)
+            positives += int(y_chunk.sum())
+
+    return scaler, total, positives
+
+class LBWStreamDataset(IterableDataset):
+    """
+    Stream scaled, shuffled batches from CSV shards on disk
+
+    Each epoch visits the shards in a new random order and shuffles rows
+    within a buffer of shuffle_chunks chunks, so memory is bounded by
+    chunksize * shuffle_chunks rows regardless of dataset size.
+
+    Rows are assigned to train or validation by delivery (see
+    delivery_validation_mask), so the split is identical every epoch and
+    frames of one delivery never end up in both datasets.
+    """
+
+    def __init__(self, shards, scaler, validation=False, val_fraction=0.2,
+                 batch_size=32, chunksize=100_000, shuffle_chunks=4, seed=0):
+        self.shards = shards
+        self.scaler = scaler
+        self.validation = validation
+        self.val_fraction = val_fraction
+        self.batch_size = batch_size
+        self.chunksize = chunksize
+        self.shuffle_chunks = shuffle_chunks
+        self.seed = seed
+        self.epoch = 0
+
+    def split_chunks(self, shard_order):
+        """Yield this split's rows chunk by chunk, spread across DataLoader workers"""
+        worker = get_worker_info()
+        chunk_counter = 0
+
+        for shard_idx in shard_order:
+            for chunk_idx, (X_chunk, y_chunk) in enumerate(
+                    iter_chunks(self.shards[shard_idx], self.chunksize)):
+                chunk_counter += 1
+                if worker is not None and chunk_counter % worker.num_workers != worker.id:
+                    continue
+
+                in_val = delivery_validation_mask(X_chunk, self.val_fraction, self.seed)
+                mask = in_val if self.validation else ~in_val
+
+                yield self.scaler.transform(X_chunk[mask]).astype(np.float32), y_chunk[mask]
+
+    def batches(self, X, y):
+        for start in range(0, len(y), self.batch_size):
+            yield (torch.from_numpy(X[start:start + self.batch_size]),
+                   torch.from_numpy(y[start:start + self.batch_size]).unsqueeze(1))
+
+    def __iter__(self):
+        rng = np.random.default_rng((self.seed, self.epoch))
+        self.epoch += 1
+
+        # Validation is read in a fixed order, like the in-memory val_loader
+        if self.validation:
+            for X_chunk, y_chunk in self.split_chunks(range(len(self.shards))):
+                yield from self.batches(X_chunk, y_chunk)
+            return
+
+        buffer_X, buffer_y = [], []
+        for X_chunk, y_chunk in self.split_chunks(rng.permutation(len(self.shards))):
+            buffer_X.append(X_chunk)
+            buffer_y.append(y_chunk)
+            if len(buffer_X) < self.shuffle_chunks:
+                continue
+
+            X_buf, y_buf = np.concatenate(buffer_X), np.concatenate(buffer_y)
+            order = rng.permutation(len(y_buf))
+            yield from self.batches(X_buf[order], y_buf[order])
+            buffer_X, buffer_y = [], []
+
+        if buffer_X:
+            X_buf, y_buf = np.concatenate(buffer_X), np.concatenate(buffer_y)
+            order = rng.permutation(len(y_buf))
+            yield from self.batches(X_buf[order], y_buf[order])
 
-            nn.Linear(16, 1),
-            nn.Sigmoid()
-        )
+
+# Neural Network Model
+class LBWPredictor(nn.Module):
+    def __init__(self, input_size=13, hidden_sizes=(128, 64, 32, 16),
+                 dropout=0.2, dropout_layers=2):
+        super(LBWPredictor, self).__init__()
+
+        # Linear -> ReLU (-> Dropout on the first dropout_layers layers),
+        # which keeps the state_dict keys of the original 128-64-32-16 model
+        layers = []
+        in_features = input_size
+        for i, width in enumerate(hidden_sizes):
+            layers += [nn.Linear(in_features, width), nn.ReLU()]
+            if i < dropout_layers:
+                layers.append(nn.Dropout(dropout))
+            in_features = width
+
+        layers += [nn.Linear(in_features, 1), nn.Sigmoid()]
+        self.network = nn.Sequential(*layers)
 
     def forward(self, x):
         return self.network(x)
 
 
+# Early stopping and training budgets
+class EarlyStopping:
+    """
+    Track validation loss and decide when training should stop
+
+    Stops once val loss has not improved by more than min_delta for
+    patience epochs (patience=None never stops early), or once
+    max_seconds of wall-clock time have passed since creation.
+    """
+
+    def __init__(self, patience=None, min_delta=0.0, max_seconds=None):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.max_seconds = max_seconds
+        self.start_time = time.perf_counter()
+
+        self.best_loss = float('inf')
+        self.best_epoch = None
+        self.epochs_without_improvement = 0
+        self.reason = None
+
+    def step(self, epoch, val_loss):
+        """Record one epoch, returns True if training should stop"""
+        if val_loss < self.best_loss - self.min_delta:
+            self.best_loss = val_loss
+            self.best_epoch = epoch
+            self.epochs_without_improvement = 0
+        else:
+            self.epochs_without_improvement += 1
+
+        if self.patience is not None and self.epochs_without_improvement >= self.patience:
+            self.reason = f'no improvement for {self.patience} epochs'
+        elif self.max_seconds is not None and time.perf_counter() - self.start_time >= self.max_seconds:
+            self.reason = f'wall-clock budget of {self.max_seconds}s reached'
+
+        return self.reason is not None
+
+def make_plateau_scheduler(optimizer, reduce_lr_on_plateau, lr_patience=5, lr_factor=0.5):
+    if not reduce_lr_on_plateau:
+        return None
+    return optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min',
+                                                factor=lr_factor, patience=lr_patience)
+
+def report_stopping(stopper, best_epoch, epoch, epochs):
+    if stopper.reason is not None:
+        print(f'Stopped early after epoch {epoch+1}/{epochs}: {stopper.reason}')
+    if best_epoch is not None:
+        print(f'Best weights found at epoch {best_epoch+1}')
+
+
 # Training function
-def train_model(model, train_loader, val_loader, epochs=100, lr=0.001):
+def train_model(model, train_loader, val_loader, epochs=100, lr=0.001,
+                patience=None, min_delta=0.0, max_seconds=None,
+                reduce_lr_on_plateau=False, lr_patience=5, lr_factor=0.5,
+                checkpoint_path='lbw_model_best.pth'):
+    """
+    Train with the DataLoaders, saving the best weights to checkpoint_path
+
+    Args:
+        epochs: Maximum number of epochs (the epoch budget)
+        patience, min_delta: Early stopping on validation loss (off by default)
+        max_seconds: Optional wall-clock budget
+        reduce_lr_on_plateau: Scale lr by lr_factor after lr_patience flat epochs
+    """
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model = model.to(device)
 
     criterion = nn.BCELoss()
     optimizer = optim.Adam(model.parameters(), lr=lr)
+    scheduler = make_plateau_scheduler(optimizer, reduce_lr_on_plateau, lr_patience, lr_factor)
+    stopper = EarlyStopping(patience, min_delta, max_seconds)
 
     train_losses = []
     val_losses = []
@@ -106,15 +380,30 @@ def train_model(model, train_loader, val_loader, epochs=100, lr=0.001):
     val_accuracies = []
 
     best_val_loss = float('inf')
+    best_epoch = None
+
+    # Per-batch timing only when profiling, otherwise the loop is untouched
+    timed = profiler.enabled
 
+    # Still defined for report_stopping when epochs is 0
+    epoch = -1
     for epoch in range(epochs):
         # Training
         model.train()
         train_loss = 0
         train_correct = 0
         train_total = 0
+        train_batches = 0
+
+        if timed:
+            epoch_start = batch_end = time.perf_counter()
+            data_seconds = compute_seconds = 0.0
 
         for inputs, labels in train_loader:
+            if timed:
+                batch_start = time.perf_counter()
+                data_seconds += batch_start - batch_end
+
             inputs, labels = inputs.to(device), labels.to(device)
 
             optimizer.zero_grad()
@@ -124,15 +413,24 @@ def train_model(model, train_loader, val_loader, epochs=100, lr=0.001):
             optimizer.step()
 
             train_loss += loss.item()
+            train_batches += 1
             predictions = (outputs > 0.5).float()
             train_correct += (predictions == labels).sum().item()
             train_total += labels.size(0)
 
+            if timed:
+                batch_end = time.perf_counter()
+                compute_seconds += batch_end - batch_start
+
+        if timed:
+            val_start = time.perf_counter()
+
         # Validation
         model.eval()
         val_loss = 0
         val_correct = 0
         val_total = 0
+        val_batches = 0
 
         with torch.no_grad():
             for inputs, labels in val_loader:
@@ -141,13 +439,19 @@ def train_model(model, train_loader, val_loader, epochs=100, lr=0.001):
                 loss = criterion(outputs, labels)
 
                 val_loss += loss.item()
+                val_batches += 1
                 predictions = (outputs > 0.5).float()
                 val_correct += (predictions == labels).sum().item()
                 val_total += labels.size(0)
 
-        # Calculate metrics
-        train_loss /= len(train_loader)
-        val_loss /= len(val_loader)
+        if timed:
+            profiler.epoch(epoch, train_total, val_start - epoch_start,
+                           data_seconds=data_seconds, compute_seconds=compute_seconds,
+                           val_seconds=time.perf_counter() - val_start)
+
+        # Calculate metrics (streaming loaders have no len())
+        train_loss /= train_batches
+        val_loss /= val_batches
         train_acc = 100 * train_correct / train_total
         val_acc = 100 * val_correct / val_total
 
@@ -159,41 +463,162 @@ def train_model(model, train_loader, val_loader, epochs=100, lr=0.001):
         # Save best model
         if val_loss < best_val_loss:
             best_val_loss = val_loss
-            torch.save(model.state_dict(), 'lbw_model_best.pth')
+            best_epoch = epoch
+            with profiler.span('save_checkpoint'):
+                torch.save(model.state_dict(), checkpoint_path)
 
         if (epoch + 1) % 10 == 0:
             print(f'Epoch [{epoch+1}/{epochs}]')
             print(f'  Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%')
             print(f'  Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%')
 
+        if scheduler is not None:
+            scheduler.step(val_loss)
+        if stopper.step(epoch, val_loss):
+            break
+
+    report_stopping(stopper, best_epoch, epoch, epochs)
+
+    return train_losses, val_losses, train_accuracies, val_accuracies
+
+
+# Fast training on pre-built tensors
+def subset_tensors(dataset):
+    """Feature and label tensors behind an LBWDataset or a Subset of one"""
+    if isinstance(dataset, Subset):
+        indices = torch.as_tensor(dataset.indices)
+        return dataset.dataset.X[indices], dataset.dataset.y[indices]
+    return dataset.X, dataset.y
+
+def train_model_fast(model, train_data, val_data, epochs=100, lr=0.001,
+                     batch_size=1024, checkpoint_path='lbw_model_best.pth',
+                     verbose=True, patience=None, min_delta=0.0, max_seconds=None,
+                     reduce_lr_on_plateau=False, lr_patience=5, lr_factor=0.5):
+    """
+    Train on tensors already in memory, without DataLoader collation
+
+    Each epoch slices a shuffled index permutation straight out of the
+    training tensors. Loss and accuracy are accumulated as tensors and
+    read back once per epoch, and the best weights are kept in memory and
+    written to checkpoint_path once at the end.
+
+    Args:
+        train_data, val_data: (X, y) tensor pairs, y shaped (n, 1)
+        checkpoint_path: Where to save the best weights (None to skip)
+        verbose: Print progress every 10 epochs
+        patience, min_delta, max_seconds, reduce_lr_on_plateau: As in train_model
+
+    Returns the same history lists as train_model (losses are per-sample
+    means rather than means of batch means).
+    """
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = model.to(device)
+
+    X_train, y_train = (t.to(device) for t in train_data)
+    X_val, y_val = (t.to(device) for t in val_data)
+
+    criterion = nn.BCELoss(reduction='sum')
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    scheduler = make_plateau_scheduler(optimizer, reduce_lr_on_plateau, lr_patience, lr_factor)
+    stopper = EarlyStopping(patience, min_delta, max_seconds)
+
+    train_losses = []
+    val_losses = []
+    train_accuracies = []
+    val_accuracies = []
+
+    best_val_loss = float('inf')
+    best_epoch = None
+    best_state = None
+    timed = profiler.enabled
+
+    # Still defined for report_stopping when epochs is 0
+    epoch = -1
+    for epoch in range(epochs):
+        if timed:
+            epoch_start = time.perf_counter()
+
+        # Training
+        model.train()
+        train_loss = torch.zeros((), device=device)
+        train_correct = torch.zeros((), device=device)
+
+        permutation = torch.randperm(len(X_train), device=device)
+        for start in range(0, len(X_train), batch_size):
+            idx = permutation[start:start + batch_size]
+            inputs, labels = X_train[idx], y_train[idx]
+
+            optimizer.zero_grad(set_to_none=True)
+            outputs = model(inputs)
+            loss = criterion(outputs, labels)
+            (loss / len(idx)).backward()
+            optimizer.step()
+
+            train_loss += loss.detach()
+            train_correct += ((outputs.detach() > 0.5).float() == labels).sum()
+
+        if timed:
+            val_start = time.perf_counter()
+
+        # Validation in one pass
+        model.eval()
+        with torch.inference_mode():
+            outputs = model(X_val)
+            val_loss = criterion(outputs, y_val)
+            val_correct = ((outputs > 0.5).float() == y_val).sum()
+
+        # One sync per epoch
+        train_loss, train_correct, val_loss, val_correct = torch.stack(
+            [train_loss, train_correct, val_loss, val_correct]).tolist()
+
+        if timed:
+            # Without a per-batch sync the train/val split is only exact on CPU
+            profiler.epoch(epoch, len(X_train), val_start - epoch_start,
+                           val_seconds=time.perf_counter() - val_start)
+
+        train_loss /= len(X_train)
+        val_loss /= len(X_val)
+        train_acc = 100 * train_correct / len(X_train)
+        val_acc = 100 * val_correct / len(X_val)
+
+        train_losses.append(train_loss)
+        val_losses.append(val_loss)
+        train_accuracies.append(train_acc)
+        val_accuracies.append(val_acc)
+
+        # Keep best weights in memory
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            best_epoch = epoch
+            best_state = copy.deepcopy(model.state_dict())
+
+        if verbose and (epoch + 1) % 10 == 0:
+            print(f'Epoch [{epoch+1}/{epochs}]')
+            print(f'  Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%')
+            print(f'  Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%')
+
+        if scheduler is not None:
+            scheduler.step(val_loss)
+        if stopper.step(epoch, val_loss):
+            break
+
+    if verbose:
+        report_stopping(stopper, best_epoch, epoch, epochs)
+
+    # Save best model once
+    if best_state is not None and checkpoint_path is not None:
+        with profiler.span('save_checkpoint'):
+            torch.save(best_state, checkpoint_path)
+
     return train_losses, val_losses, train_accuracies, val_accuracies
 
 
 # Plot training history
 def plot_training_history(train_losses, val_losses, train_accs, val_accs):
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
-
-    # Loss plot
-    ax1.plot(train_losses, label='Train Loss')
-    ax1.plot(val_losses, label='Val Loss')
-    ax1.set_xlabel('Epoch')
-    ax1.set_ylabel('Loss')
-    ax1.set_title('Training and Validation Loss')
-    ax1.legend()
-    ax1.grid(True)
-
-    # Accuracy plot
-    ax2.plot(train_accs, label='Train Acc')
-    ax2.plot(val_accs, label='Val Acc')
-    ax2.set_xlabel('Epoch')
-    ax2.set_ylabel('Accuracy (%)')
-    ax2.set_title('Training and Validation Accuracy')
-    ax2.legend()
-    ax2.grid(True)
-
-    plt.tight_layout()
-    plt.savefig('training_history.png')
-    plt.show()
+    reporter.plot(draw_training_history, 'training_history.png',
+                  (np.asarray(train_losses), np.asarray(val_losses),
+                   np.asarray(train_accs), np.asarray(val_accs)),
+                  figsize=(12, 4), title='Training history')
 
 
 # Plot feature importance
@@ -212,68 +637,149 @@ def plot_feature_importance(model, feature_names):
     sorted_importance = importance[indices]
 
     # Plot
-    plt.figure(figsize=(10, 6))
-    plt.barh(range(len(sorted_features)), sorted_importance)
-    plt.yticks(range(len(sorted_features)), sorted_features)
-    plt.xlabel('Average Absolute Weight')
-    plt.title('Feature Importance (First Layer Weights)')
-    plt.tight_layout()
-    plt.savefig('feature_importance.png')
-    plt.show()
+    reporter.plot(draw_feature_importance, 'feature_importance.png',
+                  (sorted_features, sorted_importance),
+                  figsize=(10, 6), title='Feature importance')
 
 
 # Main training pipeline
-def main():
-    print("Loading data...")
-
-    # Path to CSV file (relative to this script in 2dLBW/Python/)
-    csv_path = '../Unity/2dLBW/Assets/LBWTrainingData.csv'
-
-    # Check if file exists
-    if not os.path.exists(csv_path):
-        print(f"ERROR: Could not find CSV file at {csv_path}")
-        print("Please check the file path!")
-        return
-
-    X, y = load_data_from_csv(csv_path)
+def build_in_memory_loaders(data_path, group_by_delivery=True, delivery_batches=False,
+                            impact=False):
+    """
+    Load the whole dataset, fit the scaler and split it in memory
+
+    Args:
+        group_by_delivery: Split train/validation by delivery instead of by frame
+        delivery_batches: Batch training frames of the same delivery together
+        impact: Keep only the impact row of each delivery, with IMPACT_FEATURE_NAMES
+    """
+    with profiler.span('load_data'):
+        X, y = load_dataset(data_path)
+
+    if impact:
+        print(f"Frame-level rows: {len(X)}")
+        X, y = reduce_to_impacts(X, y)
+        X = select_features(X, IMPACT_FEATURE_NAMES)
+        # One row per delivery already, a plain random split is by delivery
+        group_by_delivery = False
 
     print(f"Dataset size: {len(X)}")
     print(f"Features: {X.shape[1]}")
     print(f"Positive samples (hit stumps): {np.sum(y == 1)} ({100*np.mean(y):.1f}%)")
     print(f"Negative samples (miss stumps): {np.sum(y == 0)} ({100*(1-np.mean(y)):.1f}%)")
+    warn_class_imbalance(np.mean(y))
 
-    # Check for severe class imbalance
-    hit_rate = np.mean(y)
-    if hit_rate < 0.1 or hit_rate > 0.9:
-        print(f"\n⚠️  WARNING: Severe class imbalance detected!")
-        print(f"Consider collecting more balanced data for better training.")
+    # Delivery IDs come from the raw (unscaled) features
+    delivery_ids = assign_delivery_ids(X) if group_by_delivery else None
 
     # Normalize features
-    scaler = StandardScaler()
-    X = scaler.fit_transform(X)
-
-    # Save scaler for later use
-    with open('scaler.pkl', 'wb') as f:
-        pickle.dump(scaler, f)
-    print("Saved scaler to scaler.pkl")
+    with profiler.span('fit_scaler'):
+        scaler = StandardScaler()
+        X = scaler.fit_transform(X)
 
     # Create dataset
     dataset = LBWDataset(X, y)
 
     # Split into train and validation
-    train_size = int(0.8 * len(dataset))
-    val_size = len(dataset) - train_size
-    train_dataset, val_dataset = random_split(dataset, [train_size, val_size])
-
-    print(f"\nTrain samples: {train_size}")
-    print(f"Validation samples: {val_size}")
+    if group_by_delivery:
+        train_idx, val_idx = split_by_delivery(delivery_ids)
+        train_dataset, val_dataset = Subset(dataset, train_idx), Subset(dataset, val_idx)
+        print(f"\nDeliveries: {delivery_ids.max() + 1}")
+    else:
+        train_size = int(0.8 * len(dataset))
+        val_size = len(dataset) - train_size
+        train_dataset, val_dataset = random_split(dataset, [train_size, val_size])
+
+    print(f"\nTrain samples: {len(train_dataset)}")
+    print(f"Validation samples: {len(val_dataset)}")
 
     # Create data loaders
-    train_loader = DataLoader(train_dataset, batch_size=32, shuffle=True)
+    if group_by_delivery and delivery_batches:
+        sampler = DeliveryBatchSampler(delivery_ids[train_idx], batch_size=32)
+        train_loader = DataLoader(train_dataset, batch_sampler=sampler)
+    else:
+        train_loader = DataLoader(train_dataset, batch_size=32, shuffle=True)
     val_loader = DataLoader(val_dataset, batch_size=32, shuffle=False)
 
+    return train_loader, val_loader, scaler
+
+def build_streaming_loaders(data_path, chunksize=100_000):
+    """Fit the scaler incrementally and stream batches from disk"""
+    shards = resolve_shards(data_path)
+    print(f"Streaming from {len(shards)} shard(s)")
+
+    with profiler.span('fit_scaler'):
+        scaler, total, positives = fit_scaler_streaming(shards, chunksize)
+
+    print(f"Dataset size: {total}")
+    print(f"Features: {len(FEATURE_NAMES)}")
+    print(f"Positive samples (hit stumps): {positives} ({100*positives/total:.1f}%)")
+    print(f"Negative samples (miss stumps): {total - positives} ({100*(1-positives/total):.1f}%)")
+    warn_class_imbalance(positives / total)
+
+    train_dataset = LBWStreamDataset(shards, scaler, validation=False, chunksize=chunksize)
+    val_dataset = LBWStreamDataset(shards, scaler, validation=True, chunksize=chunksize)
+
+    # Datasets yield ready-made batches, so no DataLoader batching/collation
+    train_loader = DataLoader(train_dataset, batch_size=None)
+    val_loader = DataLoader(val_dataset, batch_size=None)
+
+    return train_loader, val_loader, scaler
+
+def warn_class_imbalance(hit_rate):
+    # Check for severe class imbalance
+    if hit_rate < 0.1 or hit_rate > 0.9:
+        print(f"\n⚠️  WARNING: Severe class imbalance detected!")
+        print(f"Consider collecting more balanced data for better training.")
+
+def main(data_path=None, stream=False, delivery_batches=False, fast=False,
+         early_stopping=False, impact=False, max_seconds=None):
+    print("Loading data...")
+
+    # The impact-only model gets its own files, next to the frame-level ones
+    if impact:
+        prefix, scaler_path, feature_names = 'lbw_impact_model', 'scaler_impact.pkl', IMPACT_FEATURE_NAMES
+    else:
+        prefix, scaler_path, feature_names = 'lbw_model', 'scaler.pkl', FEATURE_NAMES
+
+    # Path to CSV file (relative to this script in 2dLBW/Python/), a
+    # dataset directory converted with columnar_dataset.py, or a directory
+    # of CSV shards (e.g. from generate_lbw_data.py)
+    if data_path is None:
+        data_path = '../Unity/2dLBW/Assets/LBWTrainingData.csv'
+
+    # Check if file exists
+    if not os.path.exists(data_path):
+        print(f"ERROR: Could not find training data at {data_path}")
+        print("Please check the file path!")
+        return
+
+    if stream and impact:
+        print("ERROR: --impact trains in memory, impact rows are small enough to fit")
+        return
+
+    # train_model_fast shuffles individual rows of in-memory tensors
+    if fast and stream:
+        print("ERROR: --fast trains on in-memory tensors, it cannot be combined with --stream")
+        return
+    if fast and delivery_batches:
+        print("ERROR: --fast shuffles rows, it cannot keep --delivery-batches together")
+        return
+
+    with profiler.span('build_loaders'):
+        if stream:
+            train_loader, val_loader, scaler = build_streaming_loaders(data_path)
+        else:
+            train_loader, val_loader, scaler = build_in_memory_loaders(
+                data_path, delivery_batches=delivery_batches, impact=impact)
+
+    # Save scaler for later use
+    with open(scaler_path, 'wb') as f:
+        pickle.dump(scaler, f)
+    print(f"Saved scaler to {scaler_path}")
+
     # Create model
-    model = LBWPredictor(input_size=13)
+    model = LBWPredictor(input_size=len(feature_names))
     print(f"\nModel architecture:\n{model}\n")
 
     # Count parameters
@@ -282,33 +788,81 @@ def main():
 
     # Train
     print("Starting training...")
-    train_losses, val_losses, train_accs, val_accs = train_model(
-        model, train_loader, val_loader, epochs=100, lr=0.001
-    )
+    stopping = dict(patience=10, min_delta=1e-4, reduce_lr_on_plateau=True) if early_stopping else {}
+    if max_seconds is not None:
+        stopping['max_seconds'] = max_seconds
+    with profiler.span('train'):
+        if fast and not stream:
+            train_losses, val_losses, train_accs, val_accs = train_model_fast(
+                model, subset_tensors(train_loader.dataset),
+                subset_tensors(val_loader.dataset), epochs=100, lr=0.001,
+                checkpoint_path=f'{prefix}_best.pth', **stopping
+            )
+        else:
+            train_losses, val_losses, train_accs, val_accs = train_model(
+                model, train_loader, val_loader, epochs=100, lr=0.001,
+                checkpoint_path=f'{prefix}_best.pth', **stopping
+            )
 
     # Save final model
-    torch.save(model.state_dict(), 'lbw_model_final.pth')
+    with profiler.span('save_checkpoint'):
+        torch.save(model.state_dict(), f'{prefix}_final.pth')
     print("\nTraining complete!")
     print("Models saved:")
-    print("  - lbw_model_best.pth (best validation loss)")
-    print("  - lbw_model_final.pth (final epoch)")
-    print("  - scaler.pkl (feature normalization)")
+    print(f"  - {prefix}_best.pth (best validation loss)")
+    print(f"  - {prefix}_final.pth (final epoch)")
+    print(f"  - {scaler_path} (feature normalization)")
+
+    if not reporter.enabled:
+        return
 
     # Plot results
     print("\nGenerating visualizations...")
-    plot_training_history(train_losses, val_losses, train_accs, val_accs)
+    with profiler.span('plot_training_history'):
+        plot_training_history(train_losses, val_losses, train_accs, val_accs)
 
     # Plot feature importance
-    feature_names = ['spinType', 'speed', 'spinAmount', 'timeSinceRelease',
-                     'ballPosX', 'ballPosY', 'ballVelX', 'ballVelY',
-                     'ballAngularVel', 'distanceToStumps', 'distanceToPad',
-                     'hitPad', 'reachedPad']
-    plot_feature_importance(model, feature_names)
+    with profiler.span('plot_feature_importance'):
+        plot_feature_importance(model, feature_names)
+
+    best_epoch = int(np.argmin(val_losses))
+    reporter.add_metrics('Training', {
+        'data': data_path,
+        'model': f'{prefix}_best.pth',
+        'epochs run': len(val_losses),
+        'best epoch': best_epoch + 1,
+        'best val loss': val_losses[best_epoch],
+        'best val accuracy (%)': val_accs[best_epoch],
+        'final train loss': train_losses[-1],
+        'parameters': total_params,
+    })
+
+    with profiler.span('write_report'):
+        report_path = reporter.finish(f'{prefix}_training_report.html', 'LBW training report')
 
     print("Saved visualizations:")
     print("  - training_history.png")
     print("  - feature_importance.png")
+    print(f"  - {report_path}")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    argv = sys.argv[1:]
+    # --max-seconds N: wall-clock training budget, stops after the epoch that exceeds it
+    max_seconds = None
+    if '--max-seconds' in argv:
+        i = argv.index('--max-seconds')
+        max_seconds = float(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+    flags = [arg for arg in argv if arg.startswith('--')]
+    args = [arg for arg in argv if not arg.startswith('--')]
+    # --profile / --profile-cprofile / --profile-torch, see lbw_profiling.py
+    enable_from_flags(flags)
+    # --headless / --no-plots, see lbw_report.py
+    configure_from_flags(flags)
+    with profiler.capture('train_profile'):
+        main(args[0] if args else None, stream='--stream' in flags,
+             delivery_batches='--delivery-batches' in flags, fast='--fast' in flags,
+             early_stopping='--early-stopping' in flags, impact='--impact' in flags,
+             max_seconds=max_seconds)
+    profiler.report('train_profile_trace.json')
\ No newline at end of file
@@ -127,5 +127,7 @@ public class BallTracker : MonoBehaviour
         Debug.Log($"Result: {result}");
         Debug.Log($"Probability: {decision.probability:P1}");
         Debug.Log($"Would hit stumps: {decision.willHitStumps}");
+        if (decision.variance > 0f)
+            Debug.Log($"Ensemble variance: {decision.variance:F4}");
     }
 }
\ No newline at end of file
@@ -13,10 +13,24 @@ public class LBWPredictor : MonoBehaviour
     [SerializeField] private Stumps stumps;
     [SerializeField] private Pad pad;
 
+    private const int FeatureCount = 13;
+
     private Model runtimeModel;
     private IWorker worker;
     private ScalerParams scalerParams;
 
+    // Reused on every call so per-frame predictions don't allocate
+    private readonly float[] featureBuffer = new float[FeatureCount];
+    private readonly float[] normalizedBuffer = new float[FeatureCount];
+    private float[] inverseScale;
+    private Tensor inputTensor;
+    private Tensor batchTensor;
+
+    // lbw_ensemble.onnx from Python/ensemble_lbw_model.py adds a second
+    // output with the variance across its members
+    private const string VarianceOutput = "variance";
+    private bool hasVariance;
+
 
     [System.Serializable]
     private class ScalerParams
@@ -24,6 +38,24 @@ public class LBWPredictor : MonoBehaviour
         public float[] mean;
         public float[] scale;
         public string[] feature_names;
+        // true when export_to_onnx.py folded the scaler into the model
+        public bool folded;
+    }
+
+    // One ball's features, for PredictLBWBatch
+    [System.Serializable]
+    public struct LBWInput
+    {
+        public Bowling.SpinType spinType;
+        public float speed;
+        public float spinAmount;
+        public float timeSinceRelease;
+        public Vector2 ballPos;
+        public Vector2 ballVel;
+        public float ballAngularVel;
+        public float distanceToStumps;
+        public float distanceToPad;
+        public bool hitPad;
     }
 
     private void Start()
@@ -31,7 +63,7 @@ public class LBWPredictor : MonoBehaviour
         LoadModel();
         LoadScalerParams();
 
-
+        inputTensor = new Tensor(1, FeatureCount);
     }
 
     void LoadModel()
@@ -47,8 +79,10 @@ public class LBWPredictor : MonoBehaviour
             WorkerFactory.Type.CSharpBurst,
             runtimeModel
         );
+        hasVariance = runtimeModel.outputs.Contains(VarianceOutput);
 
-        Debug.Log(" LBW Model loaded successfully");
+        Debug.Log(" LBW Model loaded successfully" +
+                  (hasVariance ? " (ensemble, with variance)" : ""));
     }
 
 
@@ -65,7 +99,21 @@ public class LBWPredictor : MonoBehaviour
         );
 
 
-        Debug.Log($"Scaler params loaded: {scalerParams.mean.Length} features");
+        // Check the scale once here instead of every normalized value per call
+        inverseScale = new float[scalerParams.scale.Length];
+        for (int i = 0; i < inverseScale.Length; i++)
+        {
+            inverseScale[i] = 1f / scalerParams.scale[i];
+
+            if (float.IsNaN(inverseScale[i]) || float.IsInfinity(inverseScale[i]))
+            {
+                Debug.LogError($"Feature {i} has scale {scalerParams.scale[i]}, " +
+                              "it will normalize to NaN/Infinity!");
+            }
+        }
+
+        Debug.Log($"Scaler params loaded: {scalerParams.mean.Length} features" +
+                  (scalerParams.folded ? " (folded into model)" : ""));
     }
 
     public LBWDecision PredictLBW(
@@ -81,38 +129,102 @@ public class LBWPredictor : MonoBehaviour
         bool hitPad
     )
     {
-        float[] features = new float[13]
-        {
-            (int)spinType,           // 0: spinType
-            speed,                   // 1: speed
-            spinAmount,              // 2: spinAmount
-            timeSinceRelease,        // 3: timeSinceRelease
-            ballPos.x,               // 4: ballPosX
-            ballPos.y,               // 5: ballPosY
-            ballVel.x,               // 6: ballVelX
-            ballVel.y,               // 7: ballVelY
-            ballAngularVel,          // 8: ballAngularVel
-            distanceToStumps,        // 9: distanceToStumps
-            distanceToPad,           // 10: distanceToPad
-            hitPad ? 1f : 0f,        // 11: hitPad
-            1f                       // 12: reachedPad (always 1 at decision time)
-        };
+        WriteFeatures(featureBuffer, spinType, speed, spinAmount, timeSinceRelease,
+                      ballPos, ballVel, ballAngularVel, distanceToStumps,
+                      distanceToPad, hitPad);
+        WriteToTensor(inputTensor, 0, featureBuffer);
 
+        worker.Execute(inputTensor);
 
+        // The output tensor belongs to the worker, it must not be disposed
+        float probability = worker.PeekOutput()[0];
+        float variance = hasVariance ? worker.PeekOutput(VarianceOutput)[0] : 0f;
 
-        float[] normalizedFeatures = NormalizeFeatures(features);
+        return MakeDecision(probability, variance);
+    }
 
-     
-        Tensor inputTensor = new Tensor(1, 13, normalizedFeatures);
-        worker.Execute(inputTensor);
+    /// <summary>
+    /// Predict count balls with one worker.Execute. Results are written to
+    /// results[0..count), so reusing the same arrays every frame allocates
+    /// nothing unless count changes.
+    /// </summary>
+    public void PredictLBWBatch(LBWInput[] balls, int count, LBWDecision[] results)
+    {
+        if (count <= 0)
+        {
+            return;
+        }
+
+        // Barracuda tensors have a fixed shape, only reallocate on a new ball count
+        if (batchTensor == null || batchTensor.batch != count)
+        {
+            batchTensor?.Dispose();
+            batchTensor = new Tensor(count, FeatureCount);
+        }
+
+        for (int b = 0; b < count; b++)
+        {
+            LBWInput ball = balls[b];
+            WriteFeatures(featureBuffer, ball.spinType, ball.speed, ball.spinAmount,
+                          ball.timeSinceRelease, ball.ballPos, ball.ballVel,
+                          ball.ballAngularVel, ball.distanceToStumps,
+                          ball.distanceToPad, ball.hitPad);
+            WriteToTensor(batchTensor, b, featureBuffer);
+        }
+
+        worker.Execute(batchTensor);
         Tensor outputTensor = worker.PeekOutput();
+        Tensor varianceTensor = hasVariance ? worker.PeekOutput(VarianceOutput) : null;
 
-        float probability = outputTensor[0];
+        for (int b = 0; b < count; b++)
+        {
+            results[b] = MakeDecision(outputTensor[b, 0],
+                                      varianceTensor != null ? varianceTensor[b, 0] : 0f);
+        }
+    }
 
+    static void WriteFeatures(
+        float[] features,
+        Bowling.SpinType spinType,
+        float speed,
+        float spinAmount,
+        float timeSinceRelease,
+        Vector2 ballPos,
+        Vector2 ballVel,
+        float ballAngularVel,
+        float distanceToStumps,
+        float distanceToPad,
+        bool hitPad
+    )
+    {
+        features[0] = (int)spinType;        // 0: spinType
+        features[1] = speed;                // 1: speed
+        features[2] = spinAmount;           // 2: spinAmount
+        features[3] = timeSinceRelease;     // 3: timeSinceRelease
+        features[4] = ballPos.x;            // 4: ballPosX
+        features[5] = ballPos.y;            // 5: ballPosY
+        features[6] = ballVel.x;            // 6: ballVelX
+        features[7] = ballVel.y;            // 7: ballVelY
+        features[8] = ballAngularVel;       // 8: ballAngularVel
+        features[9] = distanceToStumps;     // 9: distanceToStumps
+        features[10] = distanceToPad;       // 10: distanceToPad
+        features[11] = hitPad ? 1f : 0f;    // 11: hitPad
+        features[12] = 1f;                  // 12: reachedPad (always 1 at decision time)
+    }
 
-        inputTensor.Dispose();
-        outputTensor.Dispose();
+    // Normalizes one row of features straight into row b of the tensor
+    void WriteToTensor(Tensor tensor, int b, float[] features)
+    {
+        NormalizeFeatures(features, normalizedBuffer);
 
+        for (int i = 0; i < FeatureCount; i++)
+        {
+            tensor[b, i] = normalizedBuffer[i];
+        }
+    }
+
+    LBWDecision MakeDecision(float probability, float variance = 0f)
+    {
         // Make decision
         bool willHitStumps = probability >= decisionThreshold;
 
@@ -120,38 +232,39 @@ public class LBWPredictor : MonoBehaviour
         {
             willHitStumps = willHitStumps,
             probability = probability,
+            variance = variance,
             isOut = willHitStumps
         };
     }
 
    
-    float[] NormalizeFeatures(float[] features)
+    void NormalizeFeatures(float[] features, float[] normalized)
     {
         if (scalerParams == null || scalerParams.mean == null)
         {
             Debug.LogError("Scaler params not loaded!");
-            return features;
+            System.Array.Copy(features, normalized, FeatureCount);
+            return;
         }
 
-        float[] normalized = new float[features.Length];
-        for (int i = 0; i < features.Length; i++)
+        // Model takes raw features, normalization is in its first layer
+        if (scalerParams.folded)
         {
-            normalized[i] = (features[i] - scalerParams.mean[i]) /
-                           scalerParams.scale[i];
+            System.Array.Copy(features, normalized, FeatureCount);
+            return;
+        }
 
-            if (float.IsNaN(normalized[i]) || float.IsInfinity(normalized[i]))
-            {
-                Debug.LogError($"Feature {i} normalized to {normalized[i]}! " +
-                              $"Raw={features[i]}, Mean={scalerParams.mean[i]}, " +
-                              $"Scale={scalerParams.scale[i]}");
-            }
+        for (int i = 0; i < FeatureCount; i++)
+        {
+            normalized[i] = (features[i] - scalerParams.mean[i]) * inverseScale[i];
         }
-        return normalized;
     }
 
 
     private void OnDestroy()
     {
+        inputTensor?.Dispose();
+        batchTensor?.Dispose();
         worker?.Dispose();
     }
 
@@ -160,6 +273,8 @@ public class LBWPredictor : MonoBehaviour
     {
         public bool willHitStumps;
         public float probability;
+        // Disagreement between ensemble members, 0 for a single model
+        public float variance;
         public bool isOut;  
     }
 
@@ -209,18 +324,16 @@ public class LBWPredictor : MonoBehaviour
 
         Debug.Log($"Test features: [{string.Join(", ", testFeatures)}]");
 
-        float[] normalized = NormalizeFeatures(testFeatures);
+        float[] normalized = new float[FeatureCount];
+        NormalizeFeatures(testFeatures, normalized);
 
         Debug.Log($"Normalized: [{string.Join(", ", normalized)}]");
 
-        Tensor inputTensor = new Tensor(1, 13, normalized);
+        WriteToTensor(inputTensor, 0, testFeatures);
         worker.Execute(inputTensor);
-        Tensor outputTensor = worker.PeekOutput();
-        float probability = outputTensor[0];
-
+        float probability = worker.PeekOutput()[0];
 
-        inputTensor.Dispose();
-        outputTensor.Dispose();
+        Debug.Log($"Probability: {probability}");
     }
 }
 